@@ -7,12 +7,33 @@ __homepage__ = "http://packages.python.org/flatty"
 __docformat__ = "restructuredtext"
 
 
+import sys
+import types
+import importlib
+
 from flatty import *
-try:
-    import mongo
-except ImportError:
-    pass
-try:
-    import couch
-except ImportError:
-    pass
+import iterative
+import validator
+import binary
+from patching import diff, patch
+
+#imported on first access, they pull in database drivers or modules the
+#core doesn't need
+_LAZY_MODULES = ('mongo', 'couch', 'io', 'stream', 'store')
+
+
+class _Package(types.ModuleType):
+    """the flatty package, importing the modules in `_LAZY_MODULES` on access"""
+
+    def __getattr__(self, name):
+        if name in _LAZY_MODULES:
+            #the import sets the attribute on the package
+            return importlib.import_module(__name__ + '.' + name)
+        raise AttributeError("'module' object has no attribute '" + name + "'")
+
+
+_package = _Package(__name__, __doc__)
+_package.__dict__.update(sys.modules[__name__].__dict__)
+#the replaced module clears its globals when it is deleted
+_package._module = sys.modules[__name__]
+sys.modules[__name__] = _package
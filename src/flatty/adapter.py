@@ -0,0 +1,54 @@
+"""
+This module contains the parts the database adapters :mod:`flatty.mongo`
+and :mod:`flatty.couch` have in common.
+
+=======
+Classes
+=======
+"""
+
+
+class UnitOfWork(object):
+	"""
+	Collects the documents stored during a `with` block and writes them when
+	the block is left without exception. Documents stored several times are
+	written once, with their state at the end of the block. The adapters
+	implement :meth:`_write`.
+
+	Args:
+		db: the database object of the adapter
+	"""
+
+	def __init__(self, db):
+		self.db = db
+		self._docs = []
+		self._ids = set()
+
+	def store(self, doc):
+		"""registers `doc` for writing on :meth:`commit`"""
+		if id(doc) not in self._ids:
+			self._ids.add(id(doc))
+			self._docs.append(doc)
+
+	def _write(self, docs):
+		raise NotImplementedError()
+
+	def commit(self):
+		"""writes all registered documents"""
+		docs, self._docs, self._ids = self._docs, [], set()
+		if docs:
+			self._write(docs)
+
+	def rollback(self):
+		"""forgets the registered documents"""
+		self._docs = []
+		self._ids = set()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is None:
+			self.commit()
+		else:
+			self.rollback()
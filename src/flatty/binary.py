@@ -0,0 +1,338 @@
+"""
+This module stores :class:`Schema` objects in a compact binary format,
+e.g. for local disk caches or shared memory. Since the attribute names and
+types are known from the schema classes, schemas are written as tuples
+of their values in the order of the attributes, the keys are left out.
+The data is encoded with :mod:`marshal`.
+
+Every snapshot starts with a header containing the
+:func:`flatty.schema_fingerprint` of the schema, loading a snapshot with a
+changed schema raises a :class:`SchemaMismatchError` instead of returning
+garbled objects. The `__schema_version__` is stored with every record,
+records of an older version with the same layout are migrated by
+:func:`flatty.unflatit`.
+
+	>>> import flatty
+	>>>
+	>>> class Bar(flatty.Schema):
+	...	 a_num = int
+	...	 a_str = str
+	>>>
+	>>> data = flatty.binary.dumps(Bar(a_num=1, a_str='x'))
+	>>> flatty.binary.loads(data, Bar).a_num
+	1
+
+Lists of objects can be written and read one by one with :func:`dump_items`
+and :func:`iterload`.
+
+	>>> f = open('bars.bin', 'wb')
+	>>> flatty.binary.dump_items((Bar(a_num=i) for i in range(1000)), Bar, f)
+	>>> f.close()
+	>>> sum(bar.a_num for bar in flatty.binary.iterload(open('bars.bin', 'rb'), Bar))
+	499500
+
+=========
+Functions
+=========
+"""
+import inspect
+import marshal
+import struct
+import binascii
+from itertools import izip
+import flatty
+
+MAGIC = 'FLTB'
+VERSION = 1
+
+#magic, format version and schema fingerprint
+HEADER = struct.Struct('<4sB8s')
+_LENGTH = struct.Struct('<I')
+#marshal supports Ellipsis, it marks attributes missing in the flat dict
+_MISSING = Ellipsis
+
+_codecs = {}
+
+
+class SchemaMismatchError(ValueError):
+	"""
+	raised if the data was written with another schema than the one
+	it is loaded with
+	"""
+	pass
+
+
+def _compile(attr_type, cm):
+	#returns (encode, decode) functions for the flat values of attr_type,
+	#None if the flat value is stored as it is
+	if not attr_type:
+		return None
+	conv = cm.get_converter(attr_type)
+
+	if conv is flatty.SchemaConverter:
+		return schema_codec(attr_type, cm)
+
+	elif conv in (flatty.TypedListConverter, flatty.ColumnListConverter):
+		codec = _compile(flatty.item_type(attr_type, 0, None), cm)
+		if codec is None:
+			return None
+		item_encode, item_decode = codec
+		def encode(flat):
+			if flat is None:
+				return None
+			return [item_encode(item) for item in flat]
+		def decode(data):
+			if data is None:
+				return None
+			return [item_decode(item) for item in data]
+		return encode, decode
+
+	elif conv is flatty.TypedDictConverter:
+		if isinstance(attr_type, dict) and not hasattr(attr_type, 'ftype'):
+			codecs = dict((k, _compile(v, cm)) for k, v in attr_type.items())
+			codecs = dict((k, v) for k, v in codecs.items() if v is not None)
+			if not codecs:
+				return None
+			def encode(flat):
+				if flat is None:
+					return None
+				return dict((k, codecs[k][0](v) if k in codecs else v)
+						for k, v in flat.iteritems())
+			def decode(data):
+				if data is None:
+					return None
+				return dict((k, codecs[k][1](v) if k in codecs else v)
+						for k, v in data.iteritems())
+			return encode, decode
+
+		codec = _compile(flatty.item_type(attr_type, None, None), cm)
+		if codec is None:
+			return None
+		item_encode, item_decode = codec
+		def encode(flat):
+			if flat is None:
+				return None
+			return dict((k, item_encode(v)) for k, v in flat.iteritems())
+		def decode(data):
+			if data is None:
+				return None
+			return dict((k, item_decode(v)) for k, v in data.iteritems())
+		return encode, decode
+
+	#all other converters return primitive values
+	return None
+
+
+def schema_codec(obj_type, cm=flatty.ConvertManager):
+	"""
+	returns the compiled `(encode, decode)` functions of `obj_type`, they
+	convert between flattened dicts and the positional values written with
+	:mod:`marshal`, e.g. to store records in own file formats like
+	:mod:`flatty.store`
+
+		Args:
+			obj_type: a :class:`Schema` class
+
+		Returns:
+			a tuple of the encode and the decode function
+	"""
+	obj_class = obj_type if inspect.isclass(obj_type) else type(obj_type)
+	key = (cm, obj_class, flatty.schema_fingerprint(obj_class, cm))
+	if key in _codecs:
+		return _codecs[key]
+	if getattr(obj_class, '__subtypes__', None) is not None:
+		#the attributes of the subclasses aren't known from the schema
+		raise TypeError('Polymorphic schema ' + obj_class.__name__ + ' is not supported')
+
+	names = []
+	nested = []
+
+	def encode(flat):
+		if flat is None:
+			return None
+		values = [flat.get(attr_name, _MISSING) for attr_name in names]
+		for idx, (sub_encode, sub_decode) in nested:
+			if values[idx] is not _MISSING:
+				values[idx] = sub_encode(values[idx])
+		return tuple(values)
+
+	def decode(data):
+		if data is None:
+			return None
+		if len(data) != len(names):
+			raise SchemaMismatchError('Expected ' + str(len(names)) +
+									' attributes for ' + obj_class.__name__ +
+									', got ' + str(len(data)))
+		flat = dict(izip(names, data))
+		for idx, (sub_encode, sub_decode) in nested:
+			if data[idx] is not _MISSING:
+				flat[names[idx]] = sub_decode(data[idx])
+		if _MISSING in data:
+			for attr_name in names:
+				if flat[attr_name] is _MISSING:
+					del flat[attr_name]
+		return flat
+
+	#the fingerprint covers the layout only, the version the record was
+	#written with is appended so unflatit can migrate older records
+	if getattr(obj_class, '__schema_version__', None) is not None:
+		version_key = obj_class.__version_key__
+		versionless_encode, versionless_decode = encode, decode
+		def encode(flat):
+			if flat is None:
+				return None
+			return versionless_encode(flat) + (flat.get(version_key, _MISSING),)
+		def decode(data):
+			if data is None:
+				return None
+			if len(data) != len(names) + 1:
+				#written before the schema was versioned
+				return versionless_decode(data)
+			flat = versionless_decode(data[:-1])
+			if data[-1] is not _MISSING:
+				flat[version_key] = data[-1]
+			return flat
+
+	#registered before the attributes are compiled to support recursive schemas
+	_codecs[key] = (encode, decode)
+	for attr_name, attr_type in flatty.schema_fields(obj_class):
+		codec = _compile(attr_type, cm)
+		if codec is not None:
+			nested.append((len(names), codec))
+		names.append(attr_name)
+	return encode, decode
+
+
+def _fingerprint(obj_type, cm):
+	return binascii.unhexlify(flatty.schema_fingerprint(obj_type, cm))
+
+
+def header(obj_type, cm=flatty.ConvertManager):
+	"""
+	returns the header of snapshots of `obj_type`, :data:`HEADER`.size bytes
+	"""
+	return HEADER.pack(MAGIC, VERSION, _fingerprint(obj_type, cm))
+
+
+def check_header(data, obj_type, cm=flatty.ConvertManager):
+	"""
+	raises a :class:`SchemaMismatchError` if `data` doesn't start with the
+	header of snapshots of `obj_type`
+	"""
+	if len(data) < HEADER.size:
+		raise SchemaMismatchError('Truncated header')
+	magic, version, print_ = HEADER.unpack(data[:HEADER.size])
+	if magic != MAGIC or version != VERSION:
+		raise SchemaMismatchError('Not a flatty binary snapshot')
+	if print_ != _fingerprint(obj_type, cm):
+		raise SchemaMismatchError('The data was written with another version of ' +
+								str(obj_type))
+
+
+def pack(flat_dict, obj_type, cm=flatty.ConvertManager):
+	"""
+	encodes the flattened data of `obj_type` positionally, without header
+
+		Args:
+			flat_dict: the result of :func:`flatty.flatit`
+			obj_type: a :class:`Schema` class
+
+		Returns:
+			a :mod:`marshal` string
+	"""
+	return marshal.dumps(schema_codec(obj_type, cm)[0](flat_dict))
+
+
+def unpack(data, obj_type, cm=flatty.ConvertManager):
+	"""
+	decodes the data written by :func:`pack` back to the flattened dict
+	"""
+	return schema_codec(obj_type, cm)[1](marshal.loads(data))
+
+
+def dumps(obj, obj_type=None, cm=flatty.ConvertManager):
+	"""
+	encodes `obj` to a binary snapshot
+
+		Args:
+			obj: a :class:`Schema` instance
+			obj_type: the schema class of `obj` (default=type(obj))
+
+		Returns:
+			the header followed by the encoded object
+	"""
+	if obj_type == None:
+		obj_type = type(obj)
+	return header(obj_type, cm) + pack(flatty.flatit(obj, obj_type, cm=cm), obj_type, cm)
+
+
+def loads(data, obj_type, cm=flatty.ConvertManager):
+	"""
+	decodes a snapshot written by :func:`dumps`
+
+		Args:
+			data: the snapshot
+			obj_type: the schema class of the encoded object
+
+		Returns:
+			an instance of `obj_type`
+	"""
+	check_header(data, obj_type, cm)
+	return flatty.unflatit(unpack(data[HEADER.size:], obj_type, cm), obj_type, None, cm)
+
+
+def dump(obj, fileobj, obj_type=None, cm=flatty.ConvertManager):
+	"""writes the snapshot of `obj` to the file like object `fileobj`"""
+	fileobj.write(dumps(obj, obj_type, cm))
+
+
+def load(fileobj, obj_type, cm=flatty.ConvertManager):
+	"""reads a snapshot written by :func:`dump` from `fileobj`"""
+	return loads(fileobj.read(), obj_type, cm)
+
+
+def dump_items(objs, obj_type, fileobj, cm=flatty.ConvertManager):
+	"""
+	writes the objects of the iterable `objs` (e.g. a :class:`TypedList`)
+	one by one to `fileobj`, the objects are not held in memory
+
+		Args:
+			objs: an iterable of `obj_type` instances
+			obj_type: a :class:`Schema` class
+			fileobj: a file like object opened for binary writing
+
+		Returns:
+			the number of written objects
+	"""
+	encode = schema_codec(obj_type, cm)[0]
+	fileobj.write(header(obj_type, cm))
+	count = 0
+	for obj in objs:
+		data = marshal.dumps(encode(flatty.flatit(obj, obj_type, cm=cm)))
+		fileobj.write(_LENGTH.pack(len(data)))
+		fileobj.write(data)
+		count += 1
+	return count
+
+
+def iterload(fileobj, obj_type, cm=flatty.ConvertManager):
+	"""
+	reads the objects written by :func:`dump_items` one by one
+
+		Args:
+			fileobj: a file like object opened for binary reading
+			obj_type: a :class:`Schema` class
+
+		Returns:
+			a generator of `obj_type` instances
+	"""
+	decode = schema_codec(obj_type, cm)[1]
+	check_header(fileobj.read(HEADER.size), obj_type, cm)
+	while True:
+		size = fileobj.read(_LENGTH.size)
+		if not size:
+			break
+		if len(size) != _LENGTH.size:
+			raise SchemaMismatchError('Truncated item')
+		data = fileobj.read(_LENGTH.unpack(size)[0])
+		yield flatty.unflatit(decode(marshal.loads(data)), obj_type, None, cm)
@@ -5,6 +5,7 @@ Classes
 =======
 """
 import flatty
+import adapter
 
 class Document(flatty.Schema):
 	"""
@@ -14,22 +15,29 @@ class Document(flatty.Schema):
 	_id = unicode
 	_rev = unicode
 	
+	def _flat(self):
+		flattened = flatty.flatit(self)
+		if self._id == unicode:
+			del flattened['_id']
+		if self._rev == unicode:
+			del flattened['_rev']
+		return flattened
+	
 	def store(self, db):
 		"""stores the document in the couchdb 
 	
 		Args:
-			db: should must be a couchdb-python ''Database'' object
+			db: should must be a couchdb-python ''Database'' object or a
+				:class:`UnitOfWork`, which defers the write
 			
 		Returns:
 			returns a tuple `id, rev`. `id`  is the document id which stays the
 			same over time. `rev` changes on every store.
 		"""
-		flattened =  self.flatit()
-		if self._id == unicode:
-			del flattened['_id']
-		if self._rev == unicode:
-			del flattened['_rev']
-		self._id, self._rev = db.save(flattened)
+		if isinstance(db, UnitOfWork):
+			db.store(self)
+			return self._id, self._rev
+		self._id, self._rev = db.save(self._flat())
 		return self._id, self._rev
 	
 	@classmethod
@@ -44,6 +52,45 @@ class Document(flatty.Schema):
 		Returns:
 			returns the object
 		"""
-		return cls.unflatit(db[id])
+		return flatty.unflatit(db[id], cls)
 		
-	
\ No newline at end of file
+	
+
+
+class UnitOfWork(adapter.UnitOfWork):
+	"""
+	Collects the :class:`Document` instances stored during a `with` block
+	and writes them with a single `_bulk_docs` request when the block is
+	left without exception, see :func:`unit_of_work`. Documents stored
+	several times are written once, with their state at the end of the block.
+	The first failed write (e.g. a conflict) is raised after the `_id` and
+	`_rev` of the written documents were updated.
+
+	Args:
+		db: a couchdb-python ''Database'' object
+	"""
+
+	def _write(self, docs):
+		results = self.db.update([doc._flat() for doc in docs])
+		error = None
+		for doc, (success, id, rev) in zip(docs, results):
+			if success:
+				doc._id, doc._rev = id, rev
+			elif error is None:
+				error = rev
+		if error is not None:
+			raise error
+
+
+def unit_of_work(db):
+	"""
+	returns a :class:`UnitOfWork` collecting the documents stored in the
+	`with` block, they are flattened and written with one `_bulk_docs`
+	request when the block is left
+
+		>>> with flatty.couch.unit_of_work(db) as uow:
+		...	 person.name = 'John'
+		...	 person.store(uow)
+		...	 library.store(uow)
+	"""
+	return UnitOfWork(db)
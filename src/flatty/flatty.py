@@ -12,6 +12,12 @@ import inspect
 import datetime
 import types
 import sys
+import array
+import base64
+import bisect
+import hashlib
+import weakref
+import time
 
 
 class MetaBaseFlattyType(type):
@@ -85,7 +91,56 @@ class BaseFlattyType(object):
 		return new_cls
 	
 
-class TypedList(BaseFlattyType, list):
+class _Observers(list):
+	"""the observers of an object, copies of the object start without observers"""
+	
+	def __copy__(self):
+		return None
+	
+	def __deepcopy__(self, memo):
+		return None
+
+
+def _notifying(method):
+	def notify(self, *args):
+		ret = method(self, *args)
+		if self.__observers__:
+			for observer in tuple(self.__observers__):
+				observer(self, None)
+		return ret
+	notify.__name__ = method.__name__
+	notify.__doc__ = method.__doc__
+	return notify
+
+
+class ObservableList(list):
+	"""
+	A list which notifies the callables in `__observers__` with
+	`(obj, None)` after it was changed. Base of :class:`TypedList`, the
+	methods live in this class because :meth:`BaseFlattyType.set_type` only
+	keeps the bases of the class it is called on.
+	"""
+	__observers__ = None
+
+for _name in ('append', 'extend', 'insert', 'pop', 'remove', 'reverse', 'sort',
+			'__setitem__', '__delitem__', '__setslice__', '__delslice__', 
+			'__iadd__', '__imul__'):
+	setattr(ObservableList, _name, _notifying(getattr(list, _name)))
+
+
+class ObservableDict(dict):
+	"""
+	A dict which notifies the callables in `__observers__` with
+	`(obj, None)` after it was changed. Base of :class:`TypedDict`.
+	"""
+	__observers__ = None
+
+for _name in ('__setitem__', '__delitem__', 'clear', 'pop', 'popitem', 
+			'setdefault', 'update'):
+	setattr(ObservableDict, _name, _notifying(getattr(dict, _name)))
+
+
+class TypedList(BaseFlattyType, ObservableList):
 	"""
 	This class is used for typed lists. During flattening and unflattening
 	the types are checked and restored.
@@ -118,7 +173,7 @@ class TypedList(BaseFlattyType, list):
 	"""
 	pass
 
-class TypedDict(BaseFlattyType, dict):
+class TypedDict(BaseFlattyType, ObservableDict):
 	"""
 	This class is used for typed dict. During flattening and unflattening
 	the types are checked and restored.
@@ -152,6 +207,598 @@ class TypedDict(BaseFlattyType, dict):
 	"""
 	pass
 
+_PRIMITIVE_TYPES = (int, long, float, bool, str, unicode, types.NoneType)
+
+#typecodes of the array.array columns, all other types are stored in lists
+_COLUMN_TYPECODES = {int: 'l', float: 'd'}
+
+
+class ColumnStore(object):
+	"""
+	Implementation of :class:`ColumnList`. The methods live in this class
+	because :meth:`BaseFlattyType.set_type` only keeps the bases of the
+	class it is called on.
+	"""
+	
+	def __init__(self, iterable=()):
+		self._columns = None
+		self._len = 0
+		for item in iterable:
+			self.append(item)
+	
+	def _init_columns(self):
+		if self._columns is None:
+			columns = {}
+			for attr_name, attr_type in schema_fields(self.ftype):
+				attr_class = attr_type if inspect.isclass(attr_type) else type(attr_type)
+				if attr_type is not None and attr_class not in _PRIMITIVE_TYPES:
+					raise TypeError('ColumnList only supports schemas with primitive attributes, ' 
+								+ attr_name + ' is ' + repr(attr_type))
+				if attr_class in _COLUMN_TYPECODES:
+					columns[attr_name] = array.array(_COLUMN_TYPECODES[attr_class])
+				else:
+					columns[attr_name] = []
+			self._columns = columns
+		return self._columns
+	
+	def _append_row(self, row):
+		for attr_name, column in self._init_columns().iteritems():
+			value = row[attr_name]
+			try:
+				column.append(value)
+			except (TypeError, OverflowError):
+				#None or a value out of range for the array, fall back to a list
+				column = self._columns[attr_name] = list(column)
+				column.append(value)
+		self._len += 1
+	
+	def _row(self, idx):
+		columns = self._init_columns()
+		return dict((attr_name, column[idx]) for attr_name, column in columns.iteritems())
+	
+	def _check_row(self, row):
+		for attr_name, attr_type in schema_fields(self.ftype):
+			check_type(attr_type, row[attr_name])
+	
+	def _flat_row(self, obj):
+		check_type(self.ftype, obj)
+		row = {}
+		for attr_name, attr_type in schema_fields(self.ftype):
+			attr_value = getattr(obj, attr_name)
+			if is_unset(attr_value, attr_type):
+				attr_value = None
+			elif attr_type is None and attr_value is not None:
+				#untyped values are stored flattened, like flatit returns them
+				attr_value = flatit(attr_value)
+			row[attr_name] = attr_value
+		self._check_row(row)
+		return row
+	
+	def __len__(self):
+		return self._len
+	
+	def __getitem__(self, idx):
+		if isinstance(idx, slice):
+			return [self[i] for i in xrange(*idx.indices(self._len))]
+		if idx < 0:
+			idx += self._len
+		if not 0 <= idx < self._len:
+			raise IndexError('ColumnList index out of range')
+		ftype = self.ftype if inspect.isclass(self.ftype) else type(self.ftype)
+		return ftype(**self._row(idx))
+	
+	def __setitem__(self, idx, obj):
+		if idx < 0:
+			idx += self._len
+		if not 0 <= idx < self._len:
+			raise IndexError('ColumnList index out of range')
+		row = self._flat_row(obj)
+		for attr_name, column in self._columns.iteritems():
+			column[idx] = row[attr_name]
+	
+	def __iter__(self):
+		for idx in xrange(self._len):
+			yield self[idx]
+	
+	def append(self, obj):
+		"""appends the :class:`Schema` instance `obj` as new row"""
+		self._append_row(self._flat_row(obj))
+	
+	def extend(self, iterable):
+		"""appends all :class:`Schema` instances in `iterable` as new rows"""
+		for obj in iterable:
+			self.append(obj)
+	
+	def clear(self):
+		"""removes all rows"""
+		self._columns = None
+		self._len = 0
+	
+	def column(self, attr_name):
+		"""
+		returns the column (an `array.array` or a `list`) holding the values 
+		of attribute `attr_name`
+		"""
+		return self._init_columns()[attr_name]
+	
+	def iterflat(self):
+		"""lazily yields the flattened rows as dicts"""
+		for idx in xrange(self._len):
+			yield self._row(idx)
+	
+	def load_flat(self, flat_list):
+		"""appends the rows of `flat_list` (a list of dicts) to the columns"""
+		for flat_row in flat_list:
+			row = {}
+			for attr_name, attr_type in schema_fields(self.ftype):
+				row[attr_name] = flat_row.get(attr_name)
+			self._check_row(row)
+			self._append_row(row)
+
+
+class ColumnList(BaseFlattyType, ColumnStore):
+	"""
+	This class is a memory compact alternative to a :class:`TypedList` of
+	schemas which only have primitive attributes. Instead of one object per
+	item every attribute is stored in its own column (an `array.array` for
+	`int` and `float` attributes). Accessing an item creates a new instance
+	of the schema class, changes of it must be written back with
+	``my_list[idx] = item``. Values of untyped attributes are stored
+	flattened.
+	
+		>>> import flatty
+		>>> 
+		>>> class Point(flatty.Schema):
+		...	 x = float
+		...	 y = float
+		... 
+		>>> class Track(flatty.Schema):
+		...	 points = flatty.ColumnList.set_type(Point)
+		>>> 
+		>>> track = Track(points=Track.points([Point(x=1.0, y=2.0)]))
+		>>> track.points.column('x')
+		array('d', [1.0])
+		>>> flatted = flatty.flatit(track)
+		>>> print flatted
+		{'points': [{'y': 2.0, 'x': 1.0}]}
+		>>> restored_obj = flatty.unflatit(flatted, Track)
+		>>> isinstance(restored_obj.points[0], Point)
+		True
+	"""
+	pass
+
+
+class _Index(object):
+	"""a hash or sorted index of the items of an :class:`IndexedList`"""
+	
+	def __init__(self, path, kind):
+		self.path = path.split('.')
+		self.kind = kind
+		self._buckets = {}
+		self._keys = []
+		self._items = []
+	
+	def key(self, obj):
+		for attr_name in self.path:
+			if not isinstance(obj, Schema):
+				return None
+			value = getattr(obj, attr_name, None)
+			if is_unset(value, getattr(type(obj), attr_name, None)):
+				value = None
+			obj = value
+		return obj
+	
+	def add(self, key, obj):
+		if self.kind == 'hash':
+			self._buckets.setdefault(key, []).append(obj)
+		else:
+			idx = bisect.bisect_right(self._keys, key)
+			self._keys.insert(idx, key)
+			self._items.insert(idx, obj)
+	
+	def discard(self, key, obj):
+		if self.kind == 'hash':
+			bucket = self._buckets.get(key, [])
+			for idx, item in enumerate(bucket):
+				if item is obj:
+					del bucket[idx]
+					if not bucket:
+						del self._buckets[key]
+					return
+		else:
+			idx = bisect.bisect_left(self._keys, key)
+			while idx < len(self._keys) and self._keys[idx] == key:
+				if self._items[idx] is obj:
+					del self._keys[idx]
+					del self._items[idx]
+					return
+				idx += 1
+	
+	def find(self, key):
+		if self.kind == 'hash':
+			return list(self._buckets.get(key, ()))
+		return self._items[bisect.bisect_left(self._keys, key):
+						bisect.bisect_right(self._keys, key)]
+	
+	def find_range(self, low, high):
+		if self.kind != 'sorted':
+			raise TypeError('Range queries need a sorted index')
+		start = 0 if low is None else bisect.bisect_left(self._keys, low)
+		end = len(self._keys) if high is None else bisect.bisect_right(self._keys, high)
+		return self._items[start:end]
+
+
+class _Watch(object):
+	"""observer of the schema instances along the index paths of an item"""
+	
+	def __init__(self, store, root):
+		self.store = store
+		self.root = root
+	
+	def __call__(self, obj, attr_name):
+		if attr_name in self.store._attr_names:
+			self.store._reindex(self.root)
+	
+	def __copy__(self):
+		return self
+	
+	def __deepcopy__(self, memo):
+		return self
+
+
+class IndexedStore(list):
+	"""
+	Implementation of :class:`IndexedList`. The methods live in this class
+	because :meth:`BaseFlattyType.set_type` only keeps the bases of the
+	class it is called on.
+	"""
+	
+	indexes = {}
+	
+	def __init__(self, iterable=()):
+		list.__init__(self)
+		self._indexes = dict((path, _Index(path, kind)) 
+							for path, kind in self.indexes.iteritems())
+		self._attr_names = set(attr_name for path in self.indexes 
+							for attr_name in path.split('.'))
+		#keys and watched schema instances of the indexed items by id
+		self._entries = {}
+		self.extend(iterable)
+	
+	def _add(self, obj):
+		if obj is None:
+			return
+		entry = self._entries.get(id(obj))
+		if entry is not None:
+			entry[0] += 1
+		else:
+			keys = {}
+			for path, index in self._indexes.iteritems():
+				keys[path] = index.key(obj)
+			watched = self._watch(obj)
+			entry = self._entries[id(obj)] = [1, keys, watched]
+		for path, index in self._indexes.iteritems():
+			index.add(entry[1][path], obj)
+	
+	def _remove(self, obj):
+		if obj is None:
+			return
+		entry = self._entries[id(obj)]
+		for path, index in self._indexes.iteritems():
+			index.discard(entry[1][path], obj)
+		entry[0] -= 1
+		if entry[0] == 0:
+			self._unwatch(obj, entry[2])
+			del self._entries[id(obj)]
+	
+	def _watch(self, root):
+		watched = []
+		for index in self._indexes.itervalues():
+			obj = root
+			for attr_name in index.path[:-1]:
+				if not isinstance(obj, Schema):
+					break
+				if not any(o is obj for o in watched):
+					watched.append(obj)
+				obj = getattr(obj, attr_name, None)
+			if isinstance(obj, Schema) and not any(o is obj for o in watched):
+				watched.append(obj)
+		watch = _Watch(self, root)
+		for obj in watched:
+			if obj.__observers__ is None:
+				object.__setattr__(obj, '__observers__', _Observers())
+			obj.__observers__.append(watch)
+		return watched
+	
+	def _unwatch(self, root, watched):
+		for obj in watched:
+			obj.__observers__[:] = [w for w in obj.__observers__ 
+								if not (isinstance(w, _Watch) and 
+									w.store is self and w.root is root)]
+	
+	def _reindex(self, root):
+		count, keys, watched = self._entries[id(root)]
+		for path, index in self._indexes.iteritems():
+			for i in xrange(count):
+				index.discard(keys[path], root)
+		self._unwatch(root, watched)
+		del self._entries[id(root)]
+		for i in xrange(count):
+			self._add(root)
+	
+	def _items(self, values):
+		values = list(values)
+		for obj in values:
+			#None is a placeholder which is not indexed
+			if obj is not None:
+				check_type(self.ftype, obj)
+		return values
+	
+	def __reduce__(self):
+		return (type(self), (list(self),))
+	
+	def append(self, obj):
+		obj, = self._items([obj])
+		list.append(self, obj)
+		self._add(obj)
+	
+	def extend(self, iterable):
+		values = self._items(iterable)
+		list.extend(self, values)
+		for obj in values:
+			self._add(obj)
+	
+	def __iadd__(self, iterable):
+		self.extend(iterable)
+		return self
+	
+	def __imul__(self, count):
+		values = list(self)
+		list.__imul__(self, count)
+		if not self:
+			for obj in values:
+				self._remove(obj)
+		else:
+			for i in xrange(count - 1):
+				for obj in values:
+					self._add(obj)
+		return self
+	
+	def insert(self, idx, obj):
+		obj, = self._items([obj])
+		list.insert(self, idx, obj)
+		self._add(obj)
+	
+	def pop(self, idx=-1):
+		obj = list.pop(self, idx)
+		self._remove(obj)
+		return obj
+	
+	def remove(self, obj):
+		del self[self.index(obj)]
+	
+	def __setitem__(self, idx, value):
+		if isinstance(idx, slice):
+			old = list.__getitem__(self, idx)
+			value = self._items(value)
+		else:
+			old = [list.__getitem__(self, idx)]
+			value, = self._items([value])
+		list.__setitem__(self, idx, value)
+		for obj in old:
+			self._remove(obj)
+		for obj in (value if isinstance(idx, slice) else [value]):
+			self._add(obj)
+	
+	def __delitem__(self, idx):
+		if isinstance(idx, slice):
+			old = list.__getitem__(self, idx)
+		else:
+			old = [list.__getitem__(self, idx)]
+		list.__delitem__(self, idx)
+		for obj in old:
+			self._remove(obj)
+	
+	def __setslice__(self, i, j, value):
+		self.__setitem__(slice(max(0, i), max(0, j)), value)
+	
+	def __delslice__(self, i, j):
+		self.__delitem__(slice(max(0, i), max(0, j)))
+	
+	def _index(self, path):
+		try:
+			return self._indexes[path]
+		except KeyError:
+			raise KeyError('No index on ' + path)
+	
+	def find(self, path, value):
+		"""returns the list of items where the attribute `path` equals `value`"""
+		return self._index(path).find(value)
+	
+	def find_one(self, path, value):
+		"""returns the first item where the attribute `path` equals `value` or None"""
+		items = self._index(path).find(value)
+		if items:
+			return items[0]
+		return None
+	
+	def find_range(self, path, low=None, high=None):
+		"""
+		returns the items where the attribute `path` is between `low` and
+		`high` (both included) ordered by the attribute, needs a sorted index
+		"""
+		return self._index(path).find_range(low, high)
+
+
+class IndexedList(BaseFlattyType, IndexedStore):
+	"""
+	This class is a :class:`TypedList` of schema instances with hash or
+	sorted indexes on their attributes, attributes of nested schemas are
+	indexed by their dotted path. The indexes are updated when items are
+	added or removed and when the indexed attributes change. They are
+	flattened like a :class:`TypedList`, the indexes are rebuilt when the
+	list is unflattened. Slices and the results of `+` and `*` are plain
+	lists without indexes.
+	
+		>>> import flatty
+		>>> 
+		>>> class City(flatty.Schema):
+		...	 name = str
+		... 
+		>>> class Country(flatty.Schema):
+		...	 code = str
+		...	 size = int
+		...	 capital = City
+		... 
+		>>> Countries = flatty.IndexedList.set_type(Country, 
+		...	 {'code':'hash', 'size':'sorted', 'capital.name':'hash'})
+		>>> countries = Countries([Country(code='at', size=83871, capital=City(name='vienna'))])
+		>>> countries.find_one('capital.name', 'vienna').code
+		'at'
+		>>> countries[0].capital.name = 'wien'
+		>>> countries.find_one('capital.name', 'wien').code
+		'at'
+		>>> len(countries.find_range('size', 1000, 100000))
+		1
+	"""
+	
+	@classmethod
+	def set_type(cls, ftype, indexes=None):
+		"""
+		sets the type of the items and the indexes
+	
+		Args:
+			ftype: the :class:`Schema` class of the items
+			indexes: a dict mapping attribute names (or dotted paths of
+				nested schema attributes) to 'hash' or 'sorted'
+			
+		Returns:
+			a class object with the class variables `ftype` and `indexes` set
+		"""
+		indexes = dict(indexes or {})
+		for path, kind in indexes.iteritems():
+			if kind not in ('hash', 'sorted'):
+				raise ValueError('index kind must be one of "hash" or "sorted"')
+			attr_type = ftype
+			for attr_name in path.split('.'):
+				attr_class = attr_type if inspect.isclass(attr_type) else type(attr_type)
+				fields = {}
+				if issubclass(attr_class, Schema):
+					fields = dict(schema_fields(attr_type))
+				if attr_name not in fields:
+					raise AttributeError('Attribute ' + path + ' not exists')
+				attr_type = fields[attr_name]
+		new_cls = type(cls.__name__, cls.__bases__, dict(ftype=ftype,
+					indexes=indexes, set_type=cls.set_type))
+		new_cls.__module__ = cls.__module__
+		return new_cls
+
+
+class NumArray(BaseFlattyType):
+	"""
+	This class is used for numeric arrays which are stored as numpy arrays.
+	The items are validated and converted vectorized, without a python loop
+	over the items. numpy is only imported when the first array is converted.
+	
+	With encoding 'list' (the default) the array is flattened to a (nested)
+	list, with 'bytes' or 'base64' one dimensional arrays are flattened to
+	their raw buffer for marshallers supporting binary data.
+	
+		>>> import flatty
+		>>> import numpy
+		>>> 
+		>>> class Series(flatty.Schema):
+		...	 values = flatty.NumArray.set_type('float64')
+		...	 raw = flatty.NumArray.set_type('int32', encoding='base64')
+		>>> 
+		>>> series = Series(values=numpy.arange(3.0), raw=numpy.arange(2))
+		>>> print flatty.flatit(series)
+		{'raw': 'AAAAAAEAAAA=', 'values': [0.0, 1.0, 2.0]}
+	"""
+	
+	encoding = 'list'
+	
+	@classmethod
+	def set_type(cls, ftype, encoding='list'):
+		"""
+		sets the numpy dtype for the inherited flatty schema class
+	
+		Args:
+			ftype: the dtype (or its name) of the array items
+			encoding: one of 'list', 'bytes' or 'base64' (default='list')
+			
+		Returns:
+			a class object with the class variables `ftype` and `encoding` set
+		"""
+		if encoding not in ('list', 'bytes', 'base64'):
+			raise ValueError('encoding must be one of "list", "bytes" or "base64"')
+		new_cls = type(cls.__name__, cls.__bases__, dict(ftype=ftype,
+					encoding=encoding, set_type=cls.set_type))
+		new_cls.__module__ = cls.__module__
+		return new_cls
+
+
+class MetaSchema(type):
+	"""
+	Metaclass of :class:`Schema`. The declared attributes are analyzed once
+	when the class is created and again when an attribute of the class is
+	changed, instead of on every flattening.
+	"""
+	def __init__(cls, name, bases, dct):
+		super(MetaSchema, cls).__init__(name, bases, dct)
+		_analyze_schema(cls)
+		_register_subtype(cls, dct)
+	
+	def __setattr__(cls, name, value):
+		type.__setattr__(cls, name, value)
+		if not name.startswith('__'):
+			_schema_changed(cls)
+	
+	def __delattr__(cls, name):
+		type.__delattr__(cls, name)
+		if not name.startswith('__'):
+			_schema_changed(cls)
+	
+	@property
+	def __fingerprint__(cls):
+		"""the :func:`schema_fingerprint` of the class"""
+		return schema_fingerprint(cls)
+
+
+def _analyze_schema(cls):
+	if hasattr(cls, '__fields__'):
+		fields = cls.__fields__.items()
+	else:
+		fields = []
+		for attr_name in dir(cls):
+			if not attr_name.startswith('__'):
+				attr_type = getattr(cls, attr_name)
+				if not inspect.ismethod(attr_type):
+					fields.append((attr_name, attr_type))
+	type.__setattr__(cls, '__schema_fields__', tuple(sorted(fields)))
+
+
+def _register_subtype(cls, dct):
+	#classes declaring a discriminator get a registry, classes declaring a
+	#value are registered in the registry of the nearest such base
+	if dct.get('__discriminator__') is not None:
+		type.__setattr__(cls, '__subtypes__', {})
+	value = dct.get('__discriminator_value__')
+	if value is not None and cls.__subtypes__ is not None:
+		cls.__subtypes__[value] = cls
+
+
+def _schema_changed(cls):
+	#subclasses inherit the attributes, nested schemas are part of the
+	#fingerprint of the classes using them
+	classes = [cls]
+	while classes:
+		sub_cls = classes.pop()
+		_analyze_schema(sub_cls)
+		classes.extend(type.__subclasses__(sub_cls))
+	_clear_caches()
+
+
 class Schema(object):
 	"""
 	This class builds the base class for all schema classes.
@@ -165,6 +812,33 @@ class Schema(object):
 		...	 a_thing = None  
 	
 	"""
+	__metaclass__ = MetaSchema
+	__slots__ = ()
+	
+	#callables notified with `(obj, attr_name)` after an attribute of the
+	#instance was set, e.g. by :class:`IndexedList`
+	__observers__ = None
+	
+	#keep the last flattened dict of the instances until they or the objects
+	#they contain are changed. Only instances containing nothing but schemas,
+	#TypedList and TypedDict instances and immutable values are cached, plain
+	#lists and dicts can be changed unnoticed. Not supported by SlotsSchema.
+	__cache_flat__ = False
+	
+	#the version of the schema, written to the flattened dicts under the key
+	#`__version_key__`. Older flattened dicts are migrated when they are
+	#unflattened, see :func:`migration`. None for unversioned schemas.
+	__schema_version__ = None
+	__version_key__ = '_version'
+	
+	#polymorphic schemas, a class declaring `__discriminator__` gets a
+	#registry of its subclasses by their `__discriminator_value__`. The
+	#value of the class is written to the flattened dicts under the key
+	#`__discriminator__`, on unflattening the class is looked up by it.
+	__discriminator__ = None
+	__discriminator_value__ = None
+	__subtypes__ = None
+	
 	def __init__(self, **kwargs):
 		#to comfortably set attributes via kwargs in the __init__
 		for name, value in kwargs.items():
@@ -172,7 +846,7 @@ class Schema(object):
 				raise AttributeError('Attribute not exists')
 			setattr(self, name, value)
 	
-	def flatit(self, cm):
+	def flatit(self, cm, memo=None, only=None, exclude=None):
 		"""
 		one way to flatten the instance of this class
 			
@@ -180,7 +854,7 @@ class Schema(object):
 			a dict where the instance is flattened to primitive types
 		"""
 		
-		return flatit(self, cm = cm)
+		return flatit(self, cm = cm, memo = memo, only = only, exclude = exclude)
 	
 	@classmethod
 	def unflatit(cls, flat_dict, cm):
@@ -193,6 +867,256 @@ class Schema(object):
 		
 		return unflatit(cls, flat_dict, cm = cm)		
 	
+	def __setattr__(self, name, value):
+		object.__setattr__(self, name, value)
+		if self.__observers__:
+			for observer in tuple(self.__observers__):
+				observer(self, name)
+	
+
+class _Unset(object):
+	def __repr__(self):
+		return 'UNSET'
+	
+	def __nonzero__(self):
+		return False
+
+#: marks attributes of :class:`SlotsSchema` instances which were never set
+UNSET = _Unset()
+
+
+class MetaSlotsSchema(MetaSchema):
+	"""
+	Metaclass of :class:`SlotsSchema`. Moves the declared attributes of the
+	class into `__fields__` and generates the `__slots__` for them.
+	"""
+	def __new__(mcs, name, bases, dct):
+		fields = {}
+		for base in reversed(bases):
+			fields.update(getattr(base, '__fields__', {}))
+		
+		slots = []
+		for attr_name, attr_type in dct.items():
+			if attr_name.startswith('__') or inspect.isfunction(attr_type) or \
+				isinstance(attr_type, (classmethod, staticmethod, property)):
+				continue
+			if attr_name not in fields:
+				slots.append(attr_name)
+			fields[attr_name] = attr_type
+			del dct[attr_name]
+		
+		dct['__fields__'] = fields
+		dct['__slots__'] = tuple(slots) + tuple(dct.get('__slots__', ()))
+		cls = type.__new__(mcs, name, bases, dct)
+		if cls.__cache_flat__:
+			#the flat dict is kept in the instance __dict__
+			raise TypeError('SlotsSchema ' + name + ' can\'t use __cache_flat__')
+		return cls
+	
+	def __setattr__(cls, name, value):
+		#declared attributes are slots, a class attribute would hide them
+		if name in cls.__dict__.get('__fields__', ()):
+			cls.__fields__[name] = value
+			_schema_changed(cls)
+		else:
+			super(MetaSlotsSchema, cls).__setattr__(name, value)
+
+
+class SlotsSchema(Schema):
+	"""
+	Base class for memory compact schema classes. The declared attributes are
+	stored in `__slots__` instead of a per instance `__dict__`. Attributes
+	which are declared with a type and were never set are :data:`UNSET`.
+	
+		>>> import flatty
+		>>> 
+		>>> class Point(flatty.SlotsSchema):
+		...	 x = float
+		...	 y = float
+		...	 label = 'origin'
+		>>> 
+		>>> p = Point(x=1.0)
+		>>> p.y
+		UNSET
+		>>> flatty.flatit(p)
+		{'y': None, 'x': 1.0, 'label': 'origin'}
+	"""
+	__metaclass__ = MetaSlotsSchema
+	__slots__ = ('__observers__',)
+	
+	def __init__(self, **kwargs):
+		object.__setattr__(self, '__observers__', None)
+		for attr_name, attr_type in self.__fields__.iteritems():
+			if inspect.isclass(attr_type):
+				attr_type = UNSET
+			setattr(self, attr_name, attr_type)
+		super(SlotsSchema, self).__init__(**kwargs)
+
+
+class FrozenSchema(Schema):
+	"""
+	Base class for immutable schema classes, e.g. for reference data like
+	currencies which never change after loading. The attributes are set on
+	construction, setting or deleting them later raises an AttributeError.
+	Instances are compared and hashed by their flattened values.
+	
+	Unflattening identical flat dicts returns the same shared instance, the
+	instances are interned as long as they are referenced. Instances created
+	by :func:`unflatit` are created without calling `__init__`.
+	
+		>>> import flatty
+		>>> 
+		>>> class Currency(flatty.FrozenSchema):
+		...	 code = str
+		...	 digits = int
+		>>> 
+		>>> eur = flatty.unflatit({'code':'EUR', 'digits':2}, Currency)
+		>>> eur is flatty.unflatit({'code':'EUR', 'digits':2}, Currency)
+		True
+		>>> eur == Currency(code='EUR', digits=2)
+		True
+	
+	Lists and dicts held by the instances are not frozen, they must not be
+	changed either.
+	"""
+	__frozen__ = False
+	
+	def __init__(self, **kwargs):
+		super(FrozenSchema, self).__init__(**kwargs)
+		object.__setattr__(self, '__frozen__', True)
+	
+	def __setattr__(self, name, value):
+		if self.__frozen__:
+			raise AttributeError(type(self).__name__ + ' instances are immutable')
+		super(FrozenSchema, self).__setattr__(name, value)
+	
+	def __delattr__(self, name):
+		if self.__frozen__:
+			raise AttributeError(type(self).__name__ + ' instances are immutable')
+		super(FrozenSchema, self).__delattr__(name)
+	
+	def _key(self):
+		key = self.__dict__.get('__key__')
+		if key is None:
+			key = _freeze_flat(flatit(self))
+			object.__setattr__(self, '__key__', key)
+		return key
+	
+	def __eq__(self, other):
+		if self is other:
+			return True
+		if type(other) is not type(self):
+			return False
+		return self._key() == other._key()
+	
+	def __ne__(self, other):
+		return not self == other
+	
+	def __hash__(self):
+		return hash(self._key())
+	
+	def __copy__(self):
+		return self
+	
+	def __deepcopy__(self, memo):
+		return self
+
+
+def _freeze_flat(val):
+	#hashable equivalent of a flattened value, the types are part of it
+	#since values like 1, 1.0 and True compare and hash equal
+	if isinstance(val, dict):
+		return (dict, frozenset(((type(k), k), _freeze_flat(v)) 
+							for k, v in val.iteritems()))
+	if isinstance(val, list):
+		return (list, tuple(_freeze_flat(v) for v in val))
+	return (type(val), val)
+
+#the interned FrozenSchema instances by class, manager, converter generation
+#and frozen flat dict
+_interned = weakref.WeakValueDictionary()
+
+
+def schema_fields(obj_type):
+	"""
+	lists the declared attributes of a :class:`Schema` class
+	
+	Args:
+		obj_type: a :class:`Schema` class or instance
+		
+	Returns:
+		a list of `(attr_name, attr_type)` tuples sorted by name
+	"""
+	fields = getattr(obj_type, '__schema_fields__', None)
+	if fields is not None:
+		return fields
+	if hasattr(obj_type, '__fields__'):
+		return sorted(obj_type.__fields__.items())
+	
+	fields = []
+	for attr_name in dir(obj_type):
+		if not attr_name.startswith('__'):
+			attr_type = getattr(obj_type, attr_name)
+			if not inspect.ismethod(attr_type):
+				fields.append((attr_name, attr_type))
+	return fields
+
+
+_MISSING = object()
+
+
+def item_type(container_type, key=0, default=_MISSING):
+	"""
+	returns the declared type of the item `key` of a container type, e.g.
+	a :class:`TypedList` or :class:`TypedDict` class or a list or dict
+	literal like `[int]` or `{'a': int}`
+	
+	Args:
+		container_type: the type of the container attribute
+		key: the key of the item, the index for lists (default=0)
+		default: returned if no type is declared for the item, otherwise
+			a KeyError is raised
+	"""
+	if hasattr(container_type, 'ftype'):
+		return container_type.ftype
+	elif isinstance(container_type, list):
+		if len(container_type) > 0:
+			return container_type[0]
+	elif isinstance(container_type, dict):
+		if key in container_type:
+			return container_type[key]
+	if default is _MISSING:
+		raise KeyError(key)
+	return default
+
+
+def is_unset(attr_value, attr_type):
+	"""
+	checks if an attribute of a :class:`Schema` instance was never set, this
+	is the case if it still holds the type from the schema or :data:`UNSET`
+	"""
+	return attr_value is UNSET or \
+		(inspect.isclass(attr_value) and attr_value == attr_type)
+
+
+def reusable(obj_type, obj):
+	"""
+	checks if the existing `obj` can be refreshed in place during
+	unflattening to `obj_type`
+	
+	Returns:
+		`obj` if it is an instance of `obj_type`, otherwise None
+	"""
+	#obj_type itself is either the type or a default value shared by all
+	#instances of the schema, both must not be changed
+	if obj is None or obj_type is None or obj is obj_type or obj is UNSET or \
+		isinstance(obj, FrozenSchema):
+		return None
+	obj_class = obj_type if inspect.isclass(obj_type) else type(obj_type)
+	if isinstance(obj, obj_class):
+		return obj
+	return None
+
 
 def _check_type(val, type):
 	if type == None or val == None or type == types.NoneType:
@@ -271,12 +1195,8 @@ class DateConverter(Converter):
 	def to_obj(cls, obj_type, val, obj, cm):
 		if val == None:
 			return None
-		if obj == None:
-			obj = datetime.datetime.strptime(str(val), "%Y-%m-%d").date()
-		else:
-			d = datetime.datetime.strptime(str(val), "%Y-%m-%d").date()
-			obj.replace(d.year, d.month, d.day)
-		return obj
+		#dates are immutable, an existing obj can't be reused
+		return datetime.datetime.strptime(str(val), "%Y-%m-%d").date()
 	
 
 class DateTimeConverter(Converter):
@@ -295,12 +1215,8 @@ class DateTimeConverter(Converter):
 	def to_obj(cls, obj_type, val, obj, cm):
 		if val == None:
 			return None
-		if obj == None:
-			obj = datetime.datetime.strptime(str(val), "%Y-%m-%dT%H:%M:%S.%f")
-		else:
-			dt = datetime.datetime.strptime(str(val), "%Y-%m-%dT%H:%M:%S.%f")
-			obj.replace(dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second, dt.microsecond, dt.tzinfo)
-		return obj
+		#datetimes are immutable, an existing obj can't be reused
+		return datetime.datetime.strptime(str(val), "%Y-%m-%dT%H:%M:%S.%f")
 
 class TimeConverter(Converter):
 	"""
@@ -318,13 +1234,198 @@ class TimeConverter(Converter):
 	def to_obj(cls, obj_type, val, obj, cm):
 		if val == None:
 			return None
-		if obj == None:
-			obj = datetime.datetime.strptime(str(val), "%H:%M:%S.%f").time()
-		else:
-			t = datetime.datetime.strptime(str(val), "%H:%M:%S.%f").time()
-			obj.replace(t.hour, t.minute, t.second, t.microsecond, t.tzinfo)
-		return obj
+		#times are immutable, an existing obj can't be reused
+		return datetime.datetime.strptime(str(val), "%H:%M:%S.%f").time()
+	
+class CircularReferenceError(Exception):
+	"""
+	raised by :func:`flatit` with memoization enabled if a :class:`Schema`
+	instance (directly or indirectly) contains itself
+	"""
+	pass
+
+
+class MigrationError(ValueError):
+	"""
+	raised if a flattened dict can't be migrated to the current
+	`__schema_version__` of its :class:`Schema` class
+	"""
+	pass
+
+
+#registered migrations by class and version and the compiled chains of them
+_migrations = {}
+_migration_chains = {}
+
+
+def migration(obj_type, from_version, to_version=None):
+	"""
+	decorator registering a function which migrates the flattened dicts of
+	the :class:`Schema` class `obj_type` from one `__schema_version__` to
+	another. The function gets the flattened dict and changes it in place
+	or returns a new one. Flattened dicts without version are version 0.
+	
+		>>> import flatty
+		>>> 
+		>>> class Bar(flatty.Schema):
+		...	 __schema_version__ = 2
+		...	 name = str
+		... 
+		>>> @flatty.migration(Bar, 1)
+		... def rename_title(flat):
+		...	 flat['name'] = flat.pop('title')
+		>>> 
+		>>> flatty.unflatit({'_version':1, 'title':'foo'}, Bar).name
+		'foo'
+	
+	Args:
+		obj_type: the :class:`Schema` class
+		from_version: the version of the flattened dicts the function takes
+		to_version: the version of the flattened dicts the function returns
+			(default=from_version + 1)
+	"""
+	if to_version == None:
+		to_version = from_version + 1
+	def register(func):
+		_migrations.setdefault(obj_type, {})[from_version] = (to_version, func)
+		_migration_chains.clear()
+		return func
+	return register
+
+
+def _migration_chain(obj_class, from_version, to_version):
+	key = (obj_class, from_version, to_version)
+	try:
+		return _migration_chains[key]
+	except KeyError:
+		pass
 	
+	registered = _migrations.get(obj_class, {})
+	steps = []
+	version = from_version
+	while version != to_version:
+		if version not in registered or len(steps) > len(registered):
+			raise MigrationError('No migration of ' + obj_class.__name__ + 
+								' from version ' + str(from_version) + 
+								' to ' + str(to_version))
+		version, func = registered[version]
+		steps.append(func)
+	
+	def chain(flat_dict):
+		for func in steps:
+			ret = func(flat_dict)
+			if ret is not None:
+				flat_dict = ret
+		return flat_dict
+	_migration_chains[key] = chain
+	return chain
+
+
+def migrate(val, obj_type):
+	"""
+	migrates the flattened dict `val` to the current `__schema_version__`
+	of `obj_type` with the functions registered by :func:`migration`. 
+	This is done by :func:`unflatit`.
+	
+	Returns:
+		`val` if it is current, otherwise the migrated copy of `val`
+	"""
+	obj_class = obj_type if inspect.isclass(obj_type) else type(obj_type)
+	version = getattr(obj_class, '__schema_version__', None)
+	if version is None or val is None:
+		return val
+	from_version = val.get(obj_class.__version_key__, 0)
+	if from_version == version:
+		return val
+	flat_dict = _migration_chain(obj_class, from_version, version)(_copy_flat(val))
+	flat_dict[obj_class.__version_key__] = version
+	return flat_dict
+
+
+def _copy_flat(val):
+	#cheap copy of already flattened data, only dicts and lists are mutable
+	if isinstance(val, dict):
+		return dict((k, _copy_flat(v)) for k, v in val.iteritems())
+	if isinstance(val, list):
+		return [_copy_flat(v) for v in val]
+	return val
+
+
+class _Invalidate(object):
+	"""
+	observer dropping the cached flat dict of `root` on changes. It removes
+	itself from all observed objects then, objects which left the tree are
+	no longer observed and don't keep `root` alive, the current tree is
+	observed again when the flat dict is cached the next time.
+	"""
+	
+	def __init__(self, root):
+		self.root = root
+		self.observed = []
+	
+	def __call__(self, obj, attr_name):
+		self.root.__dict__.pop('__flat__', None)
+		self.release()
+	
+	def release(self):
+		"""removes the observer from all objects it was added to"""
+		observed, self.observed = self.observed, []
+		for value in observed:
+			if value.__observers__:
+				value.__observers__[:] = [o for o in value.__observers__ if o is not self]
+	
+	def __eq__(self, other):
+		return isinstance(other, _Invalidate) and other.root is self.root
+	
+	def __ne__(self, other):
+		return not self == other
+	
+	def __copy__(self):
+		return self
+	
+	def __deepcopy__(self, memo):
+		return self
+
+
+#values which can't change, other values than these, schemas and observable
+#containers can't be cached
+_IMMUTABLE_TYPES = _PRIMITIVE_TYPES + (datetime.date, datetime.time, type, 
+									FrozenSchema)
+
+
+def _observe_tree(root, observer):
+	"""
+	adds `observer` to `root` and all schemas and containers it contains,
+	returns False if it contains values whose changes aren't notified
+	"""
+	seen = set()
+	stack = [root]
+	while stack:
+		value = stack.pop()
+		if isinstance(value, _IMMUTABLE_TYPES) or id(value) in seen:
+			continue
+		seen.add(id(value))
+		
+		if isinstance(value, Schema):
+			stack.extend(getattr(value, attr_name, None) 
+						for attr_name, attr_type in schema_fields(type(value)))
+		elif isinstance(value, ObservableList):
+			stack.extend(value)
+		elif isinstance(value, ObservableDict):
+			stack.extend(value.itervalues())
+		else:
+			return False
+		
+		if value.__observers__ is None:
+			object.__setattr__(value, '__observers__', _Observers([observer]))
+		elif observer not in value.__observers__:
+			value.__observers__.append(observer)
+		else:
+			continue
+		observer.observed.append(value)
+	return True
+
+
 class SchemaConverter(Converter):
 	"""
 	Convert basic schema classes
@@ -341,61 +1442,531 @@ class SchemaConverter(Converter):
 	def to_flat(cls, obj_type, obj, val, cm):
 		if obj == None:
 			return None
+		if val == None and isinstance(obj, FrozenSchema):
+			return cls._frozen_to_flat(obj_type, obj, cm)
+		if val == None and getattr(obj, '__cache_flat__', False) and hasattr(obj, '__dict__'):
+			return cls._cached_to_flat(obj_type, obj, cm)
+		return cls._memo_to_flat(obj_type, obj, val, cm)
+	
+	@classmethod
+	def _frozen_to_flat(cls, obj_type, obj, cm):
+		#frozen instances keep their flat dict, only outdated by converter
+		#and schema changes
+		if cls._memoized(obj_type, obj, cm):
+			return cls._memo_to_flat(obj_type, obj, None, cm)
+		cached = obj.__dict__.get('__flat__')
+		if cached is not None and cached[0] == ConvertManager._generation and \
+			cached[1] is cm._cache_owner and cached[2] is obj_type:
+			return cls._from_cache(obj_type, obj, cached[3], cm)
+		flat_dict = cls._memo_to_flat(obj_type, obj, None, cm)
+		object.__setattr__(obj, '__flat__', (ConvertManager._generation, 
+						cm._cache_owner, obj_type, _copy_flat(flat_dict)))
+		return flat_dict
+	
+	@classmethod
+	def _cached_to_flat(cls, obj_type, obj, cm):
+		#copies of obj share the cache entry but aren't observed by it
+		if cls._memoized(obj_type, obj, cm):
+			return cls._memo_to_flat(obj_type, obj, None, cm)
+		cached = obj.__dict__.get('__flat__')
+		if cached is not None and cached[0] == ConvertManager._generation and \
+			cached[1] is cm._cache_owner and cached[2] is obj_type and \
+			cached[3].root is obj:
+			return cls._from_cache(obj_type, obj, cached[4], cm)
+		flat_dict = cls._memo_to_flat(obj_type, obj, None, cm)
+		observer = _Invalidate(obj)
+		if _observe_tree(obj, observer):
+			object.__setattr__(obj, '__flat__', (ConvertManager._generation, 
+							cm._cache_owner, obj_type, observer, _copy_flat(flat_dict)))
+		else:
+			observer.release()
+		return flat_dict
+	
+	@classmethod
+	def _memoized(cls, obj_type, obj, cm):
+		memo = getattr(cm, 'flat_memo', None)
+		return memo is not None and (id(obj), id(obj_type)) in memo
+	
+	@classmethod
+	def _from_cache(cls, obj_type, obj, cached_flat, cm):
+		#the flat dicts kept on the instances are never handed out, with
+		#memo='share' a copy is shared within the current call only
+		flat_dict = _copy_flat(cached_flat)
+		memo = getattr(cm, 'flat_memo', None)
+		if memo is None:
+			return flat_dict
+		memo[(id(obj), id(obj_type))] = flat_dict
+		if cm.flat_memo_share:
+			return flat_dict
+		return _copy_flat(flat_dict)
+	
+	@classmethod
+	def _memo_to_flat(cls, obj_type, obj, val, cm):
+		memo = getattr(cm, 'flat_memo', None)
+		if memo is None or val != None:
+			return cls._to_flat(obj_type, obj, val, cm)
+		
+		key = (id(obj), id(obj_type))
+		if key in memo:
+			if cm.flat_memo_share:
+				return memo[key]
+			return _copy_flat(memo[key])
+		if id(obj) in cm.flat_active:
+			raise CircularReferenceError('Circular reference to ' + repr(obj))
+		
+		cm.flat_active.add(id(obj))
+		try:
+			flat_dict = cls._to_flat(obj_type, obj, val, cm)
+		finally:
+			cm.flat_active.discard(id(obj))
+		memo[key] = flat_dict
+		if cm.flat_memo_share:
+			return flat_dict
+		return _copy_flat(flat_dict)
+	
+	@classmethod
+	def _to_flat(cls, obj_type, obj, val, cm):
 		if val == None:
 			flat_dict = {}
 		else:
 			flat_dict = val
+		plan = schema_plan(obj_type, cm)
+		if plan.subtypes is not None and type(obj) is not plan.obj_class:
+			plan = schema_plan(type(obj), cm)
+		return cls._flat_plan(plan, obj, flat_dict, cm)
+	
+	@classmethod
+	def _flat_plan(cls, plan, obj, flat_dict, cm):
+		plan.flat_passthrough(obj, flat_dict)
+		if plan.discriminator_value is not None:
+			flat_dict[plan.discriminator] = plan.discriminator_value
+		if plan.version is not None:
+			flat_dict[plan.version_key] = plan.version
 		
-		for attr_name in dir(obj_type):
-			if hasattr(obj, attr_name):
-				attr_value = getattr(obj, attr_name)
-				attr_type = getattr(obj_type, attr_name)
-				if not attr_name.startswith('__') and not inspect.ismethod(attr_value):
-					
-					#set None if types are still present in the object
-					# and these are types and not objects
-					if attr_value == attr_type and inspect.isclass(attr_value):
-						attr_value = None
-						
-					check_type(attr_type, attr_value, cm)
-					
-					sub_val = None
-					if attr_name in flat_dict:
-						sub_val = flat_dict[attr_name]
-					
-					attr_value = flatit(attr_value, attr_type, sub_val, cm)
-					
-					flat_dict[attr_name] = attr_value
+		for attr_name, attr_type, resolved in plan.converted:
+			attr_value = getattr(obj, attr_name, _MISSING)
+			if attr_value is _MISSING:
+				continue
+			
+			#set None if types are still present in the object
+			# and these are types and not objects
+			if is_unset(attr_value, attr_type):
+				attr_value = None
+				
+			resolved.check(attr_value, cm)
+			flat_dict[attr_name] = resolved.to_flat(attr_value, flat_dict.get(attr_name), cm)
 		return flat_dict
 	
 	@classmethod
 	def to_obj(cls, obj_type, val, obj, cm):
 		if val == None:
 			return None
+		plan = schema_plan(obj_type, cm)
+		if plan.subtypes is not None:
+			sub_class = plan.subtype(val)
+			if sub_class is not plan.obj_class:
+				obj_type = sub_class
+				plan = schema_plan(sub_class, cm)
+				if not isinstance(obj, sub_class):
+					obj = None
+		obj_class = plan.obj_class
+		if issubclass(obj_class, FrozenSchema):
+			return cls._frozen_to_obj(obj_type, val, cm)
 		if obj == None:
-			cls_obj = obj_type() if inspect.isclass(obj_type) else type(obj_type)()
+			cls_obj = obj_class()
 		else:
 			cls_obj = obj
 
-		#iterate all attributes
-		for attr_name in dir(obj_type):
-			attr_type = getattr(obj_type, attr_name)
-			if not attr_name.startswith('__') and not inspect.ismethod(attr_type):
-				#set attr the value of the flat_dict if exists
-				flat_val = None
-				if attr_name in val:
-					flat_val = val[attr_name]
-					
-					sub_obj = None
-					if hasattr(cls_obj, attr_name):
-						sub_obj = getattr(cls_obj, attr_name)
-					
-					conv_attr_value = unflatit(flat_val, attr_type, sub_obj, cm)
-					check_type(attr_type, conv_attr_value, cm)
-				
-					setattr(cls_obj, attr_name, conv_attr_value)
+		if plan.version is not None:
+			val = migrate(val, obj_type)
+		return cls._load(plan, val, cls_obj, obj == None, cm)
+	
+	@classmethod
+	def _frozen_to_obj(cls, obj_type, val, cm):
+		plan = schema_plan(obj_type, cm)
+		if plan.version is not None:
+			val = migrate(val, obj_type)
+		try:
+			key = (plan.obj_class, cm._cache_owner, ConvertManager._generation, 
+				_freeze_flat(val))
+			hash(key)
+		except TypeError:
+			#flat dicts with unhashable values aren't interned
+			key = None
+		if key is not None:
+			shared = _interned.get(key)
+			if shared is not None:
+				return shared
+		
+		cls_obj = cls._load(plan, val, plan.obj_class.__new__(plan.obj_class), True, cm)
+		object.__setattr__(cls_obj, '__frozen__', True)
+		if key is not None:
+			_interned[key] = cls_obj
+		return cls_obj
+	
+	@classmethod
+	def _load(cls, plan, val, cls_obj, new, cm):
+		plan.load_passthrough(val, cls_obj, new)
+		
+		#iterate all converted attributes
+		for attr_name, attr_type, resolved in plan.converted:
+			#set attr the value of the flat_dict if exists
+			if attr_name in val:
+				sub_obj = reusable(attr_type, getattr(cls_obj, attr_name, None))
+				conv_attr_value = resolved.to_obj(val[attr_name], sub_obj, cm)
+				resolved.check(conv_attr_value, cm)
+				setattr(cls_obj, attr_name, conv_attr_value)
 		return cls_obj
 
+
+class SchemaPlan(object):
+	"""
+	The attributes of a :class:`Schema` class classified once by how they
+	are converted. Plans are created and cached by :func:`schema_plan`.
+	
+	Attributes:
+		passthrough: `(attr_name, attr_type, type_class)` tuples of the
+			attributes without converter (e.g. `int`, `str`), these are
+			copied in bulk
+		converted: `(attr_name, attr_type, resolved)` tuples of the attributes
+			with a converter or without a type, `resolved` is a
+			:class:`ResolvedType`
+	"""
+	
+	def __init__(self, obj_type, cm):
+		self.obj_class = obj_type if inspect.isclass(obj_type) else type(obj_type)
+		self.version = getattr(self.obj_class, '__schema_version__', None)
+		self.version_key = getattr(self.obj_class, '__version_key__', None)
+		self.discriminator = getattr(self.obj_class, '__discriminator__', None)
+		self.discriminator_value = getattr(self.obj_class, '__discriminator_value__', None)
+		self.subtypes = getattr(self.obj_class, '__subtypes__', None)
+		self.passthrough = []
+		self.converted = []
+		for attr_name, attr_type in schema_fields(obj_type):
+			resolved = ResolvedType(attr_type, cm)
+			if resolved.flat_passthrough:
+				self.passthrough.append((attr_name, attr_type, resolved.type_class))
+			else:
+				self.converted.append((attr_name, attr_type, resolved))
+		
+		#values of the never set attributes are the class attributes, types
+		#are flattened to None
+		self._defaults = []
+		for attr_name, attr_type, type_class in self.passthrough:
+			default = getattr(self.obj_class, attr_name, None)
+			if is_unset(default, attr_type):
+				default = None
+			self._defaults.append((attr_name, default))
+		self._checked = [(attr_name, attr_type, type_class) 
+						for attr_name, attr_type, type_class in self.passthrough
+						if type_class is not None]
+		#new instances have no observers and new FrozenSchema instances are
+		#not frozen yet, with these __setattr__ their __dict__ can be updated
+		#directly
+		self._plain_setattr = getattr(self.obj_class.__setattr__, 'im_func', None) \
+			in (Schema.__dict__['__setattr__'], FrozenSchema.__dict__['__setattr__'])
+	
+	def subtype(self, val):
+		"""
+		returns the class of the flattened dict `val` named by its
+		discriminator, the class of the plan if it has none
+		"""
+		value = val.get(self.discriminator)
+		if value is None or value == self.discriminator_value:
+			return self.obj_class
+		sub_class = self.subtypes.get(value)
+		if sub_class is None or not issubclass(sub_class, self.obj_class):
+			raise ValueError('Unknown ' + self.discriminator + ' ' + repr(value) + 
+							' for ' + self.obj_class.__name__)
+		return sub_class
+	
+	def kind(self, attr_name):
+		"""
+		returns how the attribute `attr_name` is converted, one of
+		'passthrough', 'schema' or 'converter'
+		"""
+		for name, attr_type, resolved in self.converted:
+			if name == attr_name:
+				if resolved.conv is SchemaConverter:
+					return 'schema'
+				return 'converter'
+		for name, attr_type, type_class in self.passthrough:
+			if name == attr_name:
+				return 'passthrough'
+		raise AttributeError('Attribute ' + attr_name + ' not exists')
+	
+	def flat_passthrough(self, obj, flat_dict):
+		"""copies the passthrough attributes of `obj` into `flat_dict`"""
+		obj_dict = getattr(obj, '__dict__', None)
+		if type(obj) is self.obj_class and obj_dict is not None:
+			flat_dict.update([(attr_name, obj_dict.get(attr_name, default))
+							for attr_name, default in self._defaults])
+		else:
+			#subclass instances may override defaults, slots have no __dict__
+			for attr_name, default in self._defaults:
+				value = getattr(obj, attr_name, _MISSING)
+				if value is not _MISSING:
+					flat_dict[attr_name] = value
+		
+		for attr_name, attr_type, type_class in self._checked:
+			value = flat_dict.get(attr_name)
+			if value is not None and not isinstance(value, type_class):
+				if is_unset(value, attr_type):
+					flat_dict[attr_name] = None
+				else:
+					raise TypeError(str(value.__class__) + " != " + str(type_class))
+	
+	def load_passthrough(self, val, obj, new):
+		"""
+		copies the passthrough attributes in `val` to `obj`, `new` tells if
+		`obj` was just created
+		"""
+		values = [(attr_name, val[attr_name]) for attr_name, attr_type, type_class 
+				in self.passthrough if attr_name in val]
+		for attr_name, attr_type, type_class in self._checked:
+			if attr_name in val:
+				value = val[attr_name]
+				if value is not None and not isinstance(value, type_class):
+					raise TypeError(str(value.__class__) + " != " + str(type_class))
+		
+		obj_dict = getattr(obj, '__dict__', None)
+		if new and obj_dict is not None and self._plain_setattr and \
+			type(obj) is self.obj_class:
+			obj_dict.update(values)
+		else:
+			for attr_name, value in values:
+				setattr(obj, attr_name, value)
+
+
+def schema_plan(obj_type, cm):
+	"""
+	returns the cached :class:`SchemaPlan` of the :class:`Schema` class
+	`obj_type`
+	"""
+	if not inspect.isclass(obj_type):
+		return SchemaPlan(obj_type, cm)
+	try:
+		return cm._plan_cache[obj_type]
+	except KeyError:
+		plan = cm._plan_cache[obj_type] = SchemaPlan(obj_type, cm)
+		return plan
+
+
+def _projection_tree(paths):
+	#dotted paths to a nested dict, None marks whole attributes
+	if paths is None:
+		return None
+	if isinstance(paths, basestring):
+		paths = [paths]
+	tree = {}
+	for path in paths:
+		parts = path.split('.')
+		node = tree
+		for part in parts[:-1]:
+			if part in node and node[part] is None:
+				break
+			node = node.setdefault(part, {})
+		else:
+			node[parts[-1]] = None
+	return tree
+
+
+def _project(plan, only, exclude, cm, strict=True):
+	#a copy of plan restricted to the attributes selected by the trees,
+	#paths to attributes of polymorphic schemas may name attributes of any
+	#subtype, these are ignored in the projections of the other subtypes
+	if strict:
+		names = set(attr_name for attr_name, attr_type, entry 
+					in plan.passthrough + plan.converted)
+		for sub_class in (plan.subtypes or {}).values():
+			names.update(attr_name for attr_name, attr_type in schema_fields(sub_class))
+		for tree in (only, exclude):
+			for attr_name in tree or ():
+				if attr_name not in names:
+					raise AttributeError('Attribute ' + attr_name + ' not exists')
+	
+	def sub_trees(attr_name):
+		#returns None if the attribute is left out, otherwise the trees for
+		#its value
+		sub_only = sub_exclude = None
+		if only is not None:
+			if attr_name not in only:
+				return None
+			sub_only = only[attr_name]
+		if exclude is not None and attr_name in exclude:
+			if exclude[attr_name] is None:
+				return None
+			sub_exclude = exclude[attr_name]
+		return sub_only, sub_exclude
+	
+	projected = SchemaPlan.__new__(SchemaPlan)
+	projected.__dict__.update(plan.__dict__)
+	projected.passthrough = []
+	for attr_name, attr_type, type_class in plan.passthrough:
+		trees = sub_trees(attr_name)
+		if trees is None:
+			continue
+		if trees != (None, None):
+			raise TypeError('Can\'t project into attribute ' + attr_name)
+		projected.passthrough.append((attr_name, attr_type, type_class))
+	projected.converted = []
+	for attr_name, attr_type, resolved in plan.converted:
+		trees = sub_trees(attr_name)
+		if trees is None:
+			continue
+		if trees != (None, None):
+			resolved = ProjectedType(resolved, trees[0], trees[1], cm)
+		projected.converted.append((attr_name, attr_type, resolved))
+	
+	kept = set(attr_name for attr_name, attr_type, type_class in projected.passthrough)
+	projected._defaults = [entry for entry in plan._defaults if entry[0] in kept]
+	projected._checked = [entry for entry in plan._checked if entry[0] in kept]
+	projected._trees = (only, exclude)
+	projected._subtype_plans = {}
+	return projected
+
+
+def _instance_plan(plan, obj, cm):
+	#the projected plan of the subtype of obj, like SchemaConverter._to_flat
+	#does for complete plans
+	if plan.subtypes is None or type(obj) is plan.obj_class:
+		return plan
+	obj_class = type(obj)
+	try:
+		return plan._subtype_plans[obj_class]
+	except KeyError:
+		only, exclude = plan._trees
+		sub_plan = _project(schema_plan(obj_class, cm), only, exclude, cm, False)
+		plan._subtype_plans[obj_class] = sub_plan
+		return sub_plan
+
+
+def projection_plan(obj_type, cm, only=None, exclude=None):
+	"""
+	returns the cached :class:`SchemaPlan` of the :class:`Schema` class
+	`obj_type` restricted to a projection, see :func:`flatit`
+	
+	Args:
+		only: the dotted paths of the attributes to keep, or None for all
+		exclude: the dotted paths of the attributes to leave out
+	"""
+	if isinstance(only, basestring):
+		only = [only]
+	if isinstance(exclude, basestring):
+		exclude = [exclude]
+	key = (obj_type, 
+		None if only is None else tuple(only), 
+		None if exclude is None else tuple(exclude))
+	try:
+		return cm._plan_cache[key]
+	except (KeyError, TypeError):
+		plan = _project(schema_plan(obj_type, cm), _projection_tree(only), 
+					_projection_tree(exclude), cm)
+		if inspect.isclass(obj_type):
+			cm._plan_cache[key] = plan
+		return plan
+
+
+class ProjectedType(object):
+	"""
+	A :class:`ResolvedType` whose values are flattened with a projection.
+	Projections of lists and dicts apply to their items.
+	"""
+	__slots__ = ('resolved', 'plan', 'items')
+	
+	def __init__(self, resolved, only, exclude, cm):
+		self.resolved = resolved
+		self.plan = self.items = None
+		attr_type = resolved.attr_type
+		if resolved.conv is SchemaConverter:
+			self.plan = _project(schema_plan(attr_type, cm), only, exclude, cm)
+		elif resolved.conv is TypedListConverter:
+			self.items = ProjectedType(ResolvedType(item_type(attr_type), cm),
+									only, exclude, cm)
+		elif resolved.conv is TypedDictConverter and hasattr(attr_type, 'ftype'):
+			self.items = ProjectedType(ResolvedType(attr_type.ftype, cm), 
+									only, exclude, cm)
+		else:
+			raise TypeError('Can\'t project into ' + repr(attr_type))
+	
+	def check(self, value, cm):
+		self.resolved.check(value, cm)
+	
+	def to_flat(self, obj, val, cm):
+		if obj is None or is_unset(obj, self.resolved.attr_type):
+			return None
+		if self.plan is not None:
+			return SchemaConverter._flat_plan(_instance_plan(self.plan, obj, cm), obj, {}, cm)
+		items = self.items
+		if isinstance(obj, dict):
+			flat_dict = {}
+			for key, item in obj.iteritems():
+				items.check(item, cm)
+				flat_dict[key] = items.to_flat(item, None, cm)
+			return flat_dict
+		flat_list = []
+		for item in obj:
+			items.check(item, cm)
+			flat_list.append(items.to_flat(item, None, cm))
+		return flat_list
+
+
+class ResolvedType(object):
+	"""
+	The type of an attribute or of the items of a container with its
+	converter resolved once, used instead of a converter lookup per value.
+	
+	Values without a converter are passed through unchanged, in this case
+	only their type is checked.
+	"""
+	__slots__ = ('attr_type', 'conv', 'check_conv', 'type_class')
+	
+	def __init__(self, attr_type, cm):
+		self.attr_type = attr_type
+		self.conv = cm.get_converter(attr_type)
+		#same decisions as ConvertManager.check_type
+		self.check_conv = self.conv if attr_type else None
+		if attr_type == None or attr_type == types.NoneType:
+			self.type_class = None
+		else:
+			self.type_class = attr_type if inspect.isclass(attr_type) else attr_type.__class__
+	
+	@property
+	def flat_passthrough(self):
+		"""True if the values are flat already"""
+		return self.conv is None and self.attr_type is not None
+	
+	@property
+	def obj_passthrough(self):
+		"""True if the flat values are the objects already"""
+		return self.conv is None
+	
+	def check(self, value, cm):
+		if self.check_conv is not None:
+			self.check_conv.check_type(self.attr_type, value, cm)
+		elif self.type_class is not None and value is not None and \
+			not isinstance(value, self.type_class):
+			raise TypeError(str(value.__class__) + " != " + str(self.type_class))
+	
+	def check_all(self, values, cm):
+		if self.check_conv is not None or self.type_class is not None:
+			for value in values:
+				self.check(value, cm)
+	
+	def to_flat(self, obj, val, cm):
+		if self.attr_type is None:
+			#untyped values are converted according to their own type
+			return flatit(obj, None, val, cm)
+		if self.conv is None:
+			return obj
+		return self.conv.to_flat(self.attr_type, obj, val, cm)
+	
+	def to_obj(self, val, obj, cm):
+		if self.conv is None:
+			return val
+		return self.conv.to_obj(self.attr_type, val, obj, cm)
+
+
 class TypedListConverter(Converter):
 	"""
 	Convert TypedList classes
@@ -420,20 +1991,20 @@ class TypedListConverter(Converter):
 		else:
 			flat_list = val
 
-		def get_sub_type(idx):
-			sub_type = None
-			if hasattr(obj_type, 'ftype'):
-				sub_type = obj_type.ftype
-			elif isinstance(obj_type, list) and len(obj_type) > idx:
-				sub_type = obj_type[idx]
-			return sub_type
-			
+		try:
+			items = ResolvedType(item_type(obj_type), cm)
+		except KeyError:
+			items = ResolvedType(None, cm)
 
 		check_type(obj_type, obj, cm)
 
-		for item in obj:
-			check_type(get_sub_type(0), item, cm)
-			flat_list.append(flatit(item, get_sub_type(0), None, cm))
+		if items.flat_passthrough:
+			items.check_all(obj, cm)
+			flat_list.extend(obj)
+		else:
+			for item in obj:
+				items.check(item, cm)
+				flat_list.append(items.to_flat(item, None, cm))
 		return flat_list
 	
 	@classmethod
@@ -445,22 +2016,164 @@ class TypedListConverter(Converter):
 		else:
 			cls_obj = obj
 		
-		def get_sub_type(idx, v):
-			if hasattr(obj_type, 'ftype'):
-				sub_type = obj_type.ftype
-			elif isinstance(obj_type, list) and len(obj_type) > idx:
-				sub_type = obj_type[idx]
+		try:
+			items = ResolvedType(item_type(obj_type), cm)
+		except KeyError:
+			if len(val) > 0:
+				raise Exception('Can\'t guess type associated with: "'  + val[0] + '"')
+			items = ResolvedType(None, cm)
+		
+		if items.obj_passthrough:
+			items.check_all(val, cm)
+			cls_obj[:] = val
+			return cls_obj
+		
+		#existing items are refreshed in place, the list is resized to val
+		old_len = len(cls_obj)
+		sub_type = items.attr_type
+		for idx, item in enumerate(val):
+			if idx < old_len:
+				ret_item = items.to_obj(item, reusable(sub_type, cls_obj[idx]), cm)
+				items.check(ret_item, cm)
+				cls_obj[idx] = ret_item
 			else:
-				raise Exception('Can\'t guess type associated with: "'  + v + '"')
-			return sub_type
-			
-		for item in val:
-			ret_item = unflatit(item, get_sub_type(0, item), None, cm)
-			check_type(get_sub_type(0, item), ret_item, cm)
-			cls_obj.append(ret_item)
+				ret_item = items.to_obj(item, None, cm)
+				items.check(ret_item, cm)
+				cls_obj.append(ret_item)
+		del cls_obj[len(val):]
 		return cls_obj
 	
 	
+class ColumnListConverter(Converter):
+	"""
+	Convert ColumnList classes
+	
+	"""
+	
+	@classmethod
+	def check_type(cls, attr_type, attr_value, cm):
+		attr_type = attr_type if inspect.isclass(attr_type) else type(attr_type)
+		if not(issubclass(type(attr_value), attr_type) \
+			 or issubclass(type(attr_value), list) \
+			 or type(attr_value) == types.NoneType):
+			raise TypeError(repr(type(attr_value)) + '!=' + repr(attr_type))
+	
+	@classmethod
+	def to_flat(cls, obj_type, obj, val, cm):
+		if obj == None:
+			return None
+		if val == None:
+			flat_list = []
+		else:
+			flat_list = val
+		
+		check_type(obj_type, obj, cm)
+		
+		if isinstance(obj, ColumnStore):
+			#the rows are already flat
+			flat_list.extend(obj.iterflat())
+		else:
+			for item in obj:
+				check_type(obj_type.ftype, item, cm)
+				flat_list.append(flatit(item, obj_type.ftype, None, cm))
+		return flat_list
+	
+	@classmethod
+	def to_obj(cls, obj_type, val, obj, cm):
+		if val == None:
+			return None
+		if obj == None or not isinstance(obj, ColumnStore):
+			cls_obj = obj_type() if inspect.isclass(obj_type) else type(obj_type)()
+		else:
+			cls_obj = obj
+			cls_obj.clear()
+		cls_obj.load_flat(val)
+		return cls_obj
+	
+	
+def _import_numpy():
+	try:
+		import numpy
+	except ImportError:
+		raise ImportError('numpy is required to convert NumArray attributes')
+	return numpy
+
+
+class NumArrayConverter(Converter):
+	"""
+	Convert NumArray classes
+	
+	"""
+	
+	@classmethod
+	def _as_array(cls, obj_type, values):
+		numpy = _import_numpy()
+		dtype = numpy.dtype(obj_type.ftype)
+		arr = numpy.asarray(values)
+		if arr.size == 0:
+			return arr.astype(dtype)
+		if not numpy.can_cast(arr.dtype, dtype, 'same_kind'):
+			raise TypeError(repr(arr.dtype) + '!=' + repr(dtype))
+		if arr.dtype != dtype:
+			arr = arr.astype(dtype)
+		return arr
+	
+	@classmethod
+	def check_type(cls, attr_type, attr_value, cm):
+		if attr_value is None or isinstance(attr_value, (list, tuple)):
+			return
+		if not isinstance(attr_value, _import_numpy().ndarray):
+			raise TypeError(repr(type(attr_value)) + '!= numpy.ndarray')
+	
+	@classmethod
+	def to_flat(cls, obj_type, obj, val, cm):
+		if obj is None:
+			return None
+		arr = cls._as_array(obj_type, obj)
+		if obj_type.encoding == 'list':
+			return arr.tolist()
+		if arr.ndim != 1:
+			raise TypeError('only one dimensional arrays can be flattened to ' 
+						+ obj_type.encoding)
+		raw = arr.tostring()
+		if obj_type.encoding == 'base64':
+			return base64.b64encode(raw)
+		return raw
+	
+	@classmethod
+	def to_obj(cls, obj_type, val, obj, cm):
+		if val is None:
+			return None
+		numpy = _import_numpy()
+		if obj_type.encoding == 'list':
+			arr = cls._as_array(obj_type, val)
+		else:
+			if not isinstance(val, basestring):
+				raise TypeError(repr(type(val)) + '!= basestring')
+			dtype = numpy.dtype(obj_type.ftype)
+			if obj_type.encoding == 'base64':
+				try:
+					val = base64.b64decode(val)
+				except (TypeError, ValueError) as e:
+					raise TypeError('invalid base64 data: ' + str(e))
+			elif not isinstance(val, str):
+				raise TypeError(repr(type(val)) + '!= str')
+			if len(val) % dtype.itemsize:
+				raise TypeError(repr(len(val)) + ' bytes is not a multiple of ' 
+							+ repr(dtype.itemsize) + ' (' + str(dtype) + ')')
+			#frombuffer returns a read only view on the buffer
+			arr = numpy.frombuffer(val, dtype=dtype)
+		
+		if isinstance(obj, numpy.ndarray) and obj.shape == arr.shape and \
+			obj.dtype == arr.dtype and obj.flags.writeable:
+			#refresh the existing array in place
+			obj[...] = arr
+			return obj
+		if not arr.flags.writeable:
+			arr = arr.copy()
+		return arr
+	
+
 class TypedDictConverter(Converter):
 	"""
 	Convert TypedList classes
@@ -485,23 +2198,30 @@ class TypedDictConverter(Converter):
 		else:
 			flat_dict = val
 		
-		def get_sub_type(elem):
-			sub_type = None
-			if hasattr(obj_type, 'ftype'):
-				sub_type = obj_type.ftype
-			elif isinstance(obj_type, dict) and elem in obj_type:
-				sub_type = obj_type[elem]
-			return sub_type
-
 		check_type(obj_type, obj, cm)
-		for k, v in obj.items():
-			check_type(get_sub_type(k), v, cm)
-			
-			sub_val = None
-			if k in flat_dict:
-				sub_val = flat_dict[k]
-			
-			flat_dict[k] = flatit(v, get_sub_type(k), sub_val, cm)
+		
+		if hasattr(obj_type, 'ftype'):
+			items = ResolvedType(obj_type.ftype, cm)
+			if items.flat_passthrough:
+				items.check_all(obj.itervalues(), cm)
+				flat_dict.update(obj)
+				return flat_dict
+			get_items = lambda k: items
+		else:
+			#per key types, only resolved for the keys present
+			resolved = {}
+			def get_items(k):
+				if k not in resolved:
+					try:
+						resolved[k] = ResolvedType(item_type(obj_type, k), cm)
+					except KeyError:
+						resolved[k] = ResolvedType(None, cm)
+				return resolved[k]
+		
+		for k, v in obj.iteritems():
+			items = get_items(k)
+			items.check(v, cm)
+			flat_dict[k] = items.to_flat(v, flat_dict.get(k), cm)
 		return flat_dict
 	
 	@classmethod
@@ -513,32 +2233,76 @@ class TypedDictConverter(Converter):
 		else:
 			cls_obj = obj
 		
-		def get_sub_type(elem, v):
-			if hasattr(obj_type, 'ftype'):
-				sub_type = obj_type.ftype
-			elif isinstance(obj_type, dict) and elem in obj_type:
-				sub_type = obj_type[elem]
-			else:
-				raise Exception('Can\'t guess type associated with: "'  + v + '"')
-			return sub_type
+		if hasattr(obj_type, 'ftype'):
+			items = ResolvedType(obj_type.ftype, cm)
+			if items.obj_passthrough:
+				items.check_all(val.itervalues(), cm)
+				if cls_obj:
+					cls_obj.clear()
+				cls_obj.update(val)
+				return cls_obj
+			get_items = lambda k, v: items
+		else:
+			resolved = {}
+			def get_items(k, v):
+				if k not in resolved:
+					try:
+						resolved[k] = ResolvedType(item_type(obj_type, k), cm)
+					except KeyError:
+						raise Exception('Can\'t guess type associated with: "'  + v + '"')
+				return resolved[k]
 		
-		for k, v in val.items():
-			sub_obj = None
-			if hasattr(cls_obj, k):
-				sub_obj = getattr(cls_obj, k)
-
-			ret_v = unflatit(v, get_sub_type(k, v), sub_obj, cm)
-
-			check_type(get_sub_type(k, v), ret_v, cm)
+		for k, v in val.iteritems():
+			items = get_items(k, v)
+			if items.obj_passthrough:
+				ret_v = v
+			else:
+				ret_v = items.to_obj(v, reusable(items.attr_type, cls_obj.get(k)), cm)
+			items.check(ret_v, cm)
 			cls_obj[k] = ret_v
+		
+		#entries missing in val are removed when refreshing an existing dict
+		if len(cls_obj) != len(val):
+			for k in cls_obj.keys():
+				if k not in val:
+					del cls_obj[k]
 		return cls_obj
 	
 
+class MetaConvertManager(type):
+	"""
+	Metaclass of :class:`ConvertManager`. Every manager class gets its own
+	caches, since subclasses may use other converters. Managers created by
+	:meth:`ConvertManager.derive` share the caches of their base.
+	"""
+	def __init__(cls, name, bases, dct):
+		super(MetaConvertManager, cls).__init__(name, bases, dct)
+		if '_converter_cache' not in dct:
+			cls._converter_cache = {}
+			cls._plan_cache = {}
+			cls._fingerprint_cache = {}
+			cls._cache_owner = cls
+		_managers.add(cls)
+
+
+#all manager classes, their caches are cleared when converters or schemas change
+_managers = weakref.WeakSet()
+
+
+def _clear_caches():
+	for manager in list(_managers):
+		manager._converter_cache.clear()
+		manager._plan_cache.clear()
+		manager._fingerprint_cache.clear()
+	ConvertManager._generation += 1
+
+
 class ConvertManager(object):
 	"""
 	Class for managing the converters
 	
 	"""
+	__metaclass__ = MetaConvertManager
 	
 	_convert_dict = {
 				datetime.date:{'conv':DateConverter, 'exact':True},
@@ -549,34 +2313,72 @@ class ConvertManager(object):
 				dict:{'conv':TypedDictConverter, 'exact':True},
 				TypedList:{'conv':TypedListConverter, 'exact':True},
 				list:{'conv':TypedListConverter, 'exact':True},
+				ColumnList:{'conv':ColumnListConverter, 'exact':True},
+				IndexedList:{'conv':TypedListConverter, 'exact':True},
+				NumArray:{'conv':NumArrayConverter, 'exact':True},
 			}
 	
+	#the caches of converters resolved by get_converter, schema plans of
+	#schema_plan and fingerprints of schema_fingerprint are set per manager
+	#class by MetaConvertManager, `_cache_owner` is the manager they belong to
+	
+	#changed with the converters and schema classes, outdates cached flat dicts
+	_generation = 0
+	
 	@classmethod
-	def to_flat(cls, obj_type, obj, val):
+	def get_converter(cls, obj_type):
 		"""
-		calls the right converter and converts to a flat type
+		looks up the converter responsible for `obj_type`
 	
 		Args:
-			val_type: the type of the object
-			
-			obj: the object which should be converted
+			obj_type: the type (or an instance of the type) from the schema
 			
 		Returns:
-			a converted primitive object"""
-
+			a subclass of :class:`Converter` or None if objects of `obj_type`
+			are not converted at all
+		"""
+		
 		obj_type_class = obj_type if inspect.isclass(obj_type) else obj_type.__class__
+		try:
+			return cls._converter_cache[obj_type_class]
+		except KeyError:
+			pass
+		
+		conv = None
 		for type in cls._convert_dict:
 			#String comparisson is okay here since we compare schema against
 			#object types which can differ in the ftype class variable therefore
 			#string compare is correct and direct type compare fails
 			if str(obj_type_class) == str(type):
-				return cls._convert_dict[type]['conv'].to_flat(obj_type, obj, val, cls)
+				conv = cls._convert_dict[type]['conv']
+				break
 		
-		for type in cls._convert_dict:
-			if cls._convert_dict[type]['exact'] == False and issubclass(obj_type_class, type):
-				return cls._convert_dict[type]['conv'].to_flat(obj_type, obj, val, cls)
+		if conv is None:
+			for type in cls._convert_dict:
+				if cls._convert_dict[type]['exact'] == False and issubclass(obj_type_class, type):
+					conv = cls._convert_dict[type]['conv']
+					break
+		
+		cls._converter_cache[obj_type_class] = conv
+		return conv
+	
+	@classmethod
+	def to_flat(cls, obj_type, obj, val):
+		"""
+		calls the right converter and converts to a flat type
+	
+		Args:
+			val_type: the type of the object
 			
-		return obj
+			obj: the object which should be converted
+			
+		Returns:
+			a converted primitive object"""
+
+		conv = cls.get_converter(obj_type)
+		if conv is None:
+			return obj
+		return conv.to_flat(obj_type, obj, val, cls)
 	
 	@classmethod
 	def to_obj(cls, obj_type, val, obj):
@@ -593,19 +2395,10 @@ class ConvertManager(object):
 			a converted high level schema object
 		"""
 		
-		obj_type_class = obj_type if inspect.isclass(obj_type) else obj_type.__class__
-		for type in cls._convert_dict:
-			#String comparisson is okay here since we compare schema against
-			#object types which can differ in the ftype class variable therefore
-			#string compare is correct and direct type compare fails
-			if str(obj_type_class) == str(type):
-				return cls._convert_dict[type]['conv'].to_obj(obj_type, val, obj, cls)
-		
-		for type in cls._convert_dict:
-			if cls._convert_dict[type]['exact'] == False and issubclass(obj_type_class, type):
-				return cls._convert_dict[type]['conv'].to_obj(obj_type, val, obj, cls)
-			
-		return val
+		conv = cls.get_converter(obj_type)
+		if conv is None:
+			return val
+		return conv.to_obj(obj_type, val, obj, cls)
 	
 	@classmethod
 	def check_type(cls, attr_type, attr_value):
@@ -621,19 +2414,11 @@ class ConvertManager(object):
 			None if everything is ok, otherwise raise TypeError
 		"""
 		if attr_type:
+			conv = cls.get_converter(attr_type)
+			if conv is not None:
+				conv.check_type(attr_type, attr_value, cls)
+				return
 			attr_type_class = attr_type if inspect.isclass(attr_type) else attr_type.__class__
-			for type in cls._convert_dict:
-				#String comparisson is okay here since we compare schema against
-				#object types which can differ in the ftype class variable therefore
-				#string compare is correct and direct type compare fails
-				if str(attr_type_class) == str(type):
-					cls._convert_dict[type]['conv'].check_type(attr_type, attr_value, cls)
-					return
-				
-			for type in cls._convert_dict:
-				if cls._convert_dict[type]['exact'] == False and issubclass(attr_type_class, type):
-					cls._convert_dict[type]['conv'].check_type(attr_type, attr_value, cls)
-					return
 		else:
 			attr_type_class = attr_type
 		_check_type(attr_value, attr_type_class)
@@ -660,6 +2445,7 @@ class ConvertManager(object):
 			cls._convert_dict[conv_type] = {}
 			cls._convert_dict[conv_type]['conv'] = converter
 			cls._convert_dict[conv_type]['exact'] = exact
+			_clear_caches()
 		else:
 			raise TypeError('Subclass of Converter expected')
 	
@@ -668,9 +2454,208 @@ class ConvertManager(object):
 		"""deletes the converter object for a given `conv_type`"""
 		if conv_type in cls._convert_dict:
 			del cls._convert_dict[conv_type]
+			_clear_caches()
+	
+	@classmethod
+	def derive(cls, **state):
+		"""
+		creates a ConvertManager carrying per-call state, the subclass of
+		`cls` is created once and reused by all calls
+		
+		Args:
+			state: attributes set on the derived ConvertManager
+			
+		Returns:
+			an instance of a subclass of `cls` which shares the converters
+			and caches of `cls`, the state is only seen by converters which
+			get the instance as `cm`
+		"""
+		derived = cls.__dict__.get('_derived')
+		if derived is None:
+			derived = type(cls)(cls.__name__, (cls,), dict(
+						_converter_cache=cls._converter_cache, _plan_cache=cls._plan_cache,
+						_fingerprint_cache=cls._fingerprint_cache))
+			cls._derived = derived
+		manager = derived()
+		manager.__dict__.update(state)
+		return manager
 		
 	
 
+def _describe_type(attr_type, cm, seen):
+	if not attr_type:
+		return repr(attr_type)
+	type_class = attr_type if inspect.isclass(attr_type) else attr_type.__class__
+	conv = cm.get_converter(attr_type)
+	
+	if conv is SchemaConverter:
+		if type_class in seen:
+			return '@' + type_class.__name__
+		seen = seen + (type_class,)
+		return type_class.__name__ + '(' + ','.join(attr_name + ':' +
+			_describe_type(sub_type, cm, seen) for attr_name, sub_type
+			in schema_fields(type_class)) + ')'
+	elif conv in (TypedListConverter, ColumnListConverter):
+		return '[' + _describe_type(item_type(attr_type, 0, None), cm, seen) + ']'
+	elif conv is TypedDictConverter:
+		if isinstance(attr_type, dict) and not hasattr(attr_type, 'ftype'):
+			return '{' + ','.join(str(k) + ':' + _describe_type(v, cm, seen)
+								for k, v in sorted(attr_type.items())) + '}'
+		return '{*:' + _describe_type(getattr(attr_type, 'ftype', None), cm, seen) + '}'
+	elif conv is NumArrayConverter:
+		return 'NumArray(' + str(attr_type.ftype) + ',' + attr_type.encoding + ')'
+	return type_class.__name__
+
+
+def schema_fingerprint(obj_type, cm = ConvertManager):
+	"""
+	computes a fingerprint of the layout of a :class:`Schema` class, it
+	changes if attributes (also of nested schemas) are added, removed,
+	renamed or change their type. It is stable across processes and can be
+	used to detect data written with an older version of the schema. The
+	fingerprint of a class with the default :class:`ConvertManager` is also
+	available as `cls.__fingerprint__`.
+	
+	Args:
+		obj_type: a :class:`Schema` class
+		
+	Returns:
+		a string of 16 hex digits
+	"""
+	obj_class = obj_type if inspect.isclass(obj_type) else type(obj_type)
+	try:
+		return cm._fingerprint_cache[obj_class]
+	except KeyError:
+		fingerprint = hashlib.md5(_describe_type(obj_class, cm, ())).hexdigest()[:16]
+		cm._fingerprint_cache[obj_class] = fingerprint
+		return fingerprint
+
+
+def _schema_name(cls):
+	#'module:Class' of classes which can be imported by name
+	module = sys.modules.get(cls.__module__)
+	if getattr(module, cls.__name__, None) is cls:
+		return cls.__module__ + ':' + cls.__name__
+	return None
+
+
+def _import_schema(name):
+	module_name, _, class_name = name.partition(':')
+	try:
+		__import__(module_name)
+		return getattr(sys.modules[module_name], class_name)
+	except (ImportError, AttributeError):
+		return None
+
+
+def _nested_types(attr_type):
+	if hasattr(attr_type, 'ftype'):
+		return [attr_type.ftype]
+	if isinstance(attr_type, list):
+		return attr_type[:1]
+	if isinstance(attr_type, dict):
+		return attr_type.values()
+	return []
+
+
+def warmup(targets=(), path=None, cm = ConvertManager):
+	"""
+	builds the cached plans, converter lookups and fingerprints of
+	:class:`Schema` classes ahead of their first use, e.g. at the startup
+	of worker processes or before forking them
+	
+		>>> import flatty
+		>>> import myapp.models
+		>>> 
+		>>> report = flatty.warmup([myapp.models], path='/var/cache/myapp/flatty.profile')
+		>>> report['classes'], report['seconds']
+		(42, 0.0123)
+	
+	Args:
+		targets: modules and :class:`Schema` classes, all schema classes
+			defined in the modules and all schemas nested in them are warmed
+		path: a profile file, the classes listed in it are warmed as well.
+			Afterwards the file is rewritten with all warmed classes and the
+			classes used by this process so far, see :func:`save_profile`.
+			(default=None)
+		
+	Returns:
+		a dict with the number of warmed `classes`, the `seconds` it took,
+		which is the latency saved on the first use of the classes, and the
+		profile entries which could not be imported as `missing`
+	"""
+	start = time.time()
+	classes = []
+	missing = []
+	for target in targets:
+		if isinstance(target, types.ModuleType):
+			classes.extend(value for value in vars(target).itervalues()
+						if inspect.isclass(value) and issubclass(value, Schema))
+		else:
+			classes.append(target)
+	if path is not None:
+		for name in _read_profile(path):
+			cls = _import_schema(name)
+			if cls is None:
+				missing.append(name)
+			else:
+				classes.append(cls)
+	
+	warmed = set()
+	while classes:
+		cls = classes.pop()
+		if cls in warmed or cls in (Schema, SlotsSchema, FrozenSchema):
+			continue
+		warmed.add(cls)
+		schema_plan(cls, cm)
+		schema_fingerprint(cls, cm)
+		classes.extend((cls.__subtypes__ or {}).itervalues())
+		attr_types = [attr_type for attr_name, attr_type in schema_fields(cls)]
+		while attr_types:
+			attr_type = attr_types.pop()
+			if attr_type and cm.get_converter(attr_type) is SchemaConverter:
+				classes.append(attr_type if inspect.isclass(attr_type) else type(attr_type))
+			else:
+				attr_types.extend(_nested_types(attr_type))
+	seconds = time.time() - start
+	
+	if path is not None:
+		save_profile(path, cm, warmed)
+	return {'classes':len(warmed), 'seconds':seconds, 'missing':missing}
+
+
+def _read_profile(path):
+	import json
+	try:
+		f = open(path)
+	except IOError:
+		return []
+	try:
+		return json.load(f)
+	except ValueError:
+		return []
+	finally:
+		f.close()
+
+
+def save_profile(path, cm = ConvertManager, classes=()):
+	"""
+	writes the names of the :class:`Schema` classes used by this process so
+	far and of `classes` to the profile file `path` read by :func:`warmup`,
+	e.g. when a worker process exits. Classes which can't be imported by
+	name, like classes defined in functions, are left out.
+	"""
+	import json
+	used = [key for key in cm._plan_cache.keys() if inspect.isclass(key)]
+	names = set(_schema_name(cls) for cls in list(classes) + used)
+	names.discard(None)
+	f = open(path, 'w')
+	try:
+		json.dump(sorted(names), f, indent=0)
+	finally:
+		f.close()
+
+
 def check_type(attr_type, attr_value, cm = ConvertManager):
 	"""
 	check the type of attr_value against attr_type
@@ -687,12 +2672,26 @@ def check_type(attr_type, attr_value, cm = ConvertManager):
 	cm.check_type(attr_type, attr_value)
 
 
-def flatit(obj, obj_type=None, val=None, cm = ConvertManager):
+def flatit(obj, obj_type=None, val=None, cm = ConvertManager, memo=None, 
+		only=None, exclude=None):
 	"""
 	one way to flatten the `obj`
 	
 		Args:
 			obj: a :class:`Schema` instance which will be flatted
+			memo: if set, :class:`Schema` instances occurring several times
+				in the graph of `obj` are flattened only once. With 'share'
+				every occurrence gets the same flat dict, with 'copy' every
+				occurrence gets its own copy of the memoized flat dict.
+				Additionally a :class:`CircularReferenceError` is raised for
+				cyclic graphs. (default=None)
+			only: the attributes to flatten, a list of dotted paths like
+				`'author.name'`. Paths into lists and dicts select the
+				attributes of their items, paths into polymorphic schemas
+				may name attributes of their subtypes. (default=None, all
+				attributes)
+			exclude: the dotted paths of the attributes to leave out, these
+				are never visited (default=None)
 	
 		Returns:
 			a dict where the obj is flattened to primitive types
@@ -700,7 +2699,21 @@ def flatit(obj, obj_type=None, val=None, cm = ConvertManager):
 	
 	if obj_type == None:
 		obj_type = type(obj)
-	return cm.to_flat(obj_type, obj, val)
+	if memo != None:
+		if memo not in ('share', 'copy'):
+			raise ValueError('memo must be one of None, "share" or "copy"')
+		cm = cm.derive(flat_memo={}, flat_memo_share=(memo == 'share'),
+					flat_active=set())
+	if only is not None or exclude is not None:
+		if obj == None:
+			return None
+		plan = _instance_plan(projection_plan(obj_type, cm, only, exclude), obj, cm)
+		return SchemaConverter._flat_plan(plan, obj, {} if val == None else val, cm)
+	#the converter gets the derived manager itself, cm.to_flat would pass its class
+	conv = cm.get_converter(obj_type)
+	if conv is None:
+		return obj
+	return conv.to_flat(obj_type, obj, val, cm)
 
 
 def unflatit(val, obj_type, obj=None, cm = ConvertManager):
@@ -712,6 +2725,10 @@ def unflatit(val, obj_type, obj=None, cm = ConvertManager):
 				the `cls_or_obj`
 			cls_or_obj: the class from which the instance is builded, or an
 				an existing instance where the data is merged
+			obj: an existing instance which is refreshed in place. Nested
+				schema instances, list items and dict entries are reused,
+				lists are resized and dict entries missing in `val` are
+				removed. (default=None)
 			
 		Returns:
 			an instance of type `cls`
@@ -0,0 +1,221 @@
+"""
+This module exports and imports collections of :class:`Schema` objects as
+newline delimited JSON, one flattened object per line. Both directions
+stream, the objects are never held in memory together, and the files can
+optionally be gzip compressed.
+
+	>>> import flatty
+	>>>
+	>>> f = open('countries.ndjson', 'wb')
+	>>> flatty.io.dump_ndjson(countries, f)
+	100000
+	>>> f.close()
+	>>> for country in flatty.io.load_ndjson(open('countries.ndjson', 'rb'), Country):
+	...	 print country.code
+
+Collections of :class:`flatty.mongo.Document` and
+:class:`flatty.couch.Document` classes can be dumped and restored from the
+command line::
+
+	python -m flatty.io dump --adapter mongo --db test --schema myapp.models:Person person.ndjson.gz
+	python -m flatty.io restore --adapter mongo --db test --schema myapp.models:Person person.ndjson.gz
+
+**IMPORTANT**:
+	Like :func:`json.load` the strings are loaded as unicode, declare
+	string attributes as basestring.
+
+=========
+Functions
+=========
+"""
+from __future__ import absolute_import
+import sys
+import json
+import gzip
+import itertools
+import flatty
+
+
+def dump_ndjson(objs, fp, obj_type=None, cm=flatty.ConvertManager, compress=False,
+				buffer_size=65536, default=None):
+	"""
+	writes the flattened objects to `fp`, one JSON document per line
+
+		Args:
+			objs: an iterable of :class:`Schema` instances
+			fp: a file like object opened for binary writing
+			obj_type: the schema class of the objects (default=None, the
+				class of every object)
+			compress: gzip the output
+			buffer_size: the number of bytes collected before they are
+				written
+			default: a function returning a serializable version of values
+				json can't encode, e.g. `bson.json_util.default`
+
+		Returns:
+			the number of written objects
+	"""
+	out = gzip.GzipFile(fileobj=fp, mode='wb') if compress else fp
+	encoder = json.JSONEncoder(separators=(',', ':'), default=default)
+	lines = []
+	size = 0
+	count = 0
+	try:
+		for obj in objs:
+			line = encoder.encode(flatty.flatit(obj, obj_type, cm=cm))
+			lines.append(line)
+			size += len(line) + 1
+			count += 1
+			if size >= buffer_size:
+				lines.append('')
+				out.write('\n'.join(lines))
+				lines = []
+				size = 0
+		if lines:
+			lines.append('')
+			out.write('\n'.join(lines))
+	finally:
+		if compress:
+			out.close()
+	return count
+
+
+def load_ndjson(fp, obj_type, cm=flatty.ConvertManager, compressed=False, offset=0,
+				object_hook=None):
+	"""
+	reads the objects written by :func:`dump_ndjson` one by one
+
+		Args:
+			fp: a file like object opened for binary reading
+			obj_type: the schema class of the objects
+			compressed: the input is gzip compressed
+			offset: the number of objects skipped, e.g. to resume an
+				interrupted import. Skipped lines are not decoded.
+			object_hook: passed to :func:`json.loads`, e.g.
+				`bson.json_util.object_hook`
+
+		Returns:
+			a generator of `obj_type` instances
+	"""
+	lines = gzip.GzipFile(fileobj=fp, mode='rb') if compressed else fp
+	lines = itertools.islice((line for line in lines if line.strip()), offset, None)
+	decoder = json.JSONDecoder(object_hook=object_hook)
+
+	for line in lines:
+		yield flatty.unflatit(decoder.decode(line), obj_type, None, cm)
+
+
+def _schema(name):
+	#imports the class of 'module:Class'
+	module_name, _, class_name = name.partition(':')
+	__import__(module_name)
+	return getattr(sys.modules[module_name], class_name)
+
+
+def _mongo_db(args):
+	import pymongo
+	client = getattr(pymongo, 'MongoClient', None) or pymongo.Connection
+	return client(args.url or 'mongodb://localhost:27017')[args.db]
+
+
+def _mongo_docs(db, cls):
+	collection = cls.__collection__ or cls.__name__.lower()
+	for doc in db[collection].find():
+		yield flatty.unflatit(doc, cls)
+
+
+def _couch_db(args):
+	import couchdb
+	return couchdb.Server(args.url or 'http://localhost:5984')[args.db]
+
+
+def _couch_docs(db, cls):
+	for row in db.view('_all_docs', include_docs=True):
+		if not row.id.startswith('_design/'):
+			yield flatty.unflatit(dict(row.doc), cls)
+
+
+def _json_util(args):
+	if args.adapter != 'mongo':
+		return None
+	from bson import json_util
+	return json_util
+
+
+def _dump(args, cls):
+	if args.adapter == 'mongo':
+		docs = _mongo_docs(_mongo_db(args), cls)
+	else:
+		docs = _couch_docs(_couch_db(args), cls)
+	json_util = _json_util(args)
+	fp = sys.stdout if args.file == '-' else open(args.file, 'wb')
+	try:
+		count = dump_ndjson(docs, fp, cls, compress=args.gzip,
+							default=json_util and json_util.default)
+	finally:
+		if fp is not sys.stdout:
+			fp.close()
+	return count
+
+
+def _restore(args, cls):
+	if args.adapter == 'mongo':
+		import flatty.mongo
+		adapter, db = flatty.mongo, _mongo_db(args)
+	else:
+		import flatty.couch
+		adapter, db = flatty.couch, _couch_db(args)
+	json_util = _json_util(args)
+	fp = sys.stdin if args.file == '-' else open(args.file, 'rb')
+	count = 0
+	try:
+		docs = load_ndjson(fp, cls, compressed=args.gzip, offset=args.offset,
+						object_hook=json_util and json_util.object_hook)
+		while True:
+			batch = list(itertools.islice(docs, args.batch_size))
+			if not batch:
+				break
+			with adapter.unit_of_work(db) as uow:
+				for doc in batch:
+					if args.adapter == 'couch':
+						#the revisions of the dumped database don't exist here
+						doc._rev = unicode
+					doc.store(uow)
+			count += len(batch)
+	finally:
+		if fp is not sys.stdin:
+			fp.close()
+		sys.stderr.write('restored %d documents, resume with --offset %d\n' %
+						(count, args.offset + count))
+	return count
+
+
+def main(argv=None):
+	"""the command line interface, see `python -m flatty.io --help`"""
+	import argparse
+	parser = argparse.ArgumentParser(prog='python -m flatty.io',
+					description='dumps and restores collections of flatty documents as ndjson')
+	parser.add_argument('command', choices=('dump', 'restore'))
+	parser.add_argument('file', help='the ndjson file, - for stdout or stdin')
+	parser.add_argument('--adapter', choices=('mongo', 'couch'), required=True)
+	parser.add_argument('--schema', required=True,
+						help='the document class as module:Class')
+	parser.add_argument('--db', required=True, help='the database name')
+	parser.add_argument('--url', help='the server url')
+	parser.add_argument('--gzip', action='store_true',
+						help='gzip compressed, default for files ending with .gz')
+	parser.add_argument('--offset', type=int, default=0,
+						help='the number of documents skipped on restore')
+	parser.add_argument('--batch-size', type=int, default=1000,
+						help='the number of documents written per bulk request on restore')
+	args = parser.parse_args(argv)
+	args.gzip = args.gzip or args.file.endswith('.gz')
+
+	cls = _schema(args.schema)
+	if args.command == 'dump':
+		return _dump(args, cls)
+	return _restore(args, cls)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,222 @@
+"""
+This module provides an alternative flatten/unflatten engine which walks the
+schema with an explicit work stack instead of recursing through
+:func:`flatty.flatit` and the converters for every nesting level.
+Deeply nested documents therefore don't hit the recursion limit.
+
+The results are identical to :func:`flatty.flatit` and :func:`flatty.unflatit`.
+:class:`Schema`, :class:`TypedList` and :class:`TypedDict` are walked by the
+engine itself, all other converters (e.g. custom :class:`Converter` classes)
+are still called through their `to_flat` and `to_obj` methods.
+
+	>>> import flatty
+	>>>
+	>>> class Category(flatty.Schema):
+	...	 name = str
+	...	 children = None
+	>>>
+	>>> Category.children = flatty.TypedList.set_type(Category)
+	>>> leaf = Category(name='root')
+	>>> for i in range(10000):
+	...	 leaf = Category(name='sub', children=[leaf])
+	>>> flatted = flatty.iterative.flatit(leaf)
+	>>> restored = flatty.iterative.unflatit(flatted, Category)
+
+=========
+Functions
+=========
+"""
+import inspect
+import flatty
+
+_EXIT = object()
+_WALKED = (flatty.SchemaConverter, flatty.TypedListConverter,
+		flatty.TypedDictConverter)
+
+
+def _new_obj(obj_type, obj):
+	if obj == None:
+		return obj_type() if inspect.isclass(obj_type) else type(obj_type)()
+	return obj
+
+
+def _frozen(obj_type):
+	obj_class = obj_type if inspect.isclass(obj_type) else type(obj_type)
+	return issubclass(obj_class, flatty.FrozenSchema)
+
+
+def _store(target, key, value):
+	if isinstance(target, flatty.Schema):
+		setattr(target, key, value)
+	else:
+		target[key] = value
+
+
+def flatit(obj, obj_type=None, val=None, cm=flatty.ConvertManager):
+	"""
+	flattens `obj` like :func:`flatty.flatit` without recursion
+
+		Args:
+			obj: a :class:`Schema` instance which will be flatted
+
+		Returns:
+			a dict where the obj is flattened to primitive types
+	"""
+
+	root = [None]
+	active = set()
+	stack = [(obj_type, obj, val, root, 0)]
+	while stack:
+		task = stack.pop()
+		if task[0] is _EXIT:
+			active.discard(task[1])
+			continue
+
+		obj_type, obj, val, target, key = task
+		if obj_type == None:
+			obj_type = type(obj)
+		conv = cm.get_converter(obj_type)
+
+		if conv is flatty.SchemaConverter:
+			if obj == None:
+				target[key] = None
+				continue
+			if id(obj) in active:
+				raise flatty.CircularReferenceError('Circular reference to ' + repr(obj))
+			flat_dict = {} if val == None else val
+			target[key] = flat_dict
+			plan = flatty.schema_plan(obj_type, cm)
+			if plan.subtypes is not None and type(obj) is not plan.obj_class:
+				obj_type = type(obj)
+				plan = flatty.schema_plan(obj_type, cm)
+			if plan.discriminator_value is not None:
+				flat_dict[plan.discriminator] = plan.discriminator_value
+			version = getattr(obj_type, '__schema_version__', None)
+			if version is not None:
+				flat_dict[obj_type.__version_key__] = version
+			active.add(id(obj))
+			stack.append((_EXIT, id(obj)))
+			for attr_name, attr_type in flatty.schema_fields(obj_type):
+				if hasattr(obj, attr_name):
+					attr_value = getattr(obj, attr_name)
+					if not inspect.ismethod(attr_value):
+						if flatty.is_unset(attr_value, attr_type):
+							attr_value = None
+						cm.check_type(attr_type, attr_value)
+						stack.append((attr_type, attr_value,
+									flat_dict.get(attr_name), flat_dict, attr_name))
+
+		elif conv is flatty.TypedListConverter:
+			if obj == None:
+				target[key] = None
+				continue
+			flat_list = [] if val == None else val
+			target[key] = flat_list
+			cm.check_type(obj_type, obj)
+			sub_type = flatty.item_type(obj_type, 0, None)
+			for item in obj:
+				cm.check_type(sub_type, item)
+				flat_list.append(None)
+				stack.append((sub_type, item, None, flat_list, len(flat_list) - 1))
+
+		elif conv is flatty.TypedDictConverter:
+			if obj == None:
+				target[key] = None
+				continue
+			flat_dict = {} if val == None else val
+			target[key] = flat_dict
+			cm.check_type(obj_type, obj)
+			for k, v in obj.items():
+				sub_type = flatty.item_type(obj_type, k, None)
+				cm.check_type(sub_type, v)
+				stack.append((sub_type, v, flat_dict.get(k), flat_dict, k))
+
+		elif conv is None:
+			target[key] = obj
+		else:
+			target[key] = conv.to_flat(obj_type, obj, val, cm)
+	return root[0]
+
+
+def unflatit(val, obj_type, obj=None, cm=flatty.ConvertManager):
+	"""
+	unflattens `val` like :func:`flatty.unflatit` without recursion
+
+		Args:
+			val: the flat data which will be loaded into an instance of
+				`obj_type`
+			obj_type: the class from which the instance is builded
+			obj: an existing instance where the data is merged
+
+		Returns:
+			an instance of type `obj_type`
+	"""
+
+	root = [None]
+	stack = [(obj_type, val, obj, root, 0, None)]
+	while stack:
+		obj_type, val, obj, target, key, check = stack.pop()
+		conv = cm.get_converter(obj_type)
+
+		if conv is flatty.SchemaConverter and val != None:
+			plan = flatty.schema_plan(obj_type, cm)
+			if plan.subtypes is not None:
+				sub_class = plan.subtype(val)
+				if sub_class is not plan.obj_class:
+					obj_type = sub_class
+					if not isinstance(obj, sub_class):
+						obj = None
+
+		if val == None and conv in _WALKED:
+			ret = None
+		elif conv is flatty.SchemaConverter and _frozen(obj_type):
+			#frozen instances are created complete and interned
+			ret = conv.to_obj(obj_type, val, None, cm)
+		elif conv is flatty.SchemaConverter:
+			ret = _new_obj(obj_type, obj)
+			val = flatty.migrate(val, obj_type)
+			for attr_name, attr_type in flatty.schema_fields(obj_type):
+				if attr_name in val:
+					sub_obj = None
+					if hasattr(ret, attr_name):
+						sub_obj = flatty.reusable(attr_type, getattr(ret, attr_name))
+					stack.append((attr_type, val[attr_name], sub_obj,
+								ret, attr_name, attr_type))
+
+		elif conv is flatty.TypedListConverter:
+			ret = _new_obj(obj_type, obj)
+			old_len = len(ret)
+			for idx, item in enumerate(val):
+				sub_type = flatty.item_type(obj_type, 0, None)
+				if sub_type == None and not hasattr(obj_type, 'ftype'):
+					raise Exception('Can\'t guess type associated with: "'  + item + '"')
+				sub_obj = None
+				if idx < old_len:
+					sub_obj = flatty.reusable(sub_type, ret[idx])
+				else:
+					ret.append(None)
+				stack.append((sub_type, item, sub_obj, ret, idx, sub_type))
+			del ret[len(val):]
+
+		elif conv is flatty.TypedDictConverter:
+			ret = _new_obj(obj_type, obj)
+			for k, v in val.items():
+				sub_type = flatty.item_type(obj_type, k, None)
+				if sub_type == None and not hasattr(obj_type, 'ftype'):
+					raise Exception('Can\'t guess type associated with: "'  + v + '"')
+				sub_obj = flatty.reusable(sub_type, ret.get(k))
+				stack.append((sub_type, v, sub_obj, ret, k, sub_type))
+			if len(ret) != len(val):
+				for k in ret.keys():
+					if k not in val:
+						del ret[k]
+
+		elif conv is None:
+			ret = val
+		else:
+			ret = conv.to_obj(obj_type, val, obj, cm)
+
+		if target is not root:
+			cm.check_type(check, ret)
+		_store(target, key, ret)
+	return root[0]
@@ -4,8 +4,16 @@
 Classes
 =======
 """
+import time
 import flatty
+import adapter
 from bson.objectid import ObjectId
+from pymongo.errors import AutoReconnect, OperationFailure
+try:
+	from pymongo.errors import BulkWriteError
+except ImportError:
+	#pymongo < 2.7 has no bulk writes
+	BulkWriteError = None
 
 class Document(flatty.Schema):
 	"""
@@ -21,36 +29,59 @@ class Document(flatty.Schema):
 	__old_doc__ = None
 	_id = ObjectId
 	
+	def _changes(self):
+		#returns the collection name, the flattened document and the update
+		#for the stored document (None if the document is new)
+		flattened = flatty.flatit(self)
+		if self._id == ObjectId:
+			del flattened['_id']
+
+		if self.__collection__ == None:
+			self.__collection__ = self.__class__.__name__.lower()
+
+		if self.__old_doc__ == None:
+			return self.__collection__, flattened, None
+
+		#only send the changed attributes
+		update = flatty.diff(self.__old_doc__, flattened, type(self), format='mongo')
+		if self.__schema_version__ is not None and \
+			self.__old_doc__.get(self.__version_key__) != self.__schema_version__:
+			#the loaded document was migrated, drop its outdated attributes
+			for key in self.__old_doc__:
+				if key not in flattened and key != '_id':
+					update.setdefault('$unset', {})[key] = 1
+		return self.__collection__, flattened, update
+
 	def store(self, db):
 		"""stores the document in the mongodb.
 		Only saves the document if it wasn't changed in the meantime otherwise
 		*UpdateFailedError* Exception is raised
 	
 		Args:
-			db: should must be a pymongo ''Database'' object
+			db: should must be a pymongo ''Database'' object or a
+				:class:`Session`, which queues the write
 			
 		Returns:
 			returns *id*.  *id*  is the document id which stays the
 			same over time.
 		"""
+		if isinstance(db, (Session, UnitOfWork)):
+			db.store(self)
+			return self._id
+
 		error = None
-		
-		flattened =  self.flatit()
-		if self._id == ObjectId:
-			del flattened['_id']
-		
-		if self.__collection__ == None:
-			self.__collection__ = self.__class__.__name__.lower()
-			
-		if self.__old_doc__ == None:
-			id = db[self.__collection__].save(flattened, safe=True, manipulate=True)
+		collection, flattened, update = self._changes()
+
+		if update is None:
+			id = db[collection].save(flattened, safe=True, manipulate=True)
 			self._id = id
-		else: 
-			error = db[self.__collection__].update(self.__old_doc__, flattened, safe=True)
-			
+		elif update:
+			error = db[collection].update(self.__old_doc__, update, safe=True)
+
 		if error != None and 'updatedExisting' in error \
 			and error['updatedExisting'] == False:
 			raise UpdateFailedError('Document in db is newer than the document for storing')
+		self.__old_doc__ = flattened
 		return self._id
 
 	
@@ -66,16 +97,286 @@ class Document(flatty.Schema):
 		Returns:
 			returns the object
 		"""
+		if isinstance(db, Session):
+			db = db.db
 		if cls.__collection__ == None:
 			cls.__collection__ = cls.__name__.lower()
 		doc = db[cls.__collection__].find_one({'_id':id})
 		
-		obj = cls.unflatit(doc)
+		obj = flatty.unflatit(doc, cls)
 		obj.__old_doc__ =  doc
 		
 		
 		return obj
 		
 class UpdateFailedError(Exception):
-	pass
-	
\ No newline at end of file
+	"""
+	raised if a document was changed in the db since it was loaded. When
+	raised by :meth:`Session.flush`, `failed` holds the `(doc, error)`
+	tuples of all failed writes.
+	"""
+	
+	def __init__(self, message, failed=()):
+		Exception.__init__(self, message)
+		self.failed = list(failed)
+
+
+class Session(object):
+	"""
+	Queues the writes of :class:`Document` instances and sends them in bulk,
+	one request per collection, instead of one round-trip per document.
+	The queue is flushed when `max_queued` documents are queued or when a
+	document is stored more than `max_delay` seconds after the oldest queued
+	one, on :meth:`flush` and when the `with` block is left.
+
+	Writes failing with `AutoReconnect` are retried up to `retries` times,
+	waiting `backoff` seconds and twice as long on every further retry. New
+	documents get their id when they are stored and are written with upserts,
+	so retrying them is safe. Updates are matched against the previously
+	stored document like :meth:`Document.store` does, updates already
+	applied by an interrupted bulk write are recognized on the retry.
+
+	Other failures don't affect the remaining writes. The failed writes are
+	removed from the queue and raised together as :class:`UpdateFailedError`
+	after all collections were written, their documents keep their previous
+	state, reload them before storing them again. If the retries of a
+	collection are exhausted, the `AutoReconnect` is raised with the
+	failures of the collections written before in its `failed` attribute.
+	The collections are written in the order of their names.
+
+	If the `with` block raises, the queued writes are not sent. They stay
+	queued until :meth:`flush` is called explicitly.
+
+		>>> import pymongo
+		>>> import flatty
+		>>>
+		>>> db = pymongo.MongoClient()['test']
+		>>> with flatty.mongo.Session(db, max_queued=500) as session:
+		...	 for i in range(1000):
+		...		 Person(name='p' + str(i)).store(session)
+		>>> session.stats['flushes']
+		2
+
+	Args:
+		db: a pymongo ''Database'' object
+		max_queued: the number of queued documents triggering a flush
+		max_delay: the age in seconds of the oldest queued document
+			triggering a flush
+		retries: the number of retries of a failed bulk write
+		backoff: the delay in seconds before the first retry
+	"""
+
+	def __init__(self, db, max_queued=1000, max_delay=1.0, retries=3, backoff=0.1):
+		self.db = db
+		self.max_queued = max_queued
+		self.max_delay = max_delay
+		self.retries = retries
+		self.backoff = backoff
+		self._collections = {}
+		#queued documents by id, the latest store of a document replaces the
+		#queued one since it contains all changes
+		self._queue = {}
+		self._queued_since = None
+		self.stats = {
+			'queued': 0,
+			'written': 0,
+			'flushes': 0,
+			'retries': 0,
+			'last_flush_latency': 0.0,
+			'total_flush_latency': 0.0,
+		}
+
+	def collection(self, name):
+		"""returns the cached handle of the collection `name`"""
+		try:
+			return self._collections[name]
+		except KeyError:
+			collection = self._collections[name] = self.db[name]
+			return collection
+
+	def store(self, doc):
+		"""
+		queues the current state of the :class:`Document` `doc`, new
+		documents get their id immediately
+		"""
+		self._enqueue(doc, doc._changes())
+
+	def _enqueue(self, doc, changes):
+		collection, flattened, update = changes
+		if update is None:
+			if '_id' not in flattened:
+				doc._id = flattened['_id'] = ObjectId()
+		elif not update:
+			return
+
+		if not self._queue:
+			self._queued_since = time.time()
+		self._queue[id(doc)] = (doc, collection, flattened, update)
+		self.stats['queued'] = len(self._queue)
+
+		if len(self._queue) >= self.max_queued or \
+			time.time() - self._queued_since >= self.max_delay:
+			self.flush()
+
+	def _write(self, collection, writes):
+		#returns the errors of the failed writes by their index in writes
+		failed = {}
+		if hasattr(collection, 'initialize_unordered_bulk_op'):
+			bulk = collection.initialize_unordered_bulk_op()
+			for doc, flattened, update in writes:
+				if update is None:
+					bulk.find({'_id':flattened['_id']}).upsert().replace_one(flattened)
+				else:
+					bulk.find(doc.__old_doc__).update_one(update)
+			try:
+				result = bulk.execute()
+			except BulkWriteError, e:
+				result = e.details
+				for error in result['writeErrors']:
+					failed[error['index']] = OperationFailure(error['errmsg'], error['code'])
+			if result['nMatched'] + result['nUpserted'] + len(failed) < len(writes):
+				#updates of changed documents don't match, neither do the
+				#updates applied before an interrupted attempt
+				for idx, (doc, flattened, update) in enumerate(writes):
+					if update is not None and idx not in failed and \
+						collection.find_one(_applied(flattened, update)) is None:
+						failed[idx] = UpdateFailedError('Document in db is newer than '
+														'the document for storing')
+		else:
+			for idx, (doc, flattened, update) in enumerate(writes):
+				try:
+					if update is None:
+						collection.save(flattened, safe=True)
+						continue
+					error = collection.update(doc.__old_doc__, update, safe=True)
+				except OperationFailure, e:
+					failed[idx] = e
+					continue
+				if error != None and error.get('updatedExisting') == False and \
+					collection.find_one(_applied(flattened, update)) is None:
+					failed[idx] = UpdateFailedError('Document in db is newer than '
+													'the document for storing')
+		return failed
+
+	def flush(self):
+		"""
+		sends all queued writes, one bulk write per collection. Raises
+		:class:`UpdateFailedError` with the failed writes, the others are
+		written.
+		"""
+		if not self._queue:
+			return
+		start = time.time()
+
+		by_collection = {}
+		for doc, collection, flattened, update in self._queue.itervalues():
+			by_collection.setdefault(collection, []).append((doc, flattened, update))
+
+		errors = []
+		for name, writes in sorted(by_collection.iteritems()):
+			collection = self.collection(name)
+			retry = 0
+			while True:
+				try:
+					failed = self._write(collection, writes)
+					break
+				except AutoReconnect, e:
+					#the writes of the collection stay queued, the failures of
+					#the collections written before are reported with it
+					if retry >= self.retries:
+						e.failed = errors
+						raise
+					time.sleep(self.backoff * 2 ** retry)
+					retry += 1
+					self.stats['retries'] += 1
+			for idx, (doc, flattened, update) in enumerate(writes):
+				del self._queue[id(doc)]
+				if idx in failed:
+					errors.append((doc, failed[idx]))
+				else:
+					doc.__old_doc__ = flattened
+			self.stats['written'] += len(writes) - len(failed)
+			self.stats['queued'] = len(self._queue)
+
+		latency = time.time() - start
+		self.stats['flushes'] += 1
+		self.stats['last_flush_latency'] = latency
+		self.stats['total_flush_latency'] += latency
+		if errors:
+			raise UpdateFailedError(str(len(errors)) + ' of the queued documents '
+									'could not be written', errors)
+
+	def close(self):
+		"""flushes the queued writes"""
+		self.flush()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		#on exceptions the writes stay queued, see the class documentation
+		if exc_type is None:
+			self.close()
+
+
+def _applied(flattened, update):
+	#a query matching the stored document if the update was applied
+	query = {'_id':flattened['_id']}
+	for path, value in update.get('$set', {}).iteritems():
+		query[path] = value
+	for path in update.get('$unset', {}):
+		query[path] = {'$exists':False}
+	for path in update.get('$push', {}):
+		value = flattened
+		for token in path.split('.'):
+			value = value[int(token)] if isinstance(value, list) else value[token]
+		query[path] = value
+	return query
+
+
+class UnitOfWork(adapter.UnitOfWork):
+	"""
+	Collects the :class:`Document` instances stored during a `with` block
+	and writes them when the block is left without exception, see
+	:func:`unit_of_work`. Documents stored several times are written once,
+	with their state at the end of the block.
+
+	Args:
+		db: a pymongo ''Database'' object or a :class:`Session`
+	"""
+
+	def store(self, doc):
+		"""
+		registers `doc` for writing on :meth:`commit`, new documents get
+		their id immediately
+		"""
+		if doc._id == ObjectId:
+			doc._id = ObjectId()
+		adapter.UnitOfWork.store(self, doc)
+
+	def _write(self, docs):
+		#flattens all registered documents and writes them with one bulk
+		#write per collection
+		if isinstance(self.db, Session):
+			session = self.db
+		else:
+			session = Session(self.db, max_queued=len(docs) + 1, max_delay=float('inf'))
+		for doc in docs:
+			session._enqueue(doc, doc._changes())
+		session.flush()
+
+
+def unit_of_work(db):
+	"""
+	returns a :class:`UnitOfWork` collecting the documents stored in the
+	`with` block, they are flattened and written in bulk when the block is
+	left
+
+		>>> with flatty.mongo.unit_of_work(db) as uow:
+		...	 person.name = 'John'
+		...	 person.store(uow)
+		...	 person.age = 42
+		...	 person.store(uow)
+		...	 library.store(uow)
+	"""
+	return UnitOfWork(db)
@@ -0,0 +1,250 @@
+"""
+This module computes the changes between two versions of a document and
+applies them to live :class:`Schema` objects. Only the attributes declared
+in the schema are compared.
+
+	>>> import flatty
+	>>>
+	>>> class Bar(flatty.Schema):
+	...	 a_num = int
+	...	 tags = flatty.TypedList.set_type(str)
+	>>>
+	>>> old = Bar(a_num=1, tags=['a'])
+	>>> new = Bar(a_num=2, tags=['a', 'b'])
+	>>> flatty.diff(old, new)
+	[{'path': '/a_num', 'value': 2, 'op': 'replace'}, {'path': '/tags/-', 'value': 'b', 'op': 'add'}]
+	>>> flatty.diff(old, new, format='mongo')
+	{'$set': {'a_num': 2}, '$push': {'tags': {'$each': ['b']}}}
+	>>> flatty.patch(old, flatty.diff(old, new)).a_num
+	2
+
+=========
+Functions
+=========
+"""
+import flatty
+
+_MISSING = object()
+
+
+def _flat(obj, obj_type, cm):
+	if isinstance(obj, dict) or obj is None:
+		return obj
+	return flatty.flatit(obj, obj_type, cm=cm)
+
+
+def _escape(token):
+	return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token):
+	return token.replace('~1', '/').replace('~0', '~')
+
+
+def _same_subtype(old, new, attr_type, cm):
+	#documents of different polymorphic classes are replaced as a whole
+	plan = flatty.schema_plan(attr_type, cm)
+	return plan.subtypes is None or plan.subtype(old) is plan.subtype(new)
+
+
+def _diff(old, new, attr_type, path, ops, cm):
+	conv = cm.get_converter(attr_type) if attr_type else None
+
+	if conv is flatty.SchemaConverter and isinstance(old, dict) and isinstance(new, dict) and \
+		_same_subtype(old, new, attr_type, cm):
+		attr_type = flatty.schema_plan(attr_type, cm).subtype(new)
+		fields = list(flatty.schema_fields(attr_type))
+		if getattr(attr_type, '__schema_version__', None) is not None:
+			fields.append((attr_type.__version_key__, None))
+		for attr_name, sub_type in fields:
+			_diff_item(old.get(attr_name, _MISSING), new.get(attr_name, _MISSING),
+					sub_type, path + '/' + _escape(attr_name), ops, cm)
+
+	elif conv is flatty.TypedDictConverter and isinstance(old, dict) and isinstance(new, dict):
+		for k in set(old) | set(new):
+			_diff_item(old.get(k, _MISSING), new.get(k, _MISSING),
+					flatty.item_type(attr_type, k, None), path + '/' + _escape(k), ops, cm)
+
+	elif conv in (flatty.TypedListConverter, flatty.ColumnListConverter) and \
+		isinstance(old, list) and isinstance(new, list) and old != new:
+		if len(new) > len(old) and new[:len(old)] == old:
+			for item in new[len(old):]:
+				ops.append({'op': 'add', 'path': path + '/-', 'value': item})
+		elif len(new) == len(old):
+			sub_type = flatty.item_type(attr_type, 0, None)
+			for idx in xrange(len(new)):
+				_diff(old[idx], new[idx], sub_type, path + '/' + str(idx), ops, cm)
+		else:
+			ops.append({'op': 'replace', 'path': path, 'value': new})
+
+	elif old != new:
+		ops.append({'op': 'replace', 'path': path, 'value': new})
+
+
+def _diff_item(old, new, attr_type, path, ops, cm):
+	if new is _MISSING:
+		if old is not _MISSING:
+			ops.append({'op': 'remove', 'path': path})
+	elif old is _MISSING:
+		ops.append({'op': 'add', 'path': path, 'value': new})
+	else:
+		_diff(old, new, attr_type, path, ops, cm)
+
+
+def _to_mongo(ops):
+	update = {}
+	for op in ops:
+		tokens = [_unescape(t) for t in op['path'].split('/')[1:]]
+		if op['op'] == 'remove':
+			update.setdefault('$unset', {})['.'.join(tokens)] = 1
+		elif tokens[-1] == '-':
+			push = update.setdefault('$push', {})
+			push.setdefault('.'.join(tokens[:-1]), {'$each': []})['$each'].append(op['value'])
+		else:
+			update.setdefault('$set', {})['.'.join(tokens)] = op['value']
+	return update
+
+
+def _from_mongo(update):
+	ops = []
+	for operator, fields in update.items():
+		for key, value in fields.items():
+			path = '/' + '/'.join(_escape(t) for t in key.split('.'))
+			if operator == '$set':
+				ops.append({'op': 'replace', 'path': path, 'value': value})
+			elif operator == '$unset':
+				ops.append({'op': 'remove', 'path': path})
+			elif operator == '$push':
+				if isinstance(value, dict) and '$each' in value:
+					values = value['$each']
+				else:
+					values = [value]
+				for item in values:
+					ops.append({'op': 'add', 'path': path + '/-', 'value': item})
+			else:
+				raise ValueError('Unsupported update operator ' + operator)
+	return ops
+
+
+def diff(old, new, obj_type=None, format='json-patch', cm=flatty.ConvertManager):
+	"""
+	computes the changes from `old` to `new`
+
+		Args:
+			old: the old :class:`Schema` instance or its flattened dict
+			new: the new :class:`Schema` instance or its flattened dict
+			obj_type: the schema class of both documents, must be given if
+				both documents are flattened dicts (default=type(new))
+			format: 'json-patch' for a list of JSON-Patch (RFC 6902)
+				operations or 'mongo' for a dict with `$set`, `$unset` and
+				`$push` update operators. (default='json-patch')
+
+		Returns:
+			the patch, which is empty if nothing changed
+	"""
+	if format not in ('json-patch', 'mongo'):
+		raise ValueError('format must be one of "json-patch" or "mongo"')
+	if obj_type == None:
+		if isinstance(new, flatty.Schema):
+			obj_type = type(new)
+		elif isinstance(old, flatty.Schema):
+			obj_type = type(old)
+		else:
+			raise ValueError('obj_type is required to diff flattened dicts')
+
+	ops = []
+	_diff(_flat(old, obj_type, cm), _flat(new, obj_type, cm), obj_type, '', ops, cm)
+	if format == 'mongo':
+		return _to_mongo(ops)
+	return ops
+
+
+def _child(parent, parent_type, token):
+	if isinstance(parent, flatty.Schema):
+		fields = dict(flatty.schema_fields(parent_type))
+		if token not in fields:
+			raise AttributeError('Attribute ' + token + ' not exists')
+		return getattr(parent, token), fields[token]
+	elif isinstance(parent, list):
+		return parent[int(token)], flatty.item_type(parent_type, 0, None)
+	return parent[token], flatty.item_type(parent_type, token, None)
+
+
+def _apply(obj, obj_type, op, cm):
+	tokens = [_unescape(t) for t in op['path'].split('/')[1:]]
+	if not tokens:
+		raise ValueError('The whole document can\'t be patched')
+
+	parent, parent_type = obj, obj_type
+	for token in tokens[:-1]:
+		parent, parent_type = _child(parent, parent_type, token)
+
+	key = tokens[-1]
+	if isinstance(parent, flatty.Schema) and parent.__schema_version__ is not None and \
+		key == parent.__version_key__:
+		#the version of live objects is the one of their class
+		return
+	if op['op'] == 'remove':
+		if isinstance(parent, flatty.Schema):
+			setattr(parent, key, None)
+		elif isinstance(parent, list):
+			del parent[int(key)]
+		else:
+			del parent[key]
+		return
+
+	if op['op'] not in ('add', 'replace'):
+		raise ValueError('Unsupported patch operation ' + op['op'])
+
+	if isinstance(parent, list) and key == '-':
+		sub_type = flatty.item_type(parent_type, 0, None)
+		value = flatty.unflatit(op['value'], sub_type, None, cm)
+		flatty.check_type(sub_type, value, cm)
+		parent.append(value)
+		return
+
+	current, sub_type = None, None
+	try:
+		current, sub_type = _child(parent, parent_type, key)
+	except (KeyError, IndexError):
+		sub_type = flatty.item_type(parent_type, key, None)
+	if isinstance(parent, list) and op['op'] == 'add':
+		#the item at idx is moved, not replaced
+		current = None
+	value = flatty.unflatit(op['value'], sub_type,
+						flatty.reusable(sub_type, current), cm)
+	flatty.check_type(sub_type, value, cm)
+
+	if isinstance(parent, flatty.Schema):
+		setattr(parent, key, value)
+	elif isinstance(parent, list):
+		idx = int(key)
+		if op['op'] == 'add':
+			parent.insert(idx, value)
+		else:
+			parent[idx] = value
+	else:
+		parent[key] = value
+
+
+def patch(obj, patch, obj_type=None, cm=flatty.ConvertManager):
+	"""
+	applies a patch computed by :func:`diff` to the live object `obj`,
+	only the changed values are unflattened
+
+		Args:
+			obj: a :class:`Schema` instance
+			patch: a list of JSON-Patch operations or a dict with mongo
+				update operators
+			obj_type: the schema class of `obj` (default=type(obj))
+
+		Returns:
+			the patched `obj`
+	"""
+	if obj_type == None:
+		obj_type = type(obj)
+	if isinstance(patch, dict):
+		patch = _from_mongo(patch)
+	for op in patch:
+		_apply(obj, obj_type, op, cm)
+	return obj
@@ -0,0 +1,208 @@
+"""
+This module provides read-only collections of :class:`Schema` records
+stored in a file, which is memory mapped when the collection is opened.
+Records are decoded only when they are accessed, by their index or by their
+key. The keys are stored as a sorted table which is binary searched in the
+mapped file, a lookup decodes only the keys it visits. Several processes
+opening the same file share its pages through the page cache instead of
+holding their own copy of all records.
+
+The records are encoded with :mod:`flatty.binary`.
+
+	>>> import flatty
+	>>>
+	>>> class Country(flatty.Schema):
+	...	 code = str
+	...	 size = int
+	>>>
+	>>> countries = (Country(code='c' + str(i), size=i) for i in range(100000))
+	>>> flatty.store.MappedCollection.write('countries.db', countries, Country, key='code')
+	100000
+	>>> coll = flatty.store.MappedCollection('countries.db', Country)
+	>>> coll[42].size
+	42
+	>>> coll.get('c99').size
+	99
+
+=========
+Classes
+=========
+"""
+import mmap
+import marshal
+import struct
+import flatty
+import binary
+
+#record count, position of the offsets and position of the key table
+_TRAILER = struct.Struct('<QQQ')
+_OFFSET = struct.Struct('<Q')
+#position of the marshaled key and index of its record, sorted by key
+_KEY = struct.Struct('<QQ')
+
+
+class MappedCollection(object):
+	"""
+	A read-only sequence of `obj_type` records in the file `path`, written
+	with :meth:`write`.
+
+	Args:
+		path: the file name
+		obj_type: the :class:`Schema` class of the records, it must match the
+			schema the file was written with
+	"""
+
+	def __init__(self, path, obj_type, cm=flatty.ConvertManager):
+		self.obj_type = obj_type
+		self.cm = cm
+		self._decode = binary.schema_codec(obj_type, cm)[1]
+		f = open(path, 'rb')
+		try:
+			self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		finally:
+			f.close()
+		binary.check_header(self._map[:binary.HEADER.size], obj_type, cm)
+		self._count, self._offsets, self._key_pos = \
+			_TRAILER.unpack_from(self._map, len(self._map) - _TRAILER.size)
+
+	@classmethod
+	def write(cls, path, objs, obj_type, key=None, cm=flatty.ConvertManager):
+		"""
+		writes the records to the file `path`
+
+		Args:
+			objs: an iterable of `obj_type` instances, they are written one by
+				one and not held in memory
+			obj_type: the :class:`Schema` class of the records
+			key: the name of the attribute by which the records are looked up
+				with :meth:`get`, or a function returning the key of a record.
+				Keys must be unique. (default=None, no key index)
+
+		Returns:
+			the number of written records
+		"""
+		encode = binary.schema_codec(obj_type, cm)[0]
+		offsets = []
+		keys = {}
+		f = open(path, 'wb')
+		try:
+			f.write(binary.header(obj_type, cm))
+			pos = binary.HEADER.size
+			for obj in objs:
+				if key is not None:
+					obj_key = key(obj) if callable(key) else getattr(obj, key)
+					if obj_key in keys:
+						raise ValueError('Duplicate key ' + repr(obj_key))
+					keys[obj_key] = len(offsets)
+				data = marshal.dumps(encode(flatty.flatit(obj, obj_type, cm=cm)))
+				offsets.append(pos)
+				f.write(data)
+				pos += len(data)
+
+			offsets_pos = pos
+			offsets.append(pos)
+			f.write(struct.pack('<%dQ' % len(offsets), *offsets))
+			pos += len(offsets) * _OFFSET.size
+			key_pos = 0
+			if key is not None:
+				table = []
+				for obj_key, idx in sorted(keys.iteritems()):
+					data = marshal.dumps(obj_key)
+					table.append(_KEY.pack(pos, idx))
+					f.write(data)
+					pos += len(data)
+				key_pos = pos
+				f.write(''.join(table))
+			f.write(_TRAILER.pack(len(offsets) - 1, offsets_pos, key_pos))
+		finally:
+			f.close()
+		return len(offsets) - 1
+
+	def __len__(self):
+		return self._count
+
+	def _span(self, idx):
+		pos = self._offsets + idx * _OFFSET.size
+		start = _OFFSET.unpack_from(self._map, pos)[0]
+		end = _OFFSET.unpack_from(self._map, pos + _OFFSET.size)[0]
+		return start, end
+
+	def flat(self, idx):
+		"""
+		returns the flattened dict of the record at `idx`, migrated to the
+		current `__schema_version__` of `obj_type`
+		"""
+		if idx < 0:
+			idx += self._count
+		if idx < 0 or idx >= self._count:
+			raise IndexError('MappedCollection index out of range')
+		start, end = self._span(idx)
+		return flatty.migrate(self._decode(marshal.loads(self._map[start:end])),
+							self.obj_type)
+
+	def __getitem__(self, idx):
+		return flatty.unflatit(self.flat(idx), self.obj_type, None, self.cm)
+
+	def __iter__(self):
+		for idx in xrange(self._count):
+			yield self[idx]
+
+	def _key(self, pos):
+		#the key at position pos of the key table and the index of its record
+		if not self._key_pos:
+			raise TypeError('The collection was written without key')
+		entry = self._key_pos + pos * _KEY.size
+		start, idx = _KEY.unpack_from(self._map, entry)
+		if pos + 1 < self._count:
+			end = _KEY.unpack_from(self._map, entry + _KEY.size)[0]
+		else:
+			end = self._key_pos
+		return marshal.loads(self._map[start:end]), idx
+
+	def _find(self, key):
+		#binary search in the key table, only the visited keys are decoded
+		if not self._key_pos:
+			raise TypeError('The collection was written without key')
+		low, high = 0, self._count
+		while low < high:
+			mid = (low + high) // 2
+			if self._key(mid)[0] < key:
+				low = mid + 1
+			else:
+				high = mid
+		if low < self._count:
+			found, idx = self._key(low)
+			if found == key:
+				return idx
+		return None
+
+	def index(self, key):
+		"""returns the index of the record with `key`, raises KeyError if not found"""
+		idx = self._find(key)
+		if idx is None:
+			raise KeyError(key)
+		return idx
+
+	def get(self, key, default=None):
+		"""returns the record with `key` or `default`"""
+		idx = self._find(key)
+		if idx is None:
+			return default
+		return self[idx]
+
+	def __contains__(self, key):
+		return self._find(key) is not None
+
+	def keys(self):
+		"""returns the sorted keys of the records"""
+		return [self._key(pos)[0] for pos in xrange(self._count)]
+
+	def close(self):
+		"""unmaps the file"""
+		self._map.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
@@ -0,0 +1,148 @@
+"""
+This module reads large JSON documents whose top level is a :class:`Schema`
+holding one huge :class:`TypedList`, e.g. exports of whole collections.
+Instead of loading the complete document with :func:`json.load` and
+unflattening it, the file is read in chunks and the items of the list are
+decoded and unflattened one at a time. Only the current item and one chunk
+of the file are held in memory, regardless of the file size.
+
+	>>> import flatty
+	>>>
+	>>> class Country(flatty.Schema):
+	...	 code = basestring
+	...	 size = int
+	>>>
+	>>> class Export(flatty.Schema):
+	...	 created = basestring
+	...	 items = flatty.TypedList.set_type(Country)
+	>>>
+	>>> for country in flatty.stream.load(open('export.json'), Export, path='items'):
+	...	 print country.code
+
+**IMPORTANT**:
+	Like :func:`json.load` the strings are returned as unicode, declare
+	string attributes as basestring.
+
+=========
+Functions
+=========
+"""
+import re
+import json
+import flatty
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class _Reader(object):
+	#a window on the file with a read position, refilled on demand
+
+	def __init__(self, fp, chunk_size):
+		self.fp = fp
+		self.chunk_size = chunk_size
+		self.buf = ''
+		self.pos = 0
+		self.eof = False
+
+	def _read(self, size):
+		if self.pos > self.chunk_size:
+			self.buf = self.buf[self.pos:]
+			self.pos = 0
+		data = self.fp.read(size)
+		if not data:
+			self.eof = True
+		self.buf += data
+		return bool(data)
+
+	def peek(self):
+		"""skips whitespace and returns the next character, '' at the end"""
+		while True:
+			self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+			if self.pos < len(self.buf) or not self._read(self.chunk_size):
+				return self.buf[self.pos:self.pos + 1]
+
+	def expect(self, char):
+		if self.peek() != char:
+			raise ValueError('Expected ' + repr(char) + ' at ' + repr(self.buf[self.pos:self.pos + 20]))
+		self.pos += 1
+
+	def value(self):
+		"""decodes the next JSON value"""
+		self.peek()
+		while True:
+			try:
+				value, end = _decoder.raw_decode(self.buf, self.pos)
+			except ValueError:
+				#incomplete, read at least as much as is buffered already so
+				#large values aren't decoded too often
+				if not self._read(max(self.chunk_size, len(self.buf) - self.pos)):
+					raise
+				continue
+			#numbers at the end of the buffer may continue in the file
+			if end < len(self.buf) or self.eof:
+				self.pos = end
+				return value
+			self._read(self.chunk_size)
+
+
+def _list_item_type(obj_type, path):
+	#the item type of the list attribute at path
+	attr_type = obj_type
+	for attr_name in path:
+		fields = dict(flatty.schema_fields(attr_type))
+		if attr_name not in fields:
+			raise AttributeError('Attribute ' + attr_name + ' not exists')
+		attr_type = fields[attr_name]
+	if isinstance(attr_type, dict) or flatty.ConvertManager.get_converter(attr_type) \
+		is flatty.TypedDictConverter:
+		raise TypeError('.'.join(path) + ' is not a typed list')
+	try:
+		return flatty.item_type(attr_type)
+	except KeyError:
+		raise TypeError('.'.join(path) + ' is not a typed list')
+
+
+def load(fp, obj_type, path='items', cm=flatty.ConvertManager, chunk_size=65536):
+	"""
+	reads the items of a list in a JSON document one by one
+
+		Args:
+			fp: a file like object containing the flattened `obj_type`
+			obj_type: the :class:`Schema` class of the document
+			path: the dotted path of the list attribute, e.g.
+				'catalog.items'. Other attributes before the list are decoded
+				and dropped. (default='items')
+			chunk_size: the number of bytes read at once
+
+		Returns:
+			a generator of the unflattened items
+	"""
+	path = path.split('.')
+	item_type = _list_item_type(obj_type, path)
+	reader = _Reader(fp, chunk_size)
+
+	for attr_name in path:
+		reader.expect('{')
+		while True:
+			if reader.peek() == '}':
+				raise KeyError(attr_name)
+			key = reader.value()
+			reader.expect(':')
+			if key == attr_name:
+				break
+			reader.value()
+			if reader.peek() == ',':
+				reader.expect(',')
+
+	if reader.peek() == 'n':
+		reader.value()
+		return
+	reader.expect('[')
+	if reader.peek() == ']':
+		return
+	while True:
+		yield flatty.unflatit(reader.value(), item_type, None, cm)
+		if reader.peek() == ']':
+			return
+		reader.expect(',')
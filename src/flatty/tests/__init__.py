@@ -1,12 +1,26 @@
 import unittest
 
 import test_actions
+import test_iterative
+import test_validator
+import test_patching
+import test_binary
+import test_store
+import test_stream
+import test_io
 import test_couchdb
 import test_mongodb
 
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(test_actions.suite())
+    suite.addTest(test_iterative.suite())
+    suite.addTest(test_validator.suite())
+    suite.addTest(test_patching.suite())
+    suite.addTest(test_binary.suite())
+    suite.addTest(test_store.suite())
+    suite.addTest(test_stream.suite())
+    suite.addTest(test_io.suite())
     suite.addTest(test_couchdb.suite())
     suite.addTest(test_mongodb.suite())
     
@@ -5,6 +5,12 @@ import unittest
 import flatty
 import sys
 import copy
+import datetime
+import json
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 from test_utils import is_plain_dict
 
@@ -371,7 +377,845 @@ class ActionsTestCase(unittest.TestCase):
 		s_flat = flatty.flatit(s)
 		self.assertEqual(s, s_flat)
 	
+	def test_flatit_memo(self):
+		class Author(flatty.Schema):
+			name = str
+		
+		class Comment(flatty.Schema):
+			txt = str
+			author = Author
+		
+		class Thread(flatty.Schema):
+			comments = flatty.TypedList.set_type(Comment)
+		
+		author = Author(name='chris')
+		thread = Thread(comments=[Comment(txt='a', author=author),
+								Comment(txt='b', author=author)])
+		
+		flat_dict = flatty.flatit(thread)
+		shared = flatty.flatit(thread, memo='share')
+		copied = flatty.flatit(thread, memo='copy')
+		self.assertEqual(flat_dict, shared)
+		self.assertEqual(flat_dict, copied)
+		self.assertTrue(shared['comments'][0]['author'] is 
+					shared['comments'][1]['author'])
+		self.assertFalse(copied['comments'][0]['author'] is 
+					copied['comments'][1]['author'])
+		self.assertRaises(ValueError, flatty.flatit, thread, memo='foo')
+		
+		#the manager class carrying the memo is created once and reused
+		managers = len(flatty.flatty._managers)
+		for i in range(3):
+			flatty.flatit(thread, memo='share')
+		self.assertEqual(len(flatty.flatty._managers), managers)
+		
+	def test_flatit_memo_cycle(self):
+		class Node(flatty.Schema):
+			name = str
+			next = None
+		
+		a = Node(name='a')
+		b = Node(name='b', next=a)
+		a.next = b
+		self.assertRaises(flatty.CircularReferenceError, flatty.flatit, a,
+						memo='share')
+	
+	def test_slots_schema(self):
+		class Point(flatty.SlotsSchema):
+			x = float
+			y = float
+			label = 'origin'
+		
+		class Point3d(Point):
+			z = float
+		
+		class Shape(flatty.Schema):
+			points = flatty.TypedList.set_type(Point3d)
+		
+		p = Point3d(x=1.0, z=3.0)
+		self.assertFalse(hasattr(p, '__dict__'))
+		self.assertRaises(AttributeError, setattr, p, 'foo', 1)
+		self.assertRaises(AttributeError, Point3d, foo=1)
+		self.assertTrue(p.y is flatty.UNSET)
+		self.assertEqual(p.label, 'origin')
+		
+		flat_dict = flatty.flatit(Shape(points=[p]))
+		self.assertTrue(is_plain_dict(flat_dict))
+		self.assertEqual(flat_dict, {'points':[{'x':1.0, 'y':None, 'z':3.0,
+											'label':'origin'}]})
+		
+		restored = flatty.unflatit(flat_dict, Shape)
+		self.assertTrue(isinstance(restored.points[0], Point3d))
+		self.assertEqual(restored.points[0].x, 1.0)
+		self.assertEqual(restored.points[0].y, None)
+		self.assertEqual(flatty.flatit(restored), flat_dict)
+		self.assertRaises(TypeError, flatty.flatit, Point(x='foo'))
+	
+	def test_column_list(self):
+		class Point(flatty.Schema):
+			x = float
+			y = int
+			label = None
+		
+		class Track(flatty.Schema):
+			points = flatty.ColumnList.set_type(Point)
+		
+		track = Track(points=Track.points())
+		track.points.append(Point(x=1.5, y=2, label='a'))
+		self.assertEqual(track.points.column('y').typecode, 'l')
+		track.points.extend([Point(x=2.5, y=3), Point(x=3.5)])
+		self.assertEqual(len(track.points), 3)
+		self.assertEqual(track.points.column('x').typecode, 'd')
+		self.assertEqual(track.points.column('y'), [2, 3, None])
+		self.assertTrue(isinstance(track.points[0], Point))
+		self.assertEqual(track.points[-1].y, None)
+		self.assertEqual([p.x for p in track.points], [1.5, 2.5, 3.5])
+		
+		track.points[1] = Point(x=0.5, y=1)
+		self.assertEqual(track.points[1].x, 0.5)
+		self.assertRaises(TypeError, track.points.append, Point(x='foo'))
+		
+		flat_dict = flatty.flatit(track)
+		self.assertTrue(is_plain_dict(flat_dict))
+		self.assertEqual(flat_dict['points'][0], {'x':1.5, 'y':2, 'label':'a'})
+		
+		restored = flatty.unflatit(flat_dict, Track)
+		self.assertTrue(isinstance(restored.points, flatty.ColumnList))
+		self.assertEqual(flatty.flatit(restored), flat_dict)
+		
+		#plain lists of schema objects are flattened too
+		self.assertEqual(flatty.flatit(Track(points=[Point(x=1.5, y=2, label='a')])),
+						{'points':[flat_dict['points'][0]]})
+		self.assertRaises(TypeError, flatty.unflatit, {'points':[{'x':'foo'}]}, Track)
+		
+		#untyped values are flattened when they are stored
+		class Label(flatty.Schema):
+			text = str
+		
+		track.points.append(Point(x=4.5, label=Label(text='end')))
+		self.assertEqual(flatty.flatit(track)['points'][-1], 
+						{'x':4.5, 'y':None, 'label':{'text':'end'}})
+		self.assertEqual(track.points[-1].label, {'text':'end'})
+	
+	def test_num_array_unset(self):
+		class Series(flatty.Schema):
+			values = flatty.NumArray.set_type('float64')
+		
+		self.assertEqual(flatty.flatit(Series()), {'values':None})
+		self.assertEqual(flatty.unflatit({'values':None}, Series).values, None)
+		self.assertRaises(ValueError, flatty.NumArray.set_type, 'int8', 'foo')
+	
+	@unittest.skipUnless(numpy, 'numpy is not installed')
+	def test_num_array(self):
+		class Series(flatty.Schema):
+			values = flatty.NumArray.set_type('float64')
+			raw = flatty.NumArray.set_type('int32', encoding='bytes')
+			b64 = flatty.NumArray.set_type('int16', encoding='base64')
+		
+		series = Series(values=numpy.array([1.5, 2.5]), raw=numpy.arange(3),
+					b64=numpy.arange(4, dtype='int16'))
+		flat_dict = flatty.flatit(series)
+		self.assertEqual(flat_dict['values'], [1.5, 2.5])
+		self.assertEqual(flat_dict['raw'], numpy.arange(3, dtype='int32').tostring())
+		
+		restored = flatty.unflatit(flat_dict, Series)
+		self.assertEqual(restored.values.dtype, numpy.dtype('float64'))
+		self.assertEqual(restored.raw.dtype, numpy.dtype('int32'))
+		self.assertEqual(restored.raw.tolist(), [0, 1, 2])
+		self.assertEqual(restored.b64.tolist(), [0, 1, 2, 3])
+		restored.raw[0] = 5
+		
+		#ints are promoted to float, floats are not truncated to ints
+		self.assertEqual(flatty.unflatit({'values':[1, 2]}, Series).values.dtype,
+						numpy.dtype('float64'))
+		self.assertRaises(TypeError, flatty.unflatit, {'raw':[1.5]}, Series)
+		self.assertRaises(TypeError, flatty.unflatit, {'raw':'abcde'}, Series)
+		self.assertRaises(TypeError, flatty.unflatit, {'b64':'AAEC'}, Series)
+		self.assertRaises(TypeError, flatty.unflatit, {'b64':'AAE'}, Series)
+		self.assertRaises(TypeError, flatty.unflatit, {'values':['a']}, Series)
+		self.assertRaises(TypeError, flatty.flatit, Series(values='foo'))
+	
+	def test_unflatit_refresh(self):
+		import datetime
+		
+		class Name(flatty.Schema):
+			first_name = str
+			born = datetime.date
+		
+		class Foo(flatty.Schema):
+			names = flatty.TypedList.set_type(Name)
+			by_key = flatty.TypedDict.set_type(Name)
+			main = Name
+		
+		names = [Name(first_name='hans'), Name(first_name='karl'), Name(first_name='eva')]
+		foo = Foo(names=names, by_key={'a':Name(first_name='a'), 'b':Name(first_name='b')},
+				main=Name(first_name='main', born=datetime.date(2000, 1, 1)))
+		foo = flatty.unflatit(flatty.flatit(foo), Foo)
+		old_list, old_first = foo.names, foo.names[0]
+		old_dict, old_a = foo.by_key, foo.by_key['a']
+		old_main = foo.main
+		
+		flat_dict = {'names':[{'first_name':'anna'}, {'first_name':'otto'}],
+					'by_key':{'a':{'first_name':'x'}, 'c':{'first_name':'c'}},
+					'main':{'first_name':'main', 'born':'2011-07-15'}}
+		for unflatit in [flatty.unflatit, flatty.iterative.unflatit]:
+			refreshed = unflatit(flat_dict, Foo, foo)
+			self.assertTrue(refreshed is foo)
+			self.assertTrue(foo.names is old_list)
+			self.assertTrue(foo.names[0] is old_first)
+			self.assertEqual([n.first_name for n in foo.names], ['anna', 'otto'])
+			self.assertTrue(foo.by_key is old_dict)
+			self.assertTrue(foo.by_key['a'] is old_a)
+			self.assertEqual(sorted(foo.by_key), ['a', 'c'])
+			self.assertTrue(foo.main is old_main)
+			self.assertEqual(foo.main.born, datetime.date(2011, 7, 15))
+		
+		flat_dict['names'].append({'first_name':'new'})
+		flatty.unflatit(flat_dict, Foo, foo)
+		self.assertEqual(len(foo.names), 3)
+		self.assertTrue(foo.names[0] is old_first)
+		
+		#schema defaults are shared by all instances and never refreshed in place
+		class Bar(flatty.Schema):
+			main = Name(first_name='default')
+		bar = flatty.unflatit({'main':{'first_name':'other'}}, Bar, Bar())
+		self.assertEqual(bar.main.first_name, 'other')
+		self.assertEqual(Bar.main.first_name, 'default')
+	
+	def test_primitive_containers(self):
+		class Foo(flatty.Schema):
+			nums = flatty.TypedList.set_type(int)
+			table = flatty.TypedDict.set_type(str)
+			anything = flatty.TypedList.set_type(None)
+		
+		foo = Foo(nums=[1, 2, None], table={'a':'x', 'b':'y'}, anything=[1, 'a', {'b':2}])
+		flat_dict = flatty.flatit(foo)
+		self.assertEqual(flat_dict, {'nums':[1, 2, None], 'table':{'a':'x', 'b':'y'},
+									'anything':[1, 'a', {'b':2}]})
+		restored = flatty.unflatit(flat_dict, Foo)
+		self.assertTrue(isinstance(restored.nums, flatty.TypedList))
+		self.assertEqual(restored.nums, [1, 2, None])
+		self.assertEqual(restored.table, {'a':'x', 'b':'y'})
+		
+		#primitive dicts are refreshed in place, stale keys are dropped
+		old_table = restored.table
+		flatty.unflatit({'table':{'b':'z', 'c':'w'}}, Foo, restored)
+		self.assertTrue(restored.table is old_table)
+		self.assertEqual(restored.table, {'b':'z', 'c':'w'})
+		
+		self.assertRaises(TypeError, flatty.flatit, Foo(nums=[1, 'a']))
+		self.assertRaises(TypeError, flatty.flatit, Foo(table={'a':1}))
+		self.assertRaises(TypeError, flatty.unflatit, {'nums':[1, 'a']}, Foo)
+		self.assertRaises(TypeError, flatty.unflatit, {'table':{'a':1}}, Foo)
+	
+	def test_converter_cache(self):
+		class Celsius(float):
+			pass
+		
+		class CelsiusConverter(flatty.Converter):
+			@classmethod
+			def to_flat(cls, obj_type, obj, val, cm):
+				return str(obj)
+			@classmethod
+			def to_obj(cls, obj_type, val, obj, cm):
+				return Celsius(val)
+		
+		class Foo(flatty.Schema):
+			temps = flatty.TypedList.set_type(Celsius)
+		
+		foo = Foo(temps=[Celsius(1.5)])
+		self.assertEqual(flatty.flatit(foo), {'temps':[Celsius(1.5)]})
+		flatty.ConvertManager.set_converter(Celsius, CelsiusConverter)
+		try:
+			self.assertEqual(flatty.flatit(foo), {'temps':['1.5']})
+		finally:
+			flatty.ConvertManager.del_converter(Celsius)
+		self.assertEqual(flatty.flatit(foo), {'temps':[Celsius(1.5)]})
+	
+	def test_custom_convert_manager(self):
+		class Paint(object):
+			def __init__(self, value):
+				self.value = value
+		
+		class PaintConverter(flatty.Converter):
+			@classmethod
+			def to_flat(cls, obj_type, obj, val, cm):
+				return 'rgb' + str(obj.value)
+			@classmethod
+			def to_obj(cls, obj_type, val, obj, cm):
+				return Paint(int(val[3:]))
+		
+		class PaintManager(flatty.ConvertManager):
+			_convert_dict = dict(flatty.ConvertManager._convert_dict)
+		PaintManager.set_converter(Paint, PaintConverter)
+		
+		class Foo(flatty.Schema):
+			__cache_flat__ = True
+			color = Paint
+		
+		foo = Foo(color=Paint(3))
+		#converters are matched by class name, Rgb is used by other tests
+		#the caches of the managers are separate, in both orders
+		self.assertTrue(flatty.flatit(foo)['color'] is foo.color)
+		self.assertEqual(flatty.flatit(foo, cm=PaintManager), {'color':'rgb3'})
+		self.assertEqual(flatty.flatit(foo, cm=PaintManager, memo='copy'), {'color':'rgb3'})
+		self.assertTrue(flatty.flatit(foo)['color'] is foo.color)
+		self.assertEqual(flatty.unflatit({'color':'rgb5'}, Foo, cm=PaintManager).color.value, 5)
+		self.assertEqual(flatty.ConvertManager.get_converter(Paint), None)
+		self.assertEqual(PaintManager.get_converter(Paint), PaintConverter)
+		
+	def test_schema_plan(self):
+		class Bar(flatty.Schema):
+			a_num = int
+		
+		class Foo(flatty.Schema):
+			a_num = int
+			a_str = str
+			a_float = 1.5
+			a_date = datetime.date
+			a_bar = Bar
+			anything = None
+		
+		plan = flatty.schema_plan(Foo, flatty.ConvertManager)
+		self.assertEqual(plan.kind('a_num'), 'passthrough')
+		self.assertEqual(plan.kind('a_float'), 'passthrough')
+		self.assertEqual(plan.kind('a_date'), 'converter')
+		self.assertEqual(plan.kind('a_bar'), 'schema')
+		self.assertEqual(plan.kind('anything'), 'converter')
+		self.assertTrue(flatty.schema_plan(Foo, flatty.ConvertManager) is plan)
+		
+		foo = Foo(a_num=1, a_date=datetime.date(2010, 1, 2), a_bar=Bar(a_num=2))
+		flat = flatty.flatit(foo)
+		self.assertEqual(flat, {'a_num':1, 'a_str':None, 'a_float':1.5,
+							'a_date':'2010-01-02', 'a_bar':{'a_num':2}, 'anything':None})
+		foo.a_str = 42
+		self.assertRaises(TypeError, flatty.flatit, foo)
+		
+		restored = flatty.unflatit(flat, Foo)
+		self.assertEqual(restored.a_num, 1)
+		self.assertEqual(restored.a_float, 1.5)
+		self.assertEqual(restored.a_date, datetime.date(2010, 1, 2))
+		self.assertEqual(restored.a_bar.a_num, 2)
+		flat['a_num'] = 'x'
+		self.assertRaises(TypeError, flatty.unflatit, flat, Foo)
+		
+		class SubFoo(Foo):
+			a_float = 2.5
+		self.assertEqual(flatty.flatit(SubFoo(a_bar=Bar()), Foo)['a_float'], 2.5)
+	
+	def test_indexed_list(self):
+		class City(flatty.Schema):
+			name = str
+		
+		class Country(flatty.Schema):
+			code = str
+			size = int
+			capital = City
+		
+		Countries = flatty.IndexedList.set_type(Country, 
+							{'code':'hash', 'size':'sorted', 'capital.name':'hash'})
+		
+		class World(flatty.Schema):
+			countries = Countries
+		
+		self.assertRaises(ValueError, flatty.IndexedList.set_type, Country, {'code':'tree'})
+		self.assertRaises(AttributeError, flatty.IndexedList.set_type, Country, {'capital.size':'hash'})
+		
+		at = Country(code='at', size=83871, capital=City(name='vienna'))
+		de = Country(code='de', size=357021, capital=City(name='berlin'))
+		li = Country(code='li', size=160, capital=City(name='vaduz'))
+		countries = Countries([at, de])
+		countries.append(li)
+		self.assertTrue(countries.find_one('code', 'de') is de)
+		self.assertEqual(countries.find('code', 'xx'), [])
+		self.assertEqual(countries.find_range('size', 100, 100000), [li, at])
+		self.assertEqual(countries.find_range('size', low=100000), [de])
+		self.assertRaises(TypeError, countries.find_range, 'code', 'a', 'b')
+		self.assertRaises(KeyError, countries.find, 'capital', None)
+		self.assertRaises(TypeError, countries.append, City(name='rome'))
+		
+		#attribute changes, also of nested schemas, are tracked
+		at.size = 10
+		self.assertEqual(countries.find_range('size', 0, 100), [at])
+		vienna = at.capital
+		at.capital.name = 'wien'
+		self.assertEqual(countries.find('capital.name', 'vienna'), [])
+		self.assertTrue(countries.find_one('capital.name', 'wien') is at)
+		at.capital = City(name='graz')
+		vienna.name = 'vienna'
+		self.assertEqual(countries.find('capital.name', 'vienna'), [])
+		self.assertTrue(countries.find_one('capital.name', 'graz') is at)
+		
+		#removed items are no longer indexed nor watched
+		countries.remove(de)
+		del countries[0]
+		self.assertEqual(countries.find('code', 'de'), [])
+		self.assertEqual(countries.find('code', 'at'), [])
+		de.code = 'xx'
+		self.assertEqual(countries.find('code', 'xx'), [])
+		countries[0:1] = [de]
+		self.assertEqual(countries.find('code', 'li'), [])
+		self.assertTrue(countries.find_one('code', 'xx') is de)
+		
+		#repeated items are indexed once per occurrence
+		countries *= 3
+		self.assertEqual(countries.find('code', 'xx'), [de, de, de])
+		del countries[1:]
+		self.assertEqual(countries.find('code', 'xx'), [de])
+		countries *= 0
+		self.assertEqual(countries.find('code', 'xx'), [])
+		countries.append(de)
+		self.assertEqual(type(countries[:]), list)
+		
+		#flattened like a TypedList, indexes are rebuilt on load
+		world = World(countries=countries)
+		flat = flatty.flatit(world)
+		self.assertEqual(flat, {'countries':[{'code':'xx', 'size':357021, 
+										'capital':{'name':'berlin'}}]})
+		restored = flatty.unflatit(flat, World)
+		self.assertEqual(type(restored.countries), Countries)
+		self.assertEqual(restored.countries.find_one('capital.name', 'berlin').code, 'xx')
+		restored = flatty.iterative.unflatit(flat, World)
+		self.assertEqual(restored.countries.find_one('code', 'xx').size, 357021)
+		copied = copy.deepcopy(restored.countries)
+		self.assertEqual(copied.find_one('code', 'xx').size, 357021)
+	
+	def test_schema_metaclass(self):
+		class Bar(flatty.Schema):
+			a_num = int
+			a_str = str
+			def helper(self):
+				pass
+		
+		class Foo(flatty.Schema):
+			bar = Bar
+		
+		self.assertEqual(flatty.schema_fields(Bar), (('a_num', int), ('a_str', str)))
+		self.assertEqual(flatty.schema_fields(Bar()), flatty.schema_fields(Bar))
+		fingerprint = Foo.__fingerprint__
+		self.assertEqual(len(fingerprint), 16)
+		self.assertEqual(flatty.schema_fingerprint(Foo), fingerprint)
+		
+		#changes of the classes are picked up, also by the classes using them
+		self.assertEqual(flatty.flatit(Foo(bar=Bar(a_num=1))), 
+						{'bar':{'a_num':1, 'a_str':None}})
+		Bar.a_float = float
+		self.assertEqual(flatty.flatit(Foo(bar=Bar(a_num=1))), 
+						{'bar':{'a_num':1, 'a_str':None, 'a_float':None}})
+		self.assertNotEqual(Foo.__fingerprint__, fingerprint)
+		del Bar.a_float
+		self.assertEqual(Foo.__fingerprint__, fingerprint)
+		
+		#the fingerprint only depends on the layout
+		class Bar(flatty.Schema):
+			a_num = int
+			a_str = str
+		class Foo(flatty.Schema):
+			bar = Bar
+		self.assertEqual(Foo.__fingerprint__, fingerprint)
+		
+		class Node(flatty.SlotsSchema):
+			name = str
+			children = None
+		Node.children = flatty.TypedList.set_type(Node)
+		self.assertFalse('children' in Node.__dict__ and 
+						not hasattr(Node.__dict__['children'], '__get__'))
+		node = flatty.unflatit({'name':'a', 'children':[{'name':'b', 'children':[]}]}, Node)
+		self.assertEqual(node.children[0].name, 'b')
+	
+	def test_migration(self):
+		class Bar(flatty.Schema):
+			__schema_version__ = 2
+			name = str
+			size = int
+		
+		class Foo(flatty.Schema):
+			bars = flatty.TypedList.set_type(Bar)
+		
+		calls = []
+		@flatty.migration(Bar, 0)
+		def add_size(flat):
+			calls.append(0)
+			flat['size'] = 0
+		
+		@flatty.migration(Bar, 1)
+		def rename_title(flat):
+			calls.append(1)
+			flat['name'] = flat.pop('title')
+		
+		self.assertEqual(flatty.flatit(Bar(name='a', size=1)), 
+						{'_version':2, 'name':'a', 'size':1})
+		old = {'bars':[{'title':'a'}, {'_version':1, 'title':'b', 'size':3},
+					{'_version':2, 'name':'c', 'size':4}]}
+		foo = flatty.unflatit(old, Foo)
+		self.assertEqual([(bar.name, bar.size) for bar in foo.bars], 
+						[('a', 0), ('b', 3), ('c', 4)])
+		self.assertEqual(calls, [0, 1, 1])
+		self.assertEqual(old['bars'][0], {'title':'a'})
+		
+		foo = flatty.iterative.unflatit(old, Foo)
+		self.assertEqual([bar.name for bar in foo.bars], ['a', 'b', 'c'])
+		self.assertEqual(flatty.iterative.flatit(foo), flatty.flatit(foo))
+		self.assertEqual(flatty.binary.loads(flatty.binary.dumps(foo), Foo).bars[0].name, 'a')
+		self.assertEqual(flatty.diff({'name':'a', 'size':0}, Bar(name='a', size=0)), 
+						[{'op':'add', 'path':'/_version', 'value':2}])
+		
+		self.assertRaises(flatty.MigrationError, flatty.unflatit, 
+						{'_version':3, 'name':'a'}, Bar)
+		
+		class Baz(flatty.Schema):
+			__schema_version__ = 1
+			tags = flatty.TypedDict.set_type(str)
+		
+		@flatty.migration(Baz, 0)
+		def rename_tag(flat):
+			flat['tags']['new'] = flat['tags'].pop('old')
+		
+		old = {'tags':{'old':'x'}}
+		self.assertEqual(flatty.migrate(old, Baz), {'_version':1, 'tags':{'new':'x'}})
+		self.assertEqual(old, {'tags':{'old':'x'}})
+	
+	def test_flat_cache(self):
+		class Tag(flatty.Schema):
+			name = str
+		
+		Tags = flatty.TypedList.set_type(Tag)
+		Votes = flatty.TypedDict.set_type(int)
+		
+		class Post(flatty.Schema):
+			__cache_flat__ = True
+			title = str
+			author = Tag
+			tags = Tags
+			votes = Votes
+			created = datetime.date
+		
+		post = Post(title='a', author=Tag(name='chris'), tags=Tags([Tag(name='x')]),
+				votes=Votes({'chris':1}), created=datetime.date(2011, 7, 15))
+		flat = flatty.flatit(post)
+		self.assertTrue('__flat__' in post.__dict__)
+		self.assertFalse('__flat__' in flat)
+		#a copy of the cached dict is returned
+		flat['title'] = 'changed'
+		self.assertEqual(flatty.flatit(post)['title'], 'a')
+		
+		#attribute writes, also in nested schemas and containers, invalidate
+		post.title = 'b'
+		self.assertEqual(flatty.flatit(post)['title'], 'b')
+		post.author.name = 'karl'
+		self.assertEqual(flatty.flatit(post)['author'], {'name':'karl'})
+		post.tags[0].name = 'y'
+		self.assertEqual(flatty.flatit(post)['tags'], [{'name':'y'}])
+		post.tags.append(Tag(name='z'))
+		self.assertEqual(flatty.flatit(post)['tags'], [{'name':'y'}, {'name':'z'}])
+		post.votes['karl'] = 2
+		self.assertEqual(flatty.flatit(post)['votes'], {'chris':1, 'karl':2})
+		del post.votes['chris']
+		self.assertEqual(flatty.flatit(post)['votes'], {'karl':2})
+		old_author = post.author
+		post.author = Tag(name='new')
+		old_author.name = 'old'
+		self.assertEqual(flatty.flatit(post)['author'], {'name':'new'})
+		#detached objects are no longer observed
+		self.assertEqual(list(old_author.__observers__), [])
+		self.assertTrue('__flat__' in post.__dict__)
+		old_author.name = 'older'
+		self.assertTrue('__flat__' in post.__dict__)
+		post.author.name = 'newer'
+		self.assertEqual(flatty.flatit(post)['author'], {'name':'newer'})
+		
+		#with memo='share' the cached dict isn't handed out either
+		shared = flatty.flatit(post, memo='share')
+		shared['author']['name'] = 'changed'
+		self.assertEqual(flatty.flatit(post, memo='share')['author'], {'name':'newer'})
+		
+		#copies don't reuse the cache of the original
+		post_copy = copy.deepcopy(post)
+		post_copy.tags[0].name = 'copied'
+		self.assertEqual(flatty.flatit(post_copy)['tags'][0], {'name':'copied'})
+		self.assertEqual(flatty.flatit(post)['tags'][0], {'name':'y'})
+		
+		#plain containers aren't observed, such objects aren't cached
+		class Note(flatty.Schema):
+			__cache_flat__ = True
+			lines = list
+			tags = Tags
+		
+		note = Note(lines=['a'], tags=[])
+		self.assertEqual(flatty.flatit(note), {'lines':['a'], 'tags':[]})
+		self.assertFalse('__flat__' in note.__dict__)
+		note.lines.append('b')
+		note.tags.append(Tag(name='t'))
+		self.assertEqual(flatty.flatit(note), {'lines':['a', 'b'], 'tags':[{'name':'t'}]})
+		
+		#not cached by default
+		tag = Tag(name='t')
+		flatty.flatit(tag)
+		self.assertFalse('__flat__' in tag.__dict__)
+		
+		def slots_cache():
+			class Point(flatty.SlotsSchema):
+				__cache_flat__ = True
+				x = int
+		self.assertRaises(TypeError, slots_cache)
+	
+	def test_frozen_schema(self):
+		class Currency(flatty.FrozenSchema):
+			code = str
+			digits = int
+		
+		class Price(flatty.Schema):
+			__cache_flat__ = True
+			amount = int
+			currency = Currency
+		
+		eur = Currency(code='EUR', digits=2)
+		self.assertRaises(AttributeError, setattr, eur, 'digits', 3)
+		self.assertRaises(AttributeError, delattr, eur, 'code')
+		self.assertEqual(eur, Currency(code='EUR', digits=2))
+		self.assertNotEqual(eur, Currency(code='USD', digits=2))
+		self.assertEqual(len(set([eur, Currency(code='EUR', digits=2)])), 1)
+		self.assertTrue(copy.deepcopy(eur) is eur)
+		
+		#identical flat dicts give the same instance
+		flat = [{'amount':1, 'currency':{'code':'EUR', 'digits':2}},
+				{'amount':2, 'currency':{'code':'EUR', 'digits':2}},
+				{'amount':3, 'currency':{'code':'USD', 'digits':2}}]
+		prices = [flatty.unflatit(f, Price) for f in flat]
+		self.assertTrue(prices[0].currency is prices[1].currency)
+		self.assertFalse(prices[0].currency is prices[2].currency)
+		self.assertEqual(prices[0].currency, eur)
+		self.assertRaises(AttributeError, setattr, prices[0].currency, 'code', 'x')
+		iterative = flatty.iterative.unflatit(flat[1], Price)
+		self.assertTrue(iterative.currency is prices[0].currency)
+		
+		#the existing instance isn't refreshed in place
+		usd = prices[2].currency
+		flatty.unflatit(flat[0], Price, prices[2])
+		self.assertTrue(prices[2].currency is prices[0].currency)
+		self.assertEqual(usd.code, 'USD')
+		
+		self.assertEqual([flatty.flatit(p) for p in prices], 
+						[flat[0], flat[1], flat[0]])
+		#frozen values don't prevent caching
+		self.assertTrue('__flat__' in prices[0].__dict__)
+		
+		#the occurrences of a frozen value share one copy within a call
+		class Basket(flatty.Schema):
+			currencies = flatty.TypedList.set_type(Currency)
+		
+		basket = Basket(currencies=[eur, eur])
+		for memo in ('share', 'share', 'copy'):
+			flat_basket = flatty.flatit(basket, memo=memo)
+			self.assertEqual(flat_basket['currencies'][0], {'code':'EUR', 'digits':2})
+			self.assertEqual(flat_basket['currencies'][0] is flat_basket['currencies'][1], 
+							memo == 'share')
+			flat_basket['currencies'][0]['code'] = 'changed'
+		self.assertEqual(flatty.flatit(eur), {'code':'EUR', 'digits':2})
+		
+		#equal values of different types aren't interned together
+		class Amount(flatty.FrozenSchema):
+			v = None
+		
+		amounts = [flatty.unflatit({'v':v}, Amount) for v in (1, True, 1.0, 1)]
+		self.assertEqual([type(a.v) for a in amounts], [int, bool, float, int])
+		self.assertTrue(amounts[0] is amounts[3])
+		self.assertFalse(amounts[0] is amounts[1] or amounts[0] is amounts[2])
+	
+	def test_projection(self):
+		class User(flatty.Schema):
+			name = str
+			password = str
+		
+		class Comment(flatty.Schema):
+			user = User
+			txt = str
+			votes = int
+		
+		class Post(flatty.Schema):
+			title = str
+			author = User
+			comments = flatty.TypedList.set_type(Comment)
+			by_user = flatty.TypedDict.set_type(Comment)
+		
+		chris = User(name='chris', password='secret')
+		comment = Comment(user=chris, txt='nice', votes=3)
+		post = Post(title='flatty', author=chris, comments=[comment], 
+				by_user={'chris':comment})
+		
+		self.assertEqual(flatty.flatit(post, only=['title']), {'title':'flatty'})
+		self.assertEqual(flatty.flatit(post, only=['title', 'author.name']), 
+						{'title':'flatty', 'author':{'name':'chris'}})
+		self.assertEqual(flatty.flatit(post, only=['author', 'author.name']), 
+						{'author':{'name':'chris', 'password':'secret'}})
+		self.assertEqual(flatty.flatit(post, only=['comments.user.name', 'comments.votes']), 
+						{'comments':[{'user':{'name':'chris'}, 'votes':3}]})
+		self.assertEqual(flatty.flatit(post, exclude=['author.password', 'comments', 
+													'by_user.user', 'by_user.txt']), 
+						{'title':'flatty', 'author':{'name':'chris'}, 
+						'by_user':{'chris':{'votes':3}}})
+		self.assertEqual(flatty.flatit(post, only=['author'], exclude='author.password'), 
+						{'author':{'name':'chris'}})
+		
+		#unset lists are flattened to None
+		self.assertEqual(flatty.flatit(Post(author=chris), only=['author.name', 'comments.txt']),
+						{'author':{'name':'chris'}, 'comments':None})
+		
+		self.assertRaises(AttributeError, flatty.flatit, post, only=['missing'])
+		self.assertRaises(AttributeError, flatty.flatit, post, exclude=['author.missing'])
+		self.assertRaises(TypeError, flatty.flatit, post, only=['title.x'])
+		
+		#compiled once per class and projection
+		plan = flatty.projection_plan(Post, flatty.ConvertManager, ['author.name'])
+		self.assertTrue(plan is flatty.projection_plan(Post, flatty.ConvertManager, 
+													['author.name']))
+		self.assertEqual([a[0] for a in plan.converted], ['author'])
+		self.assertEqual(plan.passthrough, [])
+	
+	def test_polymorphic(self):
+		class Shape(flatty.Schema):
+			__discriminator__ = 'kind'
+			name = str
+		
+		class Circle(Shape):
+			__discriminator_value__ = 'circle'
+			radius = int
+		
+		class Square(Shape):
+			__discriminator_value__ = 'square'
+			side = int
+		
+		class Drawing(flatty.Schema):
+			main = Shape
+			shapes = flatty.TypedList.set_type(Shape)
+		
+		self.assertEqual(Shape.__subtypes__, {'circle':Circle, 'square':Square})
+		drawing = Drawing(main=Circle(name='c', radius=2), 
+						shapes=[Square(name='s', side=3), Shape(name='x')])
+		flat = flatty.flatit(drawing)
+		self.assertEqual(flat, {'main':{'kind':'circle', 'name':'c', 'radius':2},
+							'shapes':[{'kind':'square', 'name':'s', 'side':3},
+									{'name':'x'}]})
+		self.assertEqual(flatty.iterative.flatit(drawing), flat)
+		self.assertRaises(TypeError, flatty.binary.dumps, drawing)
+		
+		for unflatit in (flatty.unflatit, flatty.iterative.unflatit):
+			restored = unflatit(flat, Drawing)
+			self.assertEqual(type(restored.main), Circle)
+			self.assertEqual(restored.main.radius, 2)
+			self.assertEqual([type(s) for s in restored.shapes], [Square, Shape])
+			self.assertEqual(flatty.flatit(restored), flat)
+		
+		#existing instances of another class are replaced
+		restored = flatty.unflatit(flat, Drawing)
+		circle = restored.main
+		flat['main'] = {'kind':'square', 'name':'c', 'side':1}
+		flatty.unflatit(flat, Drawing, restored)
+		self.assertEqual(type(restored.main), Square)
+		flat['main'] = {'kind':'square', 'name':'c', 'side':5}
+		square = restored.main
+		flatty.unflatit(flat, Drawing, restored)
+		self.assertTrue(restored.main is square)
+		self.assertEqual(square.side, 5)
+		
+		self.assertEqual(type(flatty.unflatit({'kind':'circle'}, Shape)), Circle)
+		self.assertRaises(ValueError, flatty.unflatit, {'kind':'triangle'}, Shape)
+		self.assertRaises(ValueError, flatty.unflatit, {'kind':'circle'}, Square)
+		validator = flatty.validator.compile_validator(Shape)
+		self.assertEqual(validator({'kind':'triangle'}), 
+						[('kind', "Unknown kind 'triangle' for Shape")])
+		self.assertEqual(len(validator({'kind':'circle', 'radius':'x'})), 1)
+		self.assertEqual(validator({'kind':'square', 'side':1}), [])
+		self.assertEqual(flatty.diff({'kind':'circle', 'radius':1}, 
+									{'kind':'square', 'side':1}, Shape),
+						[{'op':'replace', 'path':'', 'value':{'kind':'square', 'side':1}}])
+		self.assertEqual(flatty.diff({'kind':'circle', 'radius':1}, 
+									{'kind':'circle', 'radius':2}, Shape),
+						[{'op':'replace', 'path':'/radius', 'value':2}])
+		
+		#projections are resolved per subtype and keep the discriminator
+		self.assertEqual(flatty.flatit(drawing, exclude=['main.name', 'shapes.name']),
+						{'main':{'kind':'circle', 'radius':2},
+						'shapes':[{'kind':'square', 'side':3}, {}]})
+		self.assertEqual(flatty.flatit(drawing, only=['main.radius', 'shapes.side']),
+						{'main':{'kind':'circle', 'radius':2},
+						'shapes':[{'kind':'square', 'side':3}, {}]})
+		self.assertEqual(flatty.flatit(Circle(name='c', radius=2), Shape, exclude=['name']),
+						{'kind':'circle', 'radius':2})
+		self.assertRaises(AttributeError, flatty.flatit, drawing, only=['main.color'])
+	
+	def test_warmup(self):
+		import types
+		import tempfile
+		import os
+		
+		module = types.ModuleType('flatty_warmup_models')
+		class Region(flatty.Schema):
+			name = str
+		class Country(flatty.Schema):
+			regions = flatty.TypedList.set_type(Region)
+			capital = {'name':str, 'region':Region}
+		class Planet(flatty.Schema):
+			countries = flatty.TypedDict.set_type(Country)
+		for cls in (Region, Country, Planet):
+			cls.__module__ = module.__name__
+		module.Planet = Planet
+		module.Region = Region
+		sys.modules[module.__name__] = module
+		
+		fd, path = tempfile.mkstemp()
+		os.close(fd)
+		os.remove(path)
+		try:
+			flatty.ConvertManager._plan_cache.clear()
+			report = flatty.warmup([module], path=path)
+			self.assertEqual(report['classes'], 3)
+			self.assertEqual(report['missing'], [])
+			self.assertTrue(report['seconds'] >= 0)
+			for cls in (Region, Country, Planet):
+				self.assertTrue(cls in flatty.ConvertManager._plan_cache)
+				self.assertTrue(cls in flatty.ConvertManager._fingerprint_cache)
 			
+			#Country can't be imported by name
+			self.assertEqual(json.load(open(path)), 
+							['flatty_warmup_models:Planet', 'flatty_warmup_models:Region'])
+			
+			flatty.ConvertManager._plan_cache.clear()
+			del module.Region
+			report = flatty.warmup(path=path)
+			self.assertEqual(report['classes'], 3)
+			self.assertEqual(report['missing'], ['flatty_warmup_models:Region'])
+			self.assertTrue(Region in flatty.ConvertManager._plan_cache)
+		finally:
+			del sys.modules[module.__name__]
+			os.remove(path)
+	
+	def test_lazy_import(self):
+		import os
+		import subprocess
+		
+		#a fresh interpreter, the modules imported by the tests don't count
+		src = os.path.dirname(os.path.dirname(os.path.abspath(flatty.__file__)))
+		script = ('import sys, time\n'
+				'start = time.time()\n'
+				'import flatty\n'
+				'print time.time() - start\n'
+				'print " ".join(sorted(sys.modules))\n')
+		env = dict(os.environ, PYTHONPATH=src)
+		output = subprocess.Popen([sys.executable, '-c', script], env=env, 
+								stdout=subprocess.PIPE).communicate()[0]
+		seconds, modules = output.splitlines()
+		modules = modules.split()
+		for name in ('flatty.mongo', 'flatty.couch', 'flatty.io', 'flatty.stream', 
+					'flatty.store', 'pymongo', 'bson', 'couchdb', 'multiprocessing', 
+					'gzip', 'json'):
+			self.assertFalse(name in modules, name + ' imported by flatty')
+		self.assertTrue(float(seconds) < 1.0)
+		
+		self.assertTrue(flatty.io.dump_ndjson)
+		self.assertTrue(hasattr(flatty, 'stream'))
+		self.assertFalse(hasattr(flatty, 'missing'))
+		
 			
 def suite():
 	suite = unittest.TestSuite()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import unittest
+import flatty
+import sys
+import datetime
+import pickle
+import json
+import StringIO
+
+
+class BinaryTestCase(unittest.TestCase):
+
+	def setUp(self):
+		class Comment(flatty.Schema):
+			user = str
+			txt = str
+			votes = int
+
+		class Book(flatty.Schema):
+			name = str
+			year = datetime.date
+			comments = flatty.TypedList.set_type(Comment)
+			ratings = flatty.TypedDict.set_type(int)
+			best = Comment
+
+		self.Comment = Comment
+		self.Book = Book
+		self.book = Book(name='flatty', year=datetime.date(2011, 7, 15),
+						comments=[Comment(user='chris', txt='nice', votes=3)],
+						ratings={'chris':5, 'karl':3},
+						best=Comment(user='chris', txt='nice'))
+
+	def tearDown(self):
+		pass
+
+	def test_dumps_loads(self):
+		data = flatty.binary.dumps(self.book)
+		book = flatty.binary.loads(data, self.Book)
+		self.assertEqual(flatty.flatit(book), flatty.flatit(self.book))
+		self.assertEqual(book.comments[0].votes, 3)
+		self.assertEqual(book.best.votes, None)
+
+		f = StringIO.StringIO()
+		flatty.binary.dump(self.book, f)
+		f.seek(0)
+		self.assertEqual(flatty.flatit(flatty.binary.load(f, self.Book)),
+						flatty.flatit(self.book))
+
+	def test_schema_mismatch(self):
+		data = flatty.binary.dumps(self.book)
+
+		class Book(flatty.Schema):
+			name = str
+			year = datetime.date
+			comments = flatty.TypedList.set_type(self.Comment)
+			ratings = flatty.TypedDict.set_type(str)
+			best = self.Comment
+
+		self.assertNotEqual(flatty.schema_fingerprint(Book),
+						flatty.schema_fingerprint(self.Book))
+		self.assertRaises(flatty.binary.SchemaMismatchError,
+						flatty.binary.loads, data, Book)
+		self.assertRaises(flatty.binary.SchemaMismatchError,
+						flatty.binary.loads, 'garbage', self.Book)
+
+	def test_schema_version(self):
+		class Tool(flatty.Schema):
+			__schema_version__ = 1
+			size = int
+
+		data = flatty.binary.dumps(Tool(size=5))
+		self.assertEqual(flatty.binary.loads(data, Tool).size, 5)
+
+		class Tool(flatty.Schema):
+			__schema_version__ = 2
+			size = int
+
+		@flatty.migration(Tool, 1)
+		def to_mm(flat):
+			flat['size'] *= 10
+
+		#same layout, the records are migrated instead of taken as current
+		self.assertEqual(flatty.schema_fingerprint(Tool),
+						flatty.binary.dumps(Tool())[5:13].encode('hex'))
+		self.assertEqual(flatty.binary.loads(data, Tool).size, 50)
+		self.assertEqual(flatty.binary.loads(flatty.binary.dumps(Tool(size=5)), Tool).size, 5)
+
+	def test_recursive_schema(self):
+		class Category(flatty.Schema):
+			name = str
+			children = None
+		Category.children = flatty.TypedList.set_type(Category)
+
+		root = Category(name='root', children=[Category(name='sub', children=[])])
+		restored = flatty.binary.loads(flatty.binary.dumps(root), Category)
+		self.assertEqual(restored.children[0].name, 'sub')
+		self.assertEqual(flatty.flatit(restored), flatty.flatit(root))
+
+	def test_stream(self):
+		Comment = self.Comment
+		comments = flatty.TypedList.set_type(Comment)(
+				Comment(user='u' + str(i), txt='t', votes=i) for i in range(100))
+		f = StringIO.StringIO()
+		self.assertEqual(flatty.binary.dump_items(comments, Comment, f), 100)
+		f.seek(0)
+		restored = list(flatty.binary.iterload(f, Comment))
+		self.assertEqual(len(restored), 100)
+		self.assertEqual(restored[42].user, 'u42')
+		self.assertEqual(restored[42].votes, 42)
+
+	def test_size(self):
+		Comment = self.Comment
+		book = self.book
+		book.comments = [Comment(user='user' + str(i), txt='text', votes=i)
+						for i in range(500)]
+		flat = flatty.flatit(book)
+		data = flatty.binary.dumps(book)
+		self.assertTrue(len(data) < len(pickle.dumps(flat, pickle.HIGHEST_PROTOCOL)))
+		self.assertTrue(len(data) < len(json.dumps(flat)))
+
+
+def suite():
+	suite = unittest.TestSuite()
+	if len(sys.argv) > 1 and sys.argv[1][:2] == 't:':
+		suite.addTest(BinaryTestCase(sys.argv[1][2:]))
+	else:
+		suite.addTest(unittest.makeSuite(BinaryTestCase, 'test'))
+	return suite
+
+
+if __name__ == '__main__':
+	#call it with
+	#t:<my_testcase>
+	#to launch only <my_testcase> test
+	unittest.TextTestRunner(verbosity=1).run(suite())
@@ -95,6 +95,30 @@ class CouchdbTestCase(unittest.TestCase):
 		self.assertEqual(len(library2.books['978-0596158101'].comments), 1)
 		self.assertTrue(isinstance(library2.address, Address))
 		
+	def test_unit_of_work(self):
+		db = self.db
+		
+		class Person(flatty.couch.Document):
+			name = basestring
+			age = int
+		
+		person = Person(name='John Doe', age=42)
+		person.store(db)
+		other = Person(name='Jane Doe', age=41)
+		with flatty.couch.unit_of_work(db) as uow:
+			person.age = 43
+			person.store(uow)
+			person.store(uow)
+			other.store(uow)
+		self.assertEqual(Person.load(db, person._id).age, 43)
+		self.assertEqual(Person.load(db, other._id).name, 'Jane Doe')
+		
+		conflicting = Person.load(db, person._id)
+		person.store(db)
+		conflicting.age = 44
+		with self.assertRaises(couchdb.ResourceConflict):
+			with flatty.couch.unit_of_work(db) as uow:
+				conflicting.store(uow)
 
 		
 		
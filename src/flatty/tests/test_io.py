@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import unittest
+import flatty
+import sys
+import datetime
+import StringIO
+
+
+class IOTestCase(unittest.TestCase):
+
+	def setUp(self):
+		class Region(flatty.Schema):
+			name = basestring
+
+		class Country(flatty.Schema):
+			code = basestring
+			size = int
+			founded = datetime.date
+			regions = flatty.TypedList.set_type(Region)
+
+		self.Country = Country
+		self.countries = [Country(code='c' + str(i), size=i,
+								founded=datetime.date(2000, 1, 1),
+								regions=[Region(name=u'rä' + str(i))])
+						for i in range(250)]
+
+	def tearDown(self):
+		pass
+
+	def _dump(self, **kwargs):
+		f = StringIO.StringIO()
+		count = flatty.io.dump_ndjson(iter(self.countries), f, **kwargs)
+		self.assertEqual(count, 250)
+		return f.getvalue()
+
+	def test_round_trip(self):
+		data = self._dump(buffer_size=100)
+		self.assertEqual(len(data.splitlines()), 250)
+		countries = list(flatty.io.load_ndjson(StringIO.StringIO(data), self.Country))
+		self.assertEqual(len(countries), 250)
+		self.assertEqual([flatty.flatit(c) for c in countries],
+						[flatty.flatit(c) for c in self.countries])
+		self.assertEqual(countries[3].founded, datetime.date(2000, 1, 1))
+		self.assertEqual(countries[3].regions[0].name, u'rä3')
+
+	def test_gzip(self):
+		data = self._dump(compress=True)
+		self.assertEqual(data[:2], '\x1f\x8b')
+		countries = flatty.io.load_ndjson(StringIO.StringIO(data), self.Country,
+										compressed=True)
+		self.assertEqual([c.size for c in countries], range(250))
+
+	def test_offset(self):
+		data = self._dump() + '\n'
+		countries = flatty.io.load_ndjson(StringIO.StringIO(data), self.Country,
+										offset=100)
+		self.assertEqual([c.size for c in countries], range(100, 250))
+		countries = flatty.io.load_ndjson(StringIO.StringIO(data), self.Country,
+										offset=300)
+		self.assertEqual(list(countries), [])
+
+
+def suite():
+	suite = unittest.TestSuite()
+	if len(sys.argv) > 1 and sys.argv[1][:2] == 't:':
+		suite.addTest(IOTestCase(sys.argv[1][2:]))
+	else:
+		suite.addTest(unittest.makeSuite(IOTestCase, 'test'))
+	return suite
+
+
+if __name__ == '__main__':
+	#call it with
+	#t:<my_testcase>
+	#to launch only <my_testcase> test
+	unittest.TextTestRunner(verbosity=1).run(suite())
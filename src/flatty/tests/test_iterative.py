@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import unittest
+import flatty
+import sys
+import datetime
+
+from test_utils import is_plain_dict
+
+
+class IterativeTestCase(unittest.TestCase):
+	
+	def setUp(self):
+		pass
+	def tearDown(self):
+		pass
+	
+	def test_same_as_recursive(self):
+		class Region(flatty.Schema):
+			name = str
+			founded = datetime.date
+		
+		class Country(flatty.Schema):
+			size = int
+			regions = flatty.TypedList.set_type(Region)
+		
+		class World(flatty.Schema):
+			countries = flatty.TypedDict.set_type(Country)
+			capital = Region
+			
+		regions = [Region(name='styria', founded=datetime.date(1180, 1, 1)),
+				Region(name='carinthia')]
+		world = World(countries={'austria':Country(size=7, regions=regions)},
+					capital=Region(name='vienna'))
+		
+		flat_dict = flatty.flatit(world)
+		iter_flat_dict = flatty.iterative.flatit(world)
+		self.assertTrue(is_plain_dict(iter_flat_dict))
+		self.assertEqual(flat_dict, iter_flat_dict)
+		
+		world2 = flatty.iterative.unflatit(flat_dict, World)
+		self.assertTrue(isinstance(world2, World))
+		self.assertTrue(isinstance(world2.capital, Region))
+		self.assertTrue(isinstance(world2.countries['austria'].regions[0], Region))
+		self.assertEqual(world2.countries['austria'].regions[0].founded,
+						datetime.date(1180, 1, 1))
+		self.assertEqual(flatty.flatit(world2), flat_dict)
+		self.assertEqual(flatty.flatit(flatty.unflatit(flat_dict, World)),
+						flat_dict)
+	
+	def test_deep_nesting(self):
+		class Category(flatty.Schema):
+			name = str
+			children = None
+		Category.children = flatty.TypedList.set_type(Category)
+		
+		depth = sys.getrecursionlimit() * 2
+		leaf = Category(name='root')
+		for i in range(depth):
+			leaf = Category(name='sub', children=[leaf])
+		
+		flat_dict = flatty.iterative.flatit(leaf)
+		restored = flatty.iterative.unflatit(flat_dict, Category)
+		for i in range(depth):
+			restored = restored.children[0]
+		self.assertEqual(restored.name, 'root')
+		self.assertEqual(restored.children, None)
+	
+	def test_types(self):
+		class Name(flatty.Schema):
+			first_name = str
+		
+		class Foo(flatty.Schema):
+			b = flatty.TypedList.set_type(Name)
+		
+		self.assertRaises(TypeError, flatty.iterative.flatit,
+						Foo(b=[Name(), 'foobar']))
+		self.assertRaises(TypeError, flatty.iterative.unflatit,
+						{'b':[{'first_name':42}]}, Foo)
+	
+	def test_cycle(self):
+		class Node(flatty.Schema):
+			next = None
+		
+		a = Node()
+		a.next = Node(next=a)
+		self.assertRaises(flatty.CircularReferenceError,
+						flatty.iterative.flatit, a)
+
+
+def suite():
+	suite = unittest.TestSuite()
+	if len(sys.argv) > 1 and sys.argv[1][:2] == 't:':
+		suite.addTest(IterativeTestCase(sys.argv[1][2:]))
+	else:
+		suite.addTest(unittest.makeSuite(IterativeTestCase, 'test'))
+	return suite
+
+
+if __name__ == '__main__':
+	#call it with 
+	#t:<my_testcase>
+	#to launch only <my_testcase> test 
+	unittest.TextTestRunner(verbosity=1).run(suite())
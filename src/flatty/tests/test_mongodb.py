@@ -1,6 +1,7 @@
 
 import flatty
 import pymongo
+from bson.objectid import ObjectId
 import unittest
 import sys
 
@@ -120,6 +121,119 @@ class MongodbTestCase(unittest.TestCase):
 		person_conflicting.age = 86
 		
 		self.assertRaises(flatty.mongo.UpdateFailedError, person_conflicting.store, db)
+	
+	def test_session(self):
+		db = self.db
+		
+		class Person(flatty.mongo.Document):
+			name = basestring
+			age = int
+		
+		with flatty.mongo.Session(db, max_queued=10, max_delay=60) as session:
+			people = [Person(name='p' + str(i), age=i) for i in range(25)]
+			for person in people:
+				person.store(session)
+			self.assertEqual(session.stats['flushes'], 2)
+			self.assertEqual(session.stats['queued'], 5)
+			#stored again before the flush, only written once
+			people[-1].age = 100
+			people[-1].store(session)
+			self.assertEqual(session.stats['queued'], 5)
+		self.assertEqual(session.stats['written'], 25)
+		self.assertEqual(db['person'].count(), 25)
+		self.assertEqual(Person.load(db, people[-1]._id).age, 100)
+		
+		person = Person.load(session, people[0]._id)
+		person.name = 'renamed'
+		person.store(session)
+		session.flush()
+		self.assertEqual(Person.load(db, people[0]._id).name, 'renamed')
+		
+		conflicting = Person.load(db, people[0]._id)
+		person.age = 1
+		person.store(db)
+		conflicting.age = 2
+		conflicting.store(session)
+		other = Person.load(db, people[1]._id)
+		other.age = 3
+		other.store(session)
+		try:
+			session.flush()
+			self.fail('UpdateFailedError not raised')
+		except flatty.mongo.UpdateFailedError, e:
+			self.assertEqual([doc for doc, error in e.failed], [conflicting])
+		#the successful write is done, the failed one is not retried
+		self.assertEqual(Person.load(db, people[1]._id).age, 3)
+		self.assertEqual(session.stats['queued'], 0)
+		session.flush()
+	
+	def test_session_reconnect_failure(self):
+		from pymongo.errors import AutoReconnect
+		db = self.db
+		
+		class Alpha(flatty.mongo.Document):
+			name = basestring
+		
+		class Beta(flatty.mongo.Document):
+			name = basestring
+		
+		class Unreachable(object):
+			def initialize_unordered_bulk_op(self):
+				raise AutoReconnect('down')
+		
+		alpha = Alpha(name='a')
+		alpha.store(db)
+		conflicting = Alpha.load(db, alpha._id)
+		alpha.name = 'b'
+		alpha.store(db)
+		
+		session = flatty.mongo.Session(db, max_delay=60, retries=1, backoff=0)
+		session._collections['beta'] = Unreachable()
+		conflicting.name = 'c'
+		conflicting.store(session)
+		Beta(name='b').store(session)
+		try:
+			session.flush()
+			self.fail('AutoReconnect not raised')
+		except AutoReconnect, e:
+			self.assertEqual([doc for doc, error in e.failed], [conflicting])
+		#the writes of the unreachable collection are still queued
+		self.assertEqual(session.stats['queued'], 1)
+	
+	def test_unit_of_work(self):
+		db = self.db
+		
+		class Person(flatty.mongo.Document):
+			name = basestring
+			age = int
+		
+		class Book(flatty.mongo.Document):
+			name = basestring
+		
+		person = Person(name='John Doe', age=42)
+		person.store(db)
+		with flatty.mongo.unit_of_work(db) as uow:
+			person.age = 43
+			person.store(uow)
+			person.name = 'John R. Doe'
+			person.store(uow)
+			book = Book(name='Dive Into Python')
+			book_id = book.store(uow)
+			self.assertTrue(isinstance(book_id, ObjectId))
+			self.assertEqual(book.store(uow), book_id)
+			self.assertEqual(db['book'].count(), 0)
+		self.assertEqual(db['book'].count(), 1)
+		self.assertEqual(Book.load(db, book_id).name, 'Dive Into Python')
+		stored = Person.load(db, person._id)
+		self.assertEqual((stored.name, stored.age), ('John R. Doe', 43))
+		
+		try:
+			with flatty.mongo.unit_of_work(db) as uow:
+				Book(name='lost').store(uow)
+				raise ValueError()
+		except ValueError:
+			pass
+		self.assertEqual(db['book'].count(), 1)
 		
 		
 		
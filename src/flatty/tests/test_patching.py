@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import unittest
+import flatty
+import sys
+import copy
+import datetime
+
+
+class PatchingTestCase(unittest.TestCase):
+	
+	def setUp(self):
+		class Comment(flatty.Schema):
+			user = str
+			txt = str
+		
+		class Book(flatty.Schema):
+			name = str
+			year = datetime.date
+			comments = flatty.TypedList.set_type(Comment)
+			ratings = flatty.TypedDict.set_type(int)
+			best = Comment
+		
+		self.Comment = Comment
+		self.Book = Book
+		self.book = Book(name='flatty', year=datetime.date(2011, 7, 15),
+						comments=[Comment(user='chris', txt='nice')],
+						ratings={'chris':5, 'karl':3},
+						best=Comment(user='chris', txt='nice'))
+	
+	def tearDown(self):
+		pass
+	
+	def _changed(self):
+		Comment = self.Comment
+		new = flatty.unflatit(flatty.flatit(self.book), self.Book)
+		new.name = 'flatty 2'
+		new.year = datetime.date(2012, 1, 13)
+		new.comments.append(Comment(user='karl', txt='cool'))
+		new.ratings['eva'] = 4
+		del new.ratings['karl']
+		new.best.txt = 'great'
+		return new
+	
+	def test_json_patch(self):
+		new = self._changed()
+		ops = flatty.diff(self.book, new)
+		ops.sort(key=lambda op: op['path'])
+		self.assertEqual(ops, [
+			{'op':'replace', 'path':'/best/txt', 'value':'great'},
+			{'op':'add', 'path':'/comments/-', 'value':{'user':'karl', 'txt':'cool'}},
+			{'op':'replace', 'path':'/name', 'value':'flatty 2'},
+			{'op':'add', 'path':'/ratings/eva', 'value':4},
+			{'op':'remove', 'path':'/ratings/karl'},
+			{'op':'replace', 'path':'/year', 'value':'2012-01-13'},
+		])
+		self.assertEqual(flatty.diff(self.book, flatty.flatit(self.book)), [])
+		
+		best = self.book.best
+		patched = flatty.patch(self.book, ops)
+		self.assertTrue(patched is self.book)
+		self.assertTrue(self.book.best is best)
+		self.assertTrue(isinstance(self.book.comments[1], self.Comment))
+		self.assertEqual(self.book.year, datetime.date(2012, 1, 13))
+		self.assertEqual(flatty.flatit(self.book), flatty.flatit(new))
+	
+	def test_mongo(self):
+		new = self._changed()
+		update = flatty.diff(flatty.flatit(self.book), new, self.Book, format='mongo')
+		self.assertEqual(update, {
+			'$set': {'name':'flatty 2', 'year':'2012-01-13', 'best.txt':'great',
+					'ratings.eva':4},
+			'$unset': {'ratings.karl':1},
+			'$push': {'comments':{'$each':[{'user':'karl', 'txt':'cool'}]}},
+		})
+		flatty.patch(self.book, update)
+		self.assertEqual(flatty.flatit(self.book), flatty.flatit(new))
+	
+	def test_list_changes(self):
+		Comment = self.Comment
+		new = copy.deepcopy(self.book)
+		new.comments[0].txt = 'bad'
+		self.assertEqual(flatty.diff(self.book, new, format='mongo'),
+						{'$set':{'comments.0.txt':'bad'}})
+		new.comments = []
+		self.assertEqual(flatty.diff(self.book, new),
+						[{'op':'replace', 'path':'/comments', 'value':[]}])
+	
+	def test_patch_types(self):
+		self.assertRaises(TypeError, flatty.patch, self.book,
+						[{'op':'replace', 'path':'/name', 'value':42}])
+		self.assertRaises(AttributeError, flatty.patch, self.book,
+						[{'op':'replace', 'path':'/foo', 'value':42}])
+		self.assertRaises(ValueError, flatty.diff, self.book, self.book, format='foo')
+	
+	def test_schema_version(self):
+		class Note(flatty.Schema):
+			__schema_version__ = 2
+			name = str
+			size = int
+		
+		@flatty.migration(Note, 1)
+		def rename_title(flat):
+			flat['name'] = flat.pop('title')
+		
+		stored = {'_version':1, 'title':'a', 'size':1}
+		note = flatty.unflatit(stored, Note)
+		note.size = 2
+		for format in ('json-patch', 'mongo'):
+			changes = flatty.diff(stored, note, format=format)
+			patched = flatty.patch(flatty.unflatit(stored, Note), changes)
+			self.assertEqual(flatty.flatit(patched), flatty.flatit(note))
+		self.assertEqual(flatty.diff(stored, note, format='mongo')['$set']['_version'], 2)
+
+
+def suite():
+	suite = unittest.TestSuite()
+	if len(sys.argv) > 1 and sys.argv[1][:2] == 't:':
+		suite.addTest(PatchingTestCase(sys.argv[1][2:]))
+	else:
+		suite.addTest(unittest.makeSuite(PatchingTestCase, 'test'))
+	return suite
+
+
+if __name__ == '__main__':
+	#call it with 
+	#t:<my_testcase>
+	#to launch only <my_testcase> test 
+	unittest.TextTestRunner(verbosity=1).run(suite())
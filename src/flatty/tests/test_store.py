@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import unittest
+import flatty
+import sys
+import os
+import datetime
+import tempfile
+
+
+class StoreTestCase(unittest.TestCase):
+
+	def setUp(self):
+		class Region(flatty.Schema):
+			name = str
+			founded = datetime.date
+
+		class Country(flatty.Schema):
+			code = str
+			size = int
+			regions = flatty.TypedList.set_type(Region)
+
+		self.Region = Region
+		self.Country = Country
+		fd, self.path = tempfile.mkstemp()
+		os.close(fd)
+
+	def tearDown(self):
+		os.remove(self.path)
+
+	def _countries(self, count):
+		Region = self.Region
+		for i in xrange(count):
+			yield self.Country(code='c' + str(i), size=i,
+						regions=[Region(name='r' + str(i), founded=datetime.date(2000, 1, 1))])
+
+	def test_index_access(self):
+		count = flatty.store.MappedCollection.write(self.path, self._countries(50),
+													self.Country)
+		self.assertEqual(count, 50)
+		with flatty.store.MappedCollection(self.path, self.Country) as coll:
+			self.assertEqual(len(coll), 50)
+			self.assertEqual(coll[7].code, 'c7')
+			self.assertEqual(coll[7].regions[0].founded, datetime.date(2000, 1, 1))
+			self.assertEqual(coll[-1].size, 49)
+			self.assertEqual(coll.flat(3)['regions'], [{'name':'r3', 'founded':'2000-01-01'}])
+			self.assertRaises(IndexError, coll.__getitem__, 50)
+			self.assertEqual([c.size for c in coll], range(50))
+			self.assertRaises(TypeError, coll.get, 'c1')
+
+	def test_key_access(self):
+		flatty.store.MappedCollection.write(self.path, self._countries(50),
+											self.Country, key='code')
+		coll = flatty.store.MappedCollection(self.path, self.Country)
+		self.assertEqual(coll.get('c42').size, 42)
+		self.assertEqual(coll.get('missing'), None)
+		self.assertEqual(coll.index('c3'), 3)
+		self.assertTrue('c0' in coll)
+		self.assertFalse('a' in coll or 'z' in coll or 'c42x' in coll)
+		self.assertRaises(KeyError, coll.index, 'missing')
+		self.assertEqual(coll.keys(), sorted('c' + str(i) for i in range(50)))
+		coll.close()
+
+		flatty.store.MappedCollection.write(self.path, self._countries(7),
+											self.Country, key=lambda c: -c.size)
+		with flatty.store.MappedCollection(self.path, self.Country) as coll:
+			self.assertEqual([coll.index(-i) for i in range(7)], range(7))
+			self.assertEqual(coll.get(1), None)
+			self.assertEqual(coll.keys(), range(-6, 1))
+
+		self.assertRaises(ValueError, flatty.store.MappedCollection.write, self.path,
+						[self.Country(code='a'), self.Country(code='a')], self.Country,
+						key='code')
+
+	def test_empty(self):
+		flatty.store.MappedCollection.write(self.path, [], self.Country, key=lambda c: c.size)
+		coll = flatty.store.MappedCollection(self.path, self.Country)
+		self.assertEqual(len(coll), 0)
+		self.assertEqual(list(coll), [])
+		coll.close()
+
+	def test_schema_version(self):
+		class Area(flatty.Schema):
+			__schema_version__ = 1
+			size = int
+
+		flatty.store.MappedCollection.write(self.path, [Area(size=5)], Area)
+
+		class Area(flatty.Schema):
+			__schema_version__ = 2
+			size = int
+
+		@flatty.migration(Area, 1)
+		def to_km(flat):
+			flat['size'] *= 1000
+
+		with flatty.store.MappedCollection(self.path, Area) as coll:
+			self.assertEqual(coll[0].size, 5000)
+			self.assertEqual(coll.flat(0), {'_version':2, 'size':5000})
+
+	def test_schema_mismatch(self):
+		flatty.store.MappedCollection.write(self.path, self._countries(2), self.Country)
+		self.assertRaises(flatty.binary.SchemaMismatchError,
+						flatty.store.MappedCollection, self.path, self.Region)
+
+
+def suite():
+	suite = unittest.TestSuite()
+	if len(sys.argv) > 1 and sys.argv[1][:2] == 't:':
+		suite.addTest(StoreTestCase(sys.argv[1][2:]))
+	else:
+		suite.addTest(unittest.makeSuite(StoreTestCase, 'test'))
+	return suite
+
+
+if __name__ == '__main__':
+	#call it with
+	#t:<my_testcase>
+	#to launch only <my_testcase> test
+	unittest.TextTestRunner(verbosity=1).run(suite())
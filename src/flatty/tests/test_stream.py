@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import unittest
+import flatty
+import sys
+import json
+import StringIO
+
+
+class StreamTestCase(unittest.TestCase):
+
+	def setUp(self):
+		class Region(flatty.Schema):
+			name = basestring
+
+		class Country(flatty.Schema):
+			code = basestring
+			size = int
+			regions = flatty.TypedList.set_type(Region)
+
+		class Catalog(flatty.Schema):
+			items = flatty.TypedList.set_type(Country)
+
+		class Export(flatty.Schema):
+			created = basestring
+			total = int
+			catalog = Catalog
+
+		self.Country = Country
+		self.Catalog = Catalog
+		self.Export = Export
+
+	def tearDown(self):
+		pass
+
+	def _export(self, count):
+		return {'created':'2011-07-15', 'total':count,
+				'catalog':{'items':[{'code':'c' + str(i), 'size':i * 1000,
+									'regions':[{'name':u'rä' + str(i)}]}
+									for i in range(count)]}}
+
+	def test_load(self):
+		data = json.dumps(self._export(500), indent=1)
+		#small chunks split tokens, strings and numbers
+		for chunk_size in (7, 64, 65536):
+			countries = flatty.stream.load(StringIO.StringIO(data), self.Export,
+										'catalog.items', chunk_size=chunk_size)
+			countries = list(countries)
+			self.assertEqual(len(countries), 500)
+			self.assertTrue(isinstance(countries[0], self.Country))
+			self.assertEqual(countries[42].code, 'c42')
+			self.assertEqual(countries[499].size, 499000)
+			self.assertEqual(countries[7].regions[0].name, u'rä7')
+
+	def test_incremental(self):
+		class Tracking(StringIO.StringIO):
+			read_bytes = 0
+			def read(self, size=-1):
+				data = StringIO.StringIO.read(self, size)
+				self.read_bytes += len(data)
+				return data
+
+		data = json.dumps(self._export(2000))
+		fp = Tracking(data)
+		countries = flatty.stream.load(fp, self.Export, 'catalog.items', chunk_size=1024)
+		self.assertEqual(countries.next().code, 'c0')
+		self.assertTrue(fp.read_bytes < 4096)
+
+	def test_edge_cases(self):
+		load = lambda data, path: list(flatty.stream.load(StringIO.StringIO(data),
+														self.Catalog, path))
+		self.assertEqual(load('{"items": []}', 'items'), [])
+		self.assertEqual(load('{"items": null}', 'items'), [])
+		self.assertRaises(KeyError, load, '{"other": 1}', 'items')
+		self.assertRaises(ValueError, load, '{"items": [{"code": "a"}', 'items')
+		self.assertRaises(AttributeError, load, '{}', 'missing')
+
+
+def suite():
+	suite = unittest.TestSuite()
+	if len(sys.argv) > 1 and sys.argv[1][:2] == 't:':
+		suite.addTest(StreamTestCase(sys.argv[1][2:]))
+	else:
+		suite.addTest(unittest.makeSuite(StreamTestCase, 'test'))
+	return suite
+
+
+if __name__ == '__main__':
+	#call it with
+	#t:<my_testcase>
+	#to launch only <my_testcase> test
+	unittest.TextTestRunner(verbosity=1).run(suite())
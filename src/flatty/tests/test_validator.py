@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import unittest
+import flatty
+import sys
+import datetime
+
+
+class ValidatorTestCase(unittest.TestCase):
+	
+	def setUp(self):
+		class Region(flatty.Schema):
+			name = str
+			founded = datetime.date
+		
+		class Country(flatty.Schema):
+			size = int
+			regions = flatty.TypedList.set_type(Region)
+		
+		class World(flatty.Schema):
+			countries = flatty.TypedDict.set_type(Country)
+			capital = Region
+			
+		self.Region = Region
+		self.World = World
+		
+	def tearDown(self):
+		pass
+	
+	def test_valid(self):
+		Region = self.Region
+		world = self.World(countries={}, capital=Region(name='vienna',
+											founded=datetime.date(1100, 1, 1)))
+		flat_dict = flatty.flatit(world)
+		check = flatty.validator.compile_validator(self.World)
+		self.assertEqual(check(flat_dict), [])
+		flatty.validator.validate(flat_dict, self.World)
+	
+	def test_all_errors(self):
+		flat_dict = {
+			'countries': {
+				'austria': {'size': 'big', 'regions':[{'name':1}, 'foo']},
+				'hungary': {'size': 5, 'regions':None},
+			},
+			'capital': {'name':'vienna', 'founded':'yesterday'},
+		}
+		errors = flatty.validator.compile_validator(self.World)(flat_dict)
+		paths = sorted(path for path, msg in errors)
+		self.assertEqual(paths, ['capital.founded', 'countries.austria.regions.0.name',
+								'countries.austria.regions.1', 'countries.austria.size'])
+		
+		try:
+			flatty.validator.validate(flat_dict, self.World)
+		except TypeError, e:
+			self.assertTrue(isinstance(e, flatty.validator.ValidationError))
+			self.assertEqual(len(e.errors), 4)
+		else:
+			self.fail('ValidationError expected')
+		
+		#the validator agrees with unflatit
+		self.assertRaises(TypeError, flatty.unflatit, 
+						{'countries':{'austria':{'size':'big'}}}, self.World)
+		self.assertEqual(len(flatty.validator.compile_validator(self.World)(
+						{'countries':{'austria':{'size':'big'}}})), 1)
+	
+	def test_recursive_schema(self):
+		class Category(flatty.Schema):
+			name = str
+			children = None
+		Category.children = flatty.TypedList.set_type(Category)
+		
+		check = flatty.validator.compile_validator(Category)
+		self.assertEqual(check({'name':'a', 'children':[{'name':'b', 'children':[]}]}), [])
+		self.assertEqual(check({'name':'a', 'children':[{'name':1}]}),
+						[('children.0.name', "<type 'int'> != <type 'str'>")])
+		
+		schema = flatty.validator.json_schema(Category)
+		self.assertEqual(schema['$ref'], '#/definitions/Category')
+		self.assertEqual(schema['definitions']['Category']['properties']['children'],
+					{'type':['array', 'null'], 'items':{'$ref':'#/definitions/Category'}})
+	
+	def test_json_schema(self):
+		schema = flatty.validator.json_schema(self.World)
+		definitions = schema['definitions']
+		self.assertEqual(sorted(definitions), ['Country', 'Region', 'World'])
+		self.assertEqual(definitions['Region']['properties'], {
+			'name': {'type':['string', 'null']},
+			'founded': {'type':['string', 'null'], 'format':'date'},
+		})
+		self.assertEqual(definitions['World']['properties']['countries'],
+				{'type':['object', 'null'],
+				'additionalProperties':{'$ref':'#/definitions/Country'}})
+
+	def test_schema_version(self):
+		class Gauge(flatty.Schema):
+			__schema_version__ = 2
+			name = str
+			size = int
+
+		@flatty.migration(Gauge, 1)
+		def rename_title(flat):
+			flat['name'] = flat.pop('title')
+
+		check = flatty.validator.compile_validator(Gauge)
+		old = {'_version':1, 'title':'a', 'size':1}
+		self.assertEqual(check(old), [])
+		self.assertEqual(old, {'_version':1, 'title':'a', 'size':1})
+		self.assertEqual(len(check({'_version':1, 'title':1})), 1)
+		self.assertEqual(check({'_version':1, 'name':'a'}), [('_version', "'title'")])
+		self.assertEqual(len(check({'_version':3, 'name':'a'})), 1)
+		self.assertEqual(flatty.validator.json_schema(Gauge)['definitions']['Gauge']
+						['properties']['_version'],
+						{'type':'integer', 'minimum':0, 'maximum':2})
+	
+	def test_converter_change(self):
+		class Kelvin(float):
+			pass
+		
+		class KelvinConverter(flatty.Converter):
+			@classmethod
+			def to_flat(cls, obj_type, obj, val, cm):
+				return str(obj)
+			@classmethod
+			def to_obj(cls, obj_type, val, obj, cm):
+				return Kelvin(val)
+		
+		class Probe(flatty.Schema):
+			temp = Kelvin
+		
+		self.assertEqual(len(flatty.validator.compile_validator(Probe)({'temp':'1.5'})), 1)
+		flatty.ConvertManager.set_converter(Kelvin, KelvinConverter)
+		try:
+			#validators compiled before the converter was set aren't reused
+			self.assertEqual(flatty.validator.compile_validator(Probe)({'temp':'1.5'}), [])
+		finally:
+			flatty.ConvertManager.del_converter(Kelvin)
+		self.assertEqual(len(flatty.validator.compile_validator(Probe)({'temp':'1.5'})), 1)
+
+
+def suite():
+	suite = unittest.TestSuite()
+	if len(sys.argv) > 1 and sys.argv[1][:2] == 't:':
+		suite.addTest(ValidatorTestCase(sys.argv[1][2:]))
+	else:
+		suite.addTest(unittest.makeSuite(ValidatorTestCase, 'test'))
+	return suite
+
+
+if __name__ == '__main__':
+	#call it with 
+	#t:<my_testcase>
+	#to launch only <my_testcase> test 
+	unittest.TextTestRunner(verbosity=1).run(suite())
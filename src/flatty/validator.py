@@ -0,0 +1,337 @@
+"""
+This module compiles :class:`Schema` classes into validator functions which
+check the structure and the types of flattened data without building the
+object graph. The compiled validators are cached per class.
+
+	>>> import flatty
+	>>>
+	>>> class Bar(flatty.Schema):
+	...	 a_num = int
+	...	 a_str = str
+	>>>
+	>>> class Foo(flatty.Schema):
+	...	 bars = flatty.TypedList.set_type(Bar)
+	>>>
+	>>> check = flatty.validator.compile_validator(Foo)
+	>>> check({'bars': [{'a_num': 'x', 'a_str': 42}]})
+	[('bars.0.a_num', "<type 'str'> != <type 'int'>"), ('bars.0.a_str', "<type 'int'> != <type 'str'>")]
+
+The same information can be exported as a JSON Schema document with
+:func:`json_schema`.
+
+=========
+Functions
+=========
+"""
+import inspect
+import datetime
+import types
+import flatty
+
+_validators = {}
+
+
+class ValidationError(TypeError):
+	"""
+	raised by :func:`validate`, `errors` is the list of all
+	`(path, message)` tuples found in the data
+	"""
+	def __init__(self, errors):
+		TypeError.__init__(self, '; '.join(path + ': ' + msg for path, msg in errors))
+		self.errors = errors
+
+
+def _join(path, key):
+	if path:
+		return path + '.' + str(key)
+	return str(key)
+
+
+def _type_error(value, type_class):
+	return str(value.__class__) + " != " + str(type_class)
+
+
+def _primitive_checker(attr_type):
+	if attr_type == None or attr_type == types.NoneType:
+		return None
+	type_class = attr_type if inspect.isclass(attr_type) else attr_type.__class__
+
+	def check(value, path, errors):
+		if value is not None and not isinstance(value, type_class):
+			errors.append((path, _type_error(value, type_class)))
+	return check
+
+
+def _container_checker(container_class, item_checker, items):
+	def check(value, path, errors):
+		if value is None:
+			return
+		if not isinstance(value, container_class):
+			errors.append((path, _type_error(value, container_class)))
+		elif item_checker is not None:
+			for key, item in items(value):
+				item_checker(item, _join(path, key), errors)
+	return check
+
+
+def _untyped_checker(value, path, errors):
+	errors.append((path, 'no type associated with the item'))
+
+
+def _leaf_checker(attr_type, conv, cm):
+	#custom and date converters are leafs, they are checked by converting
+	def check(value, path, errors):
+		try:
+			obj = conv.to_obj(attr_type, value, None, cm)
+			conv.check_type(attr_type, obj, cm)
+		except (TypeError, ValueError), e:
+			errors.append((path, str(e)))
+	return check
+
+
+def _schema_checker(obj_type, cm):
+	obj_class = obj_type if inspect.isclass(obj_type) else type(obj_type)
+	#the generation changes when converters are set, like in _frozen_to_obj
+	key = (cm, obj_class, flatty.ConvertManager._generation,
+		flatty.schema_fingerprint(obj_class, cm))
+	if key in _validators:
+		return _validators[key]
+
+	fields = []
+
+	plan = flatty.schema_plan(obj_class, cm)
+
+	def check(value, path, errors):
+		if not isinstance(value, dict):
+			errors.append((path, _type_error(value, obj_class)))
+			return
+		if plan.subtypes is not None:
+			try:
+				sub_class = plan.subtype(value)
+			except ValueError, e:
+				errors.append((_join(path, plan.discriminator), str(e)))
+				return
+			if sub_class is not obj_class:
+				_schema_checker(sub_class, cm)(value, path, errors)
+				return
+		if plan.version is not None:
+			#older versions are checked like unflatit loads them
+			try:
+				value = flatty.migrate(value, obj_class)
+			except (LookupError, TypeError, ValueError), e:
+				errors.append((_join(path, plan.version_key), str(e)))
+				return
+		for attr_name, attr_checker in fields:
+			if attr_name in value:
+				attr_checker(value[attr_name], _join(path, attr_name), errors)
+
+	#registered before the attributes are compiled to support recursive schemas
+	_validators[key] = check
+	for attr_name, attr_type in flatty.schema_fields(obj_class):
+		attr_checker = _compile(attr_type, cm)
+		if attr_checker is not None:
+			fields.append((attr_name, attr_checker))
+	return check
+
+
+def _compile(attr_type, cm):
+	if not attr_type:
+		return _primitive_checker(attr_type)
+	conv = cm.get_converter(attr_type)
+
+	if conv is None:
+		return _primitive_checker(attr_type)
+
+	elif conv is flatty.SchemaConverter:
+		schema_check = _schema_checker(attr_type, cm)
+		def check(value, path, errors):
+			if value is not None:
+				schema_check(value, path, errors)
+			else:
+				errors.append((path, _type_error(value, attr_type)))
+		return check
+
+	elif conv is flatty.TypedListConverter or conv is flatty.ColumnListConverter:
+		try:
+			item_checker = _compile(flatty.item_type(attr_type), cm)
+		except KeyError:
+			item_checker = _untyped_checker
+		return _container_checker(list, item_checker, enumerate)
+
+	elif conv is flatty.TypedDictConverter:
+		if hasattr(attr_type, 'ftype'):
+			item_checker = _compile(attr_type.ftype, cm)
+			return _container_checker(dict, item_checker, dict.iteritems)
+
+		item_checkers = {}
+		if isinstance(attr_type, dict):
+			for k, v in attr_type.items():
+				item_checkers[k] = _compile(v, cm)
+		def check(value, path, errors):
+			if value is None:
+				return
+			if not isinstance(value, dict):
+				errors.append((path, _type_error(value, dict)))
+				return
+			for k, item in value.iteritems():
+				if k not in item_checkers:
+					_untyped_checker(item, _join(path, k), errors)
+				elif item_checkers[k] is not None:
+					item_checkers[k](item, _join(path, k), errors)
+		return check
+
+	elif conv is flatty.NumArrayConverter:
+		if attr_type.encoding == 'list':
+			return _container_checker(list, _number_checker, enumerate)
+		return _primitive_checker(basestring)
+
+	return _leaf_checker(attr_type, conv, cm)
+
+
+def _number_checker(value, path, errors):
+	if isinstance(value, list):
+		for idx, item in enumerate(value):
+			_number_checker(item, _join(path, idx), errors)
+	elif isinstance(value, bool) or not isinstance(value, (int, long, float)):
+		errors.append((path, _type_error(value, float)))
+
+
+def compile_validator(obj_type, cm=flatty.ConvertManager):
+	"""
+	compiles a validator function for the flattened data of `obj_type`
+
+		Args:
+			obj_type: a :class:`Schema` class
+
+		Returns:
+			a function which takes the flattened data and returns a list of
+			`(path, message)` tuples, one for each error found in the data.
+			The list is empty if the data can be unflattened to `obj_type`.
+	"""
+	check = _schema_checker(obj_type, cm)
+
+	def validator(flat_dict):
+		errors = []
+		check(flat_dict, '', errors)
+		return errors
+	return validator
+
+
+def validate(flat_dict, obj_type, cm=flatty.ConvertManager):
+	"""
+	validates `flat_dict` against `obj_type` with the cached validator
+
+		Args:
+			flat_dict: the flattened data
+			obj_type: a :class:`Schema` class
+
+		Returns:
+			None if the data is valid, otherwise a :class:`ValidationError`
+			with all errors is raised
+	"""
+	errors = []
+	_schema_checker(obj_type, cm)(flat_dict, '', errors)
+	if errors:
+		raise ValidationError(errors)
+
+
+_JSON_TYPES = [
+	(bool, 'boolean'),
+	((int, long), 'integer'),
+	(float, 'number'),
+	(basestring, 'string'),
+]
+
+_JSON_FORMATS = {
+	datetime.date: 'date',
+	datetime.datetime: 'date-time',
+	datetime.time: 'time',
+}
+
+
+def _nullable(json_type):
+	return {'type': [json_type, 'null']}
+
+
+def _json_type(attr_type, cm, definitions):
+	if attr_type is None or attr_type == types.NoneType:
+		return {}
+	type_class = attr_type if inspect.isclass(attr_type) else attr_type.__class__
+	conv = cm.get_converter(attr_type)
+
+	if conv is flatty.SchemaConverter:
+		return {'$ref': '#/definitions/' + _json_definition(type_class, cm, definitions)}
+
+	elif conv is flatty.TypedListConverter or conv is flatty.ColumnListConverter:
+		schema = _nullable('array')
+		if hasattr(attr_type, 'ftype'):
+			schema['items'] = _json_type(attr_type.ftype, cm, definitions)
+		return schema
+
+	elif conv is flatty.TypedDictConverter:
+		schema = _nullable('object')
+		if hasattr(attr_type, 'ftype'):
+			schema['additionalProperties'] = _json_type(attr_type.ftype, cm, definitions)
+		return schema
+
+	elif conv is flatty.NumArrayConverter:
+		if attr_type.encoding == 'list':
+			schema = _nullable('array')
+			schema['items'] = {'type': 'number'}
+			return schema
+		return _nullable('string')
+
+	elif type_class in _JSON_FORMATS:
+		schema = _nullable('string')
+		schema['format'] = _JSON_FORMATS[type_class]
+		return schema
+
+	elif conv is None:
+		for python_type, json_type in _JSON_TYPES:
+			if issubclass(type_class, python_type):
+				return _nullable(json_type)
+	return {}
+
+
+def _json_definition(obj_class, cm, definitions):
+	for name, (cls, schema) in definitions.items():
+		if cls is obj_class:
+			return name
+
+	name = obj_class.__name__
+	idx = 1
+	while name in definitions:
+		idx += 1
+		name = obj_class.__name__ + str(idx)
+
+	properties = {}
+	definitions[name] = (obj_class, {'type': 'object', 'properties': properties})
+	for attr_name, attr_type in flatty.schema_fields(obj_class):
+		properties[attr_name] = _json_type(attr_type, cm, definitions)
+	version = getattr(obj_class, '__schema_version__', None)
+	if version is not None:
+		#older versions are migrated when loaded
+		properties[obj_class.__version_key__] = {'type': 'integer', 'minimum': 0,
+												'maximum': version}
+	return name
+
+
+def json_schema(obj_type, cm=flatty.ConvertManager):
+	"""
+	exports the structure of the flattened data of `obj_type` as JSON Schema
+
+		Args:
+			obj_type: a :class:`Schema` class
+
+		Returns:
+			a dict with the JSON Schema (draft 4) document, every
+			:class:`Schema` class is a definition
+	"""
+	definitions = {}
+	obj_class = obj_type if inspect.isclass(obj_type) else type(obj_type)
+	name = _json_definition(obj_class, cm, definitions)
+	return {
+		'$schema': 'http://json-schema.org/draft-04/schema#',
+		'$ref': '#/definitions/' + name,
+		'definitions': dict((k, v[1]) for k, v in definitions.items()),
+	}